@@ -0,0 +1,72 @@
+"""Compare benchmark runs from the history written by run.py.
+
+    python benchmarks/compare.py                      # latest run against the one before, per size
+    python benchmarks/compare.py --baseline 3f2c1a9b  # latest run against a commit or run id
+    python benchmarks/compare.py --fail-above 1.2     # exit 1 if a stage got 20% slower
+
+Only runs on the same CPU and thread count are compared. Times are the
+medians (p50 for the latency stages).
+"""
+
+import argparse
+import json
+import os
+import sys
+
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'history.jsonl')
+
+
+def read_history(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def machine(record):
+    env = record['environment']
+    return env['cpu'], env['threads']
+
+
+def stage_time(result):
+    return result['median_s'] if 'median_s' in result else result['p50_ms'] / 1000
+
+
+def pick(records, rows, baseline=None):
+    """(baseline, latest) records of a size, or None when there is nothing to compare."""
+    same_size = [r for r in records if r['rows'] == rows]
+    latest = same_size[-1]
+    candidates = [r for r in same_size[:-1] if machine(r) == machine(latest)]
+    if baseline:
+        candidates = [r for r in candidates if r['run_id'] == baseline or (r['commit'] or '').startswith(baseline)]
+    return (candidates[-1], latest) if candidates else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the latest benchmark run with a baseline.')
+    parser.add_argument('--history', default=HISTORY)
+    parser.add_argument('--baseline', help='commit prefix or run id (default: the previous run)')
+    parser.add_argument('--fail-above', type=float, help='exit with status 1 if a time ratio exceeds this')
+    args = parser.parse_args(argv)
+
+    records = read_history(args.history)
+    worst = 0.0
+    for rows in sorted({r['rows'] for r in records}):
+        pair = pick(records, rows, args.baseline)
+        if pair is None:
+            print(f'{rows} rows: no baseline run on this machine')
+            continue
+        base, latest = pair
+        print(f'{rows} rows: {latest["run_id"]} ({latest["commit"]}) vs {base["run_id"]} ({base["commit"]})')
+        for stage, result in latest['results'].items():
+            if stage not in base['results']:
+                print(f'  {stage:<40} {stage_time(result):>10.4f}s        new')
+                continue
+            before, after = stage_time(base['results'][stage]), stage_time(result)
+            ratio = after / before if before > 0 else float('inf')
+            worst = max(worst, ratio)
+            print(f'  {stage:<40} {before:>10.4f}s {after:>10.4f}s {ratio:>6.2f}x')
+    if args.fail_above is not None and worst > args.fail_above:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
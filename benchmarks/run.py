@@ -0,0 +1,201 @@
+"""Benchmarks of the pipeline stages on synthetic exports.
+
+    python benchmarks/run.py --rows 10000 100000 1000000
+    python benchmarks/run.py --rows 100000 --models "Linear regression log" "XGB log" --repeat 5
+    python benchmarks/compare.py
+
+For every size a synthetic export is generated once (cached under
+``benchmarks/data``) and the stages are timed: CSV load, cached load,
+validation, feature building, fit and predict of each registered model,
+and the single-listing and batch predict latency of a fitted artifact.
+Every run appends one JSON record per size to ``benchmarks/results/history.jsonl``
+together with the commit and the machine, so runs can be compared.
+
+The data and the models are seeded and every stage runs with a fixed number
+of threads (``--threads``, 1 by default), so the numbers are comparable
+between runs on the same machine.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from detail_views.synthetic import write_items_csv  # noqa: E402
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+HISTORY = os.path.join(ROOT, 'benchmarks', 'results', 'history.jsonl')
+PACKAGES = ['numpy', 'pandas', 'sklearn', 'xgboost', 'pyarrow']
+
+
+def timed(func, repeat):
+    """Median and min wall time of ``repeat`` calls, and the last result."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return {'median_s': statistics.median(seconds), 'min_s': min(seconds), 'repeat': repeat}, result
+
+
+def latencies(func, n_calls):
+    """p50/p99 latency in milliseconds of ``n_calls`` calls, after one warm-up call."""
+    func()
+    ms = np.empty(n_calls)
+    for i in range(n_calls):
+        start = time.perf_counter()
+        func()
+        ms[i] = (time.perf_counter() - start) * 1000
+    return {'p50_ms': float(np.percentile(ms, 50)), 'p99_ms': float(np.percentile(ms, 99)), 'calls': n_calls}
+
+
+def environment(threads):
+    from importlib import import_module
+
+    cpu = platform.processor()
+    if os.path.exists('/proc/cpuinfo'):
+        with open('/proc/cpuinfo') as f:
+            cpu = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), cpu)
+    versions = {}
+    for name in PACKAGES:
+        try:
+            versions[name] = import_module(name).__version__
+        except ImportError:
+            versions[name] = None
+    return {'platform': platform.platform(), 'python': platform.python_version(), 'cpu': cpu,
+            'cpu_count': os.cpu_count(), 'threads': threads, 'packages': versions}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def dataset(rows, seed):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f'items-{rows}-seed{seed}.csv')
+    if not os.path.exists(path):
+        write_items_csv(path + '.tmp', rows, random_state=seed)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def bench_size(rows, args):
+    import xgboost as xgb
+    from sklearn.base import clone
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import make_pipeline
+    from threadpoolctl import threadpool_limits
+
+    from detail_views.artifact import ModelArtifact
+    from detail_views.features import FEATURE_TYPES, INPUT_COLUMNS, TARGET, FeatureScaler, ListingFeatures, log_target
+    from detail_views.loading import load_items, read_items_csv
+    from detail_views.loadtest import EXAMPLE_LISTING
+    from detail_views.models import build
+    from detail_views.validation import validate_items
+
+    path = dataset(rows, args.seed)
+    results = {}
+
+    def report(stage, timing, **extra):
+        results[stage] = {**timing, **extra}
+        summary = ', '.join(f'{k}={v:.4g}' if isinstance(v, float) else f'{k}={v}'
+                            for k, v in results[stage].items())
+        print(f'  {stage}: {summary}', flush=True)
+
+    with threadpool_limits(args.threads):
+        timing, df = timed(lambda: read_items_csv(path), args.repeat)
+        report('load', timing, rows=len(df), rows_per_s=len(df) / timing['median_s'])
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            load_items(path, cache_dir=cache_dir)
+            timing, _ = timed(lambda: load_items(path, cache_dir=cache_dir), args.repeat)
+        report('load_cached', timing, rows=len(df))
+
+        timing, (clean, _) = timed(lambda: validate_items(df), args.repeat)
+        report('clean', timing, rows=len(clean), rows_per_s=len(df) / timing['median_s'])
+
+        X = clean.loc[:, INPUT_COLUMNS]
+        y = log_target(clean[TARGET])
+        timing, features = timed(lambda: ListingFeatures().fit_transform(X), args.repeat)
+        report('features', timing, rows=len(X), rows_per_s=len(X) / timing['median_s'])
+
+        X_train, X_test, y_train, y_test = train_test_split(features, y, train_size=0.7, random_state=100)
+        fit_rows = min(len(X_train), args.max_fit_rows)
+        specs = build(args.models)
+        for name, spec in specs.items():
+            estimator = clone(spec.estimator)
+            if 'n_jobs' in estimator[-1].get_params():
+                estimator[-1].set_params(n_jobs=args.threads)
+            if 'random_state' in estimator[-1].get_params():
+                estimator[-1].set_params(random_state=args.seed)
+            fit_timing, _ = timed(lambda: estimator.fit(X_train[:fit_rows], y_train[:fit_rows]),
+                                  args.model_repeat)
+            report(f'fit/{name}', fit_timing, rows=fit_rows, rows_per_s=fit_rows / fit_timing['median_s'])
+            predict_timing, _ = timed(lambda: estimator.predict(X_test), args.repeat)
+            report(f'predict/{name}', predict_timing, rows=len(X_test),
+                   rows_per_s=len(X_test) / predict_timing['median_s'])
+
+        # latency of the served artifact: raw listing columns in, views out
+        pipeline = make_pipeline(ListingFeatures(), FeatureScaler(),
+                                 xgb.XGBRegressor(objective='reg:squarederror', tree_method='hist',
+                                                  enable_categorical=True, feature_types=FEATURE_TYPES,
+                                                  n_jobs=args.threads, random_state=args.seed))
+        pipeline.fit(X.iloc[:fit_rows], y[:fit_rows])
+        artifact = ModelArtifact(pipeline)
+        record = dict(EXAMPLE_LISTING)
+        report('latency/single', latencies(lambda: artifact.predict_records([record]), args.latency_calls))
+        batch = X.iloc[:args.batch_rows]
+        timing = latencies(lambda: artifact.predict_views(batch), max(10, args.latency_calls // 10))
+        report('latency/batch', timing, rows=len(batch), rows_per_s=len(batch) / (timing['p50_ms'] / 1000))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the pipeline stages on synthetic exports.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions of the data stages and predicts')
+    parser.add_argument('--model-repeat', type=int, default=1, help='repetitions of each model fit')
+    parser.add_argument('--models', nargs='+', help='registered model names (default: all)')
+    parser.add_argument('--max-fit-rows', type=int, default=50_000,
+                        help='training rows of the model fits, SVR and the MLPs do not scale to the full data')
+    parser.add_argument('--latency-calls', type=int, default=500)
+    parser.add_argument('--batch-rows', type=int, default=10_000)
+    parser.add_argument('--history', default=HISTORY)
+    parser.add_argument('--label', help='free text stored with the run')
+    args = parser.parse_args(argv)
+
+    run = {'run_id': uuid.uuid4().hex[:12], 'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+           'commit': git_commit(), 'label': args.label, 'environment': environment(args.threads)}
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    for rows in args.rows:
+        print(f'{rows} rows', flush=True)
+        record = {**run, 'rows': rows, 'seed': args.seed, 'max_fit_rows': args.max_fit_rows,
+                  'results': bench_size(rows, args)}
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    print(f'run {run["run_id"]} appended to {args.history}')
+
+
+if __name__ == '__main__':
+    main()
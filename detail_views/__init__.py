@@ -0,0 +1,5 @@
+"""Building blocks for predicting the detail views of car listings.
+
+The modules are kept import-light: heavy dependencies (xgboost, matplotlib,
+seaborn) are only imported by the modules that need them.
+"""
@@ -0,0 +1,3 @@
+from detail_views.cli import main
+
+main()
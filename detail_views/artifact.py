@@ -0,0 +1,96 @@
+"""Versioned model artifact bundling the fitted feature transform, scaler and booster.
+
+Artifacts are written to a model directory as ``model-0001.pkl``,
+``model-0002.pkl``, ...; loading a directory picks the latest version.
+"""
+
+import os
+import pickle
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from detail_views.features import INPUT_COLUMNS, inverse_target
+from detail_views.loading import DATE_COLUMNS
+
+FORMAT_VERSION = 1
+_NAME = re.compile(r'^model-(\d+)\.pkl$')
+
+
+class ModelArtifact:
+    """A fitted pipeline taking raw listing columns, plus its version and metadata.
+
+    The optional ``imputer`` (a fitted GroupImputer) fills missing view
+    counts of the listings before they reach the pipeline.
+    """
+
+    def __init__(self, pipeline, version=None, metadata=None, imputer=None):
+        self.pipeline = pipeline
+        self.version = version
+        self.metadata = metadata or {}
+        self.imputer = imputer
+
+    def predict_log(self, frame):
+        if self.imputer is not None:
+            frame = self.imputer.transform(frame)
+        return self.pipeline.predict(frame)
+
+    def predict_views(self, frame):
+        """Predicted detail_views on the original scale (10**y - 1, clipped at 0)."""
+        return np.maximum(inverse_target(self.predict_log(frame)), 0)
+
+    def predict_records(self, records):
+        return self.predict_views(records_to_frame(records))
+
+
+def records_to_frame(records):
+    """Frame with the model input columns from a list of listing dicts (dates as strings)."""
+    columns = {col: [record[col] for record in records] for col in INPUT_COLUMNS}
+    for col in DATE_COLUMNS:
+        # ISO dates, parsed by numpy without going through pandas' format inference
+        columns[col] = np.array(columns[col], dtype='datetime64[D]')
+    return pd.DataFrame(columns, copy=False)
+
+
+def versions(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(m.group(1)) for m in map(_NAME.match, os.listdir(directory)) if m)
+
+
+def save_model(pipeline, directory='models', metadata=None, imputer=None):
+    """Write the fitted ``pipeline`` as the next version in ``directory`` and return its path."""
+    import sklearn
+
+    os.makedirs(directory, exist_ok=True)
+    version = (versions(directory) or [0])[-1] + 1
+    meta = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'sklearn': sklearn.__version__}
+    try:
+        import xgboost
+        meta['xgboost'] = xgboost.__version__
+    except ImportError:
+        pass
+    meta.update(metadata or {})
+    path = os.path.join(directory, f'model-{version:04d}.pkl')
+    tmp = f'{path}.tmp{os.getpid()}'
+    with open(tmp, 'wb') as f:
+        pickle.dump({'format_version': FORMAT_VERSION, 'version': version, 'metadata': meta,
+                     'pipeline': pipeline, 'imputer': imputer}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return path
+
+
+def load_model(path='models'):
+    """Load an artifact file, or the latest version in a model directory."""
+    if os.path.isdir(path):
+        available = versions(path)
+        if not available:
+            raise FileNotFoundError(f'no model artifact in {path}')
+        path = os.path.join(path, f'model-{available[-1]:04d}.pkl')
+    with open(path, 'rb') as f:
+        bundle = pickle.load(f)
+    if bundle.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f'unsupported artifact format {bundle.get("format_version")} in {path}')
+    return ModelArtifact(bundle['pipeline'], bundle['version'], bundle['metadata'], bundle.get('imputer'))
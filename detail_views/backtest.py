@@ -0,0 +1,159 @@
+"""Time-ordered backtests over created_date with expanding or rolling windows.
+
+The random train/test split and the shuffled folds train on listings
+created after the ones they are scored on. A backtest instead trains on
+the listings created before a cutoff and scores the ones created in the
+``test_days`` after it, for a series of cutoffs ``step_days`` apart. The
+training window either grows from the first listing (expanding) or keeps
+the last ``train_days`` (rolling).
+
+The frame is sorted by created_date once and transformed into one float32
+matrix in that order, so every window is a pair of contiguous row ranges
+found by binary search on the sorted dates, and its train and test sets
+are views of the matrix. The matrix is written to a memory-mapped file
+that the worker processes open once, and the (model, window) tasks only
+carry row bounds.
+
+The category tables are fitted on the whole frame (as in the notebook's
+label encoding), and ``detail_views`` of a listing still open at the
+cutoff only becomes final after it; ``gap_days`` leaves a gap between the
+training and the test listings.
+"""
+
+import os
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from detail_views.features import INPUT_COLUMNS, TARGET, ListingFeatures, log_target
+from detail_views.instrument import stage
+from detail_views.matrix_cache import open_array
+from detail_views.models import ModelSpec
+from detail_views.scoring import regression_scores
+
+Window = namedtuple('Window', ['train_start', 'train_stop', 'test_start', 'test_stop',
+                               'train_from', 'cutoff', 'test_from', 'test_to'])
+
+_worker = {}
+
+
+def time_windows(dates, test_days=14, train_days=None, step_days=None, min_train_days=28, gap_days=0):
+    """Windows over ``dates`` (sorted datetime64); ``train_days=None`` expands the training window.
+
+    The first cutoff is ``min_train_days`` (or ``train_days``) after the
+    first date and the cutoffs advance by ``step_days`` (``test_days`` by
+    default) while there are test listings left. Row bounds are positions
+    in ``dates``; the dates are the day boundaries (end exclusive).
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    step = np.timedelta64(step_days or test_days, 'D')
+    first = dates[0].astype('datetime64[D]')
+    last = dates[-1]
+    cutoffs = np.arange(first + np.timedelta64(train_days or min_train_days, 'D'),
+                        last.astype('datetime64[D]') + np.timedelta64(1, 'D'), step)
+    if not len(cutoffs):
+        return []
+    train_from = cutoffs - np.timedelta64(train_days, 'D') if train_days else np.full_like(cutoffs, first)
+    test_from = cutoffs + np.timedelta64(gap_days, 'D')
+    test_to = test_from + np.timedelta64(test_days, 'D')
+    # one binary search for every boundary of every window
+    bounds = np.searchsorted(dates, np.stack([train_from, cutoffs, test_from, test_to]).astype(dates.dtype))
+    return [Window(*map(int, bounds[:, i]), train_from[i], cutoffs[i], test_from[i], test_to[i])
+            for i in range(len(cutoffs))
+            if bounds[1, i] > bounds[0, i] and bounds[3, i] > bounds[2, i]]
+
+
+def sorted_matrix(df, transformer=None):
+    """Feature matrix, log target and created dates of ``df`` in created_date order."""
+    transformer = ListingFeatures() if transformer is None else transformer
+    created = df['created_date'].to_numpy(dtype='datetime64[ns]')
+    order = np.argsort(created, kind='stable')
+    ordered = df.iloc[order]
+    X = transformer.fit(df).transform(ordered[INPUT_COLUMNS])
+    y = log_target(ordered[TARGET]).astype(np.float32)
+    return X, y, created[order]
+
+
+def _init_worker(X, y):
+    _worker['X'] = open_array(X)
+    _worker['y'] = open_array(y)
+
+
+def _fit_window(estimator, threads, name, index, window):
+    from threadpoolctl import threadpool_limits
+
+    X, y = _worker['X'], _worker['y']
+    train = slice(window.train_start, window.train_stop)
+    test = slice(window.test_start, window.test_stop)
+    with threadpool_limits(limits=threads), stage('backtest/window', rows=window.train_stop - window.train_start,
+                                                  model=name, window=index):
+        start = time.perf_counter()
+        fitted = clone(estimator).fit(X[train], y[train])
+        fit_time = time.perf_counter() - start
+        start = time.perf_counter()
+        y_pred = fitted.predict(X[test])
+        score_time = time.perf_counter() - start
+    return {**regression_scores(y[test], y_pred), 'fit_time': fit_time, 'score_time': score_time}
+
+
+def backtest(df, models, test_days=14, train_days=None, step_days=None, min_train_days=28, gap_days=0,
+             n_workers=None, transformer=None, verbose=True):
+    """Fit and score ``models`` ({name: ModelSpec or estimator}) on every time window of ``df``.
+
+    ``df`` is a cleaned listings frame; the models are pipelines on the
+    feature matrix, as in the registry. The windows of all models run in
+    parallel on ``n_workers`` processes (by default as many as the CPUs
+    allow with each model's thread count). Returns one row per (model,
+    window) with the window dates and sizes, the test scores and the fit
+    and score times.
+    """
+    specs = {name: spec if isinstance(spec, ModelSpec) else ModelSpec(spec) for name, spec in models.items()}
+    with stage('backtest/prepare', rows=len(df)):
+        X, y, dates = sorted_matrix(df, transformer)
+        windows = time_windows(dates, test_days, train_days, step_days, min_train_days, gap_days)
+    if not windows:
+        raise ValueError(f'the created dates span {dates[-1] - dates[0]}, too short for a single window')
+    if n_workers is None:
+        n_workers = max(1, (os.cpu_count() or 1) // max(spec.threads for spec in specs.values()))
+
+    with tempfile.TemporaryDirectory(prefix='backtest-') as directory:
+        paths = [os.path.join(directory, 'X.npy'), os.path.join(directory, 'y.npy')]
+        np.save(paths[0], X)
+        np.save(paths[1], y)
+        del X, y
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=paths) as pool:
+            tasks = [(name, i, window, pool.submit(_fit_window, spec.estimator, spec.threads, name, i, window))
+                     for name, spec in specs.items() for i, window in enumerate(windows)]
+            rows = [{'model': name, 'window': i, 'train_from': window.train_from, 'cutoff': window.cutoff,
+                     'test_from': window.test_from, 'test_to': window.test_to,
+                     'train_rows': window.train_stop - window.train_start,
+                     'test_rows': window.test_stop - window.test_start, **future.result()}
+                    for name, i, window, future in tasks]
+
+    table = pd.DataFrame(rows)
+    for col in ['train_from', 'cutoff', 'test_from', 'test_to']:
+        table[col] = pd.to_datetime(table[col])
+    if verbose:
+        print_summary(table)
+    return table
+
+
+def summarize(table):
+    """Mean and standard deviation of the window scores and times per model."""
+    columns = ['explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2',
+               'fit_time', 'score_time']
+    return table.groupby('model', sort=False)[columns].agg(['mean', 'std'])
+
+
+def print_summary(table):
+    for name, rows in table.groupby('model', sort=False):
+        print(f'{name} ({len(rows)} windows)')
+        print(f"Explained variance: {rows['explained_variance'].mean():.3f}")
+        print(f"Mean absolute error: {-rows['neg_mean_absolute_error'].mean():.3f}")
+        print(f"Root mean squared error: {-rows['neg_root_mean_squared_error'].mean():.3f}")
+        print(f"R2: {rows['r2'].mean():.3f} (from {rows['r2'].min():.3f} to {rows['r2'].max():.3f})")
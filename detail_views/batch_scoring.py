@@ -0,0 +1,97 @@
+"""Bounded-memory scoring of listing files.
+
+The input is read in fixed-size chunks. Feature building and prediction
+of each chunk run on a small thread pool (pandas parsing, the NumPy feature
+transform and the XGBoost predict release the GIL for most of their work),
+while the next chunk is being parsed and finished chunks are appended to
+the output in input order. At most ``2 * n_workers`` chunks are in flight,
+so memory stays flat regardless of the input size.
+"""
+
+import io
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import pandas as pd
+
+from detail_views.instrument import stage
+from detail_views.loading import CSV_OPTIONS, DATE_FORMAT, SCHEMA, TEXT_SCHEMA, parse_dates
+from detail_views.validation import repair_numeric_columns
+
+OUTPUT_COLUMNS = ['article_id', 'detail_views_pred']
+
+
+def read_chunks(path, chunk_rows=100_000):
+    """Listings of a raw export as frames of ``chunk_rows`` rows, dates unparsed.
+
+    A chunk with mangled numbers is parsed again from its own lines with the
+    numeric columns as text (TEXT_SCHEMA), for validation.repair_numeric_columns
+    to parse; the other chunks keep the declared schema.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        while True:
+            # the export has one listing per line, so a chunk is a block of lines
+            block = header + b''.join(islice(f, chunk_rows))
+            if len(block) == len(header):
+                return
+            try:
+                chunk = pd.read_csv(io.BytesIO(block), dtype=SCHEMA, **CSV_OPTIONS)
+            except ValueError:
+                chunk = pd.read_csv(io.BytesIO(block), dtype=TEXT_SCHEMA, **CSV_OPTIONS)
+            yield chunk
+
+
+def _score_chunk(artifact, chunk, date_format):
+    with stage('score/chunk', rows=len(chunk)):
+        chunk, _ = repair_numeric_columns(parse_dates(chunk, date_format))
+        return pd.DataFrame({'article_id': chunk['article_id'].to_numpy(),
+                             'detail_views_pred': artifact.predict_views(chunk)})
+
+
+def score_file(artifact, input_path, output_path, chunk_rows=100_000, n_workers=4,
+               date_format=DATE_FORMAT, verbose=True):
+    """Score every listing of ``input_path`` with ``artifact`` and write the predictions as CSV.
+
+    Returns ``{'rows', 'seconds', 'rows_per_sec'}``.
+    """
+    model = artifact.pipeline[-1]
+    n_jobs = model.get_params().get('n_jobs', None)
+    if n_jobs is not None:
+        # parallelism comes from the chunk workers; the caller's setting is restored below
+        model.set_params(n_jobs=1)
+    try:
+        return _score_file(artifact, input_path, output_path, chunk_rows, n_workers, date_format, verbose)
+    finally:
+        if n_jobs is not None:
+            model.set_params(n_jobs=n_jobs)
+
+
+def _score_file(artifact, input_path, output_path, chunk_rows, n_workers, date_format, verbose):
+    start = time.perf_counter()
+    rows = 0
+    header = True
+    in_flight = deque()
+
+    def write(result):
+        nonlocal rows, header
+        result.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        rows += len(result)
+        if verbose:
+            print(f'{rows} rows, {rows / (time.perf_counter() - start):.0f} rows/sec')
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        for chunk in read_chunks(input_path, chunk_rows):
+            in_flight.append(pool.submit(_score_chunk, artifact, chunk, date_format))
+            while len(in_flight) >= 2 * n_workers or (in_flight and in_flight[0].done()):
+                write(in_flight.popleft().result())
+        while in_flight:
+            write(in_flight.popleft().result())
+    if header:
+        pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(output_path, index=False)
+
+    seconds = time.perf_counter() - start
+    return {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds if seconds else 0.0}
@@ -0,0 +1,8 @@
+"""Cleaning steps of the notebook as one function."""
+
+from detail_views.validation import validate_items
+
+
+def clean_items(df):
+    """Drop listings failing the validation rules (missing views, impossible years), recompute ctr."""
+    return validate_items(df)[0]
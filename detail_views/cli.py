@@ -0,0 +1,337 @@
+"""Headless pipeline entry point.
+
+    python -m detail_views run --data Items_Cars_Data.csv --workdir artifacts
+    python -m detail_views run --stages fit,importance --workdir artifacts
+    python -m detail_views score --model artifacts/models --input new.csv --output scores.csv
+    python -m detail_views profile --input full_history.csv --output profile
+    python -m detail_views run --stages evaluate,tune --farm-workers 8
+    python -m detail_views worker --connect coordinator:5577 --processes 8
+    python -m detail_views backtest --workdir artifacts --models "XGB log" --test-days 14 --train-days 56
+
+Stages pass their results through files in the work directory, so any
+subset of stages can be run as long as the stages before it have run once.
+Every stage imports only what it needs: the plotting stack is only loaded
+by ``report`` and xgboost only by the stages that train or load a model.
+
+With ``--farm host:port`` and/or ``--farm-workers N`` the evaluate and tune
+stages hand their (config, fold) tasks to a task farm (see
+``detail_views.taskfarm``); remote workers need ``DETAIL_VIEWS_FARM_KEY``.
+
+Set ``DETAIL_VIEWS_TRACE=<dir>`` to record the time and memory of every
+stage, CV fold and tuning fit (see ``detail_views.instrument``).
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+from detail_views.instrument import stage
+
+STAGES = ['load', 'clean', 'features', 'evaluate', 'tune', 'fit', 'importance', 'report']
+
+DEFAULT_GRID = {'max_depth': [3, 5, 8, 10, 15, 20],
+                'n_estimators': [50, 100, 150, 200, 300, 400, 500],
+                'learning_rate': [0.01, 0.05, 0.1, 0.3, 0.5]}
+
+
+class Workdir:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def __call__(self, name):
+        return os.path.join(self.path, name)
+
+    def read_json(self, name, stage):
+        try:
+            with open(self(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise SystemExit(f'{self(name)} is missing, run the {stage!r} stage first')
+
+    def write_json(self, name, payload):
+        with open(self(name), 'w') as f:
+            json.dump(payload, f, indent=2, default=float)
+
+    def frame(self, name, stage):
+        from detail_views.loading import read_frame
+        try:
+            return read_frame(self(name))
+        except FileNotFoundError:
+            raise SystemExit(f'{self(name)} is missing, run the {stage!r} stage first')
+
+    def split(self):
+        from detail_views.matrix_cache import load_split
+        return load_split(self.read_json('split.json', 'features')['path'])
+
+
+def stage_load(work, args):
+    from detail_views.loading import load_items, write_frame
+    df = load_items(args.data, cache_dir=args.cache_dir)
+    write_frame(df, work('items'))
+    return {'rows': len(df)}
+
+
+def stage_clean(work, args):
+    from detail_views.loading import write_frame
+    from detail_views.validation import validate_items
+    df, report = validate_items(work.frame('items', 'load'))
+    write_frame(df, work('clean'))
+    report.to_csv(work('validation.csv'))
+    violations = report.loc[report['count'] > 0, 'count']
+    return {'rows': len(df), 'violations': violations.to_dict()}
+
+
+def stage_features(work, args):
+    from detail_views.matrix_cache import cached_split
+    split = cached_split(work.frame('clean', 'clean'), cache_dir=os.path.join(args.cache_dir, 'matrices'))
+    work.write_json('split.json', {'path': split.path})
+    return {'train_rows': len(split.y_train), 'test_rows': len(split.y_test)}
+
+
+def stage_evaluate(work, args):
+    from detail_views import models
+    from detail_views.harness import evaluate_models
+    from detail_views.scoring import scoring_with_n_iter
+    split = work.split()
+    leaderboard, _ = evaluate_models(split.X_train, split.y_train, models.build(), cv=args.cv,
+                                     scoring=scoring_with_n_iter(), cpu_budget=args.cpus, verbose=False,
+                                     farm=args.task_farm)
+    leaderboard.to_csv(work('leaderboard.csv'))
+    return {'best': leaderboard['RMSE'].idxmin()}
+
+
+def stage_tune(work, args):
+    from detail_views.tuning import search_xgb
+    split = work.split()
+    table = search_xgb(split.X_train, split.y_train, DEFAULT_GRID, cv=args.cv, verbose=False, farm=args.task_farm)
+    table.drop(columns='params').to_csv(work('tuning.csv'), index=False)
+    best = {k: v.item() if hasattr(v, 'item') else v for k, v in table['params'].iloc[0].items()}
+    work.write_json('best_params.json', best)
+    return best
+
+
+def stage_fit(work, args):
+    import xgboost as xgb
+    from sklearn.pipeline import Pipeline
+
+    from detail_views.artifact import save_model
+    from detail_views.features import FEATURE_TYPES, FeatureScaler
+    from detail_views.imputation import GroupImputer
+    from detail_views.scoring import regression_scores
+
+    split = work.split()
+    params = work.read_json('best_params.json', 'tune') if os.path.exists(work('best_params.json')) else {}
+    scaler = FeatureScaler().fit(split.X_train)
+    model = xgb.XGBRegressor(objective='reg:squarederror', **params, tree_method='hist', enable_categorical=True,
+                             feature_types=FEATURE_TYPES, n_jobs=args.cpus)
+    model.fit(scaler.transform(split.X_train), split.y_train)
+    # the feature transform was fitted when the split was built
+    pipeline = Pipeline([('listingfeatures', split.transformer), ('standardscaler', scaler),
+                         ('xgbregressor', model)])
+    scores = regression_scores(split.y_test, pipeline[1:].predict(split.X_test))
+    # listings scored later may lack view counts, filled from the group statistics of the training data
+    imputer = GroupImputer().fit(work.frame('clean', 'clean'))
+    path = save_model(pipeline, work('models'), metadata={'params': params, 'test_scores': scores},
+                      imputer=imputer)
+    work.write_json('model.json', {'path': path, 'test_scores': scores})
+    return {'model': path, 'test_r2': scores['r2']}
+
+
+def stage_importance(work, args):
+    import pandas as pd
+
+    from detail_views.artifact import load_model
+    from detail_views.features import FEATURES
+    from detail_views.importance import permutation_importance_batched
+
+    split = work.split()
+    artifact = load_model(work.read_json('model.json', 'fit')['path'])
+    result = permutation_importance_batched(artifact.pipeline[1:], split.X_test, split.y_test)
+    table = pd.DataFrame({'importance': result.importances_mean, 'std': result.importances_std},
+                         index=FEATURES)
+    table.to_csv(work('importance.csv'))
+    return {'top': table['importance'].idxmax()}
+
+
+def stage_report(work, args):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    written = []
+    if os.path.exists(work('leaderboard.csv')):
+        leaderboard = pd.read_csv(work('leaderboard.csv'), index_col=0)
+        print(leaderboard.to_string())
+        ax = leaderboard[['MAE', 'RMSE']].plot.barh(figsize=(8, 4))
+        ax.set_title('Cross-validation errors')
+        ax.figure.tight_layout()
+        ax.figure.savefig(work('leaderboard.png'))
+        written.append(work('leaderboard.png'))
+    if os.path.exists(work('importance.csv')):
+        importance = pd.read_csv(work('importance.csv'), index_col=0)
+        fig, ax = plt.subplots()
+        importance['importance'].plot.bar(yerr=importance['std'], ax=ax)
+        ax.set_title('Permutation feature importance (test data)')
+        ax.set_ylabel('Mean accuracy decrease')
+        fig.tight_layout()
+        fig.savefig(work('importance.png'))
+        written.append(work('importance.png'))
+    return {'figures': written}
+
+
+def task_farm(args):
+    if not args.farm and not args.farm_workers:
+        return contextlib.nullcontext()
+    from detail_views.taskfarm import TaskFarm, authkey_from_env, parse_address
+
+    if args.farm:
+        return TaskFarm(parse_address(args.farm), authkey_from_env(), local_workers=args.farm_workers)
+    return TaskFarm(local_workers=args.farm_workers)
+
+
+def run(args):
+    stages = STAGES if args.stages == 'all' else args.stages.split(',')
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f'unknown stages: {", ".join(sorted(unknown))}')
+    work = Workdir(args.workdir)
+    with task_farm(args) as farm:
+        args.task_farm = farm
+        if farm is not None:
+            print(f'task farm serving on {farm.address[0]}:{farm.address[1]}')
+        for name in STAGES:
+            if name not in stages:
+                continue
+            start = time.perf_counter()
+            with stage(f'stage/{name}'):
+                summary = globals()[f'stage_{name}'](work, args)
+            print(f'[{name}] {time.perf_counter() - start:.2f}s {json.dumps(summary, default=str)}')
+
+
+def score(args):
+    from detail_views.artifact import load_model
+    from detail_views.batch_scoring import score_file
+
+    artifact = load_model(args.model)
+    summary = score_file(artifact, args.input, args.output, chunk_rows=args.chunk_rows,
+                         n_workers=args.workers, verbose=False)
+    print(f"scored {summary['rows']} listings with model version {artifact.version} "
+          f"in {summary['seconds']:.2f}s ({summary['rows_per_sec']:.0f} rows/sec)")
+
+
+def profile(args):
+    from detail_views.summary import summarize_file
+
+    start = time.perf_counter()
+    summary = summarize_file(args.input, chunk_rows=args.chunk_rows, n_workers=args.workers)
+    os.makedirs(args.output, exist_ok=True)
+    summary.describe().to_csv(os.path.join(args.output, 'describe.csv'))
+    summary.describe('category').to_csv(os.path.join(args.output, 'describe_categorical.csv'))
+    summary.corr().to_csv(os.path.join(args.output, 'corr.csv'))
+    print(f'profiled {summary.rows} listings in {time.perf_counter() - start:.2f}s')
+
+
+def backtest(args):
+    from detail_views import models
+    from detail_views.backtest import backtest as run_backtest
+
+    work = Workdir(args.workdir)
+    start = time.perf_counter()
+    table = run_backtest(work.frame('clean', 'clean'), models.build(args.models), test_days=args.test_days,
+                         train_days=args.train_days, step_days=args.step_days, gap_days=args.gap_days,
+                         n_workers=args.workers, verbose=False)
+    table.to_csv(work('backtest.csv'), index=False)
+    print(f"backtested {len(table)} (model, window) pairs in {time.perf_counter() - start:.2f}s, "
+          f"written to {work('backtest.csv')}")
+
+
+def worker(args):
+    from detail_views.taskfarm import authkey_from_env, parse_address, run_workers
+    run_workers(parse_address(args.connect), authkey_from_env(), args.processes)
+
+
+def update(args):
+    from detail_views.artifact import load_model
+    from detail_views.cleaning import clean_items
+    from detail_views.incremental import update_model
+    from detail_views.loading import read_items_csv
+
+    artifact = load_model(args.model)
+    new_df = clean_items(read_items_csv(args.new))
+    holdout_df = clean_items(read_items_csv(args.holdout))
+    full_df = clean_items(read_items_csv(args.full)) if args.full else None
+    directory = args.model if os.path.isdir(args.model) else os.path.dirname(args.model)
+    _, report = update_model(artifact, new_df, holdout_df, n_trees=args.trees,
+                             max_degradation=args.max_degradation, max_drift=args.max_drift,
+                             full_df=full_df, directory=directory)
+    print(json.dumps(report, default=float))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m detail_views',
+                                     description='Train and score the detail_views model.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run pipeline stages')
+    run_parser.add_argument('--stages', default='all', help=f'comma separated subset of {",".join(STAGES)}')
+    run_parser.add_argument('--data', default='Items_Cars_Data.csv')
+    run_parser.add_argument('--workdir', default='artifacts')
+    run_parser.add_argument('--cache-dir', default='.cache')
+    run_parser.add_argument('--cv', type=int, default=5)
+    run_parser.add_argument('--cpus', type=int, default=os.cpu_count())
+    run_parser.add_argument('--farm', help='host:port to serve the evaluate/tune tasks on for task farm workers')
+    run_parser.add_argument('--farm-workers', type=int, default=0, help='task farm workers started on this machine')
+    run_parser.set_defaults(func=run)
+
+    backtest_parser = commands.add_parser('backtest', help='time-ordered backtest over created_date windows')
+    backtest_parser.add_argument('--workdir', default='artifacts', help='work directory of a run with the clean stage')
+    backtest_parser.add_argument('--models', nargs='+', help='registered model names (default: all)')
+    backtest_parser.add_argument('--test-days', type=int, default=14)
+    backtest_parser.add_argument('--train-days', type=int, help='rolling training window (default: expanding)')
+    backtest_parser.add_argument('--step-days', type=int, help='days between cutoffs (default: --test-days)')
+    backtest_parser.add_argument('--gap-days', type=int, default=0)
+    backtest_parser.add_argument('--workers', type=int)
+    backtest_parser.set_defaults(func=backtest)
+
+    worker_parser = commands.add_parser('worker', help='run task farm workers for a coordinator')
+    worker_parser.add_argument('--connect', required=True, help='host:port of the coordinator')
+    worker_parser.add_argument('--processes', type=int, default=1)
+    worker_parser.set_defaults(func=worker)
+
+    score_parser = commands.add_parser('score', help='score a listings file with a saved model')
+    score_parser.add_argument('--model', default='artifacts/models', help='artifact file or model directory')
+    score_parser.add_argument('--input', required=True)
+    score_parser.add_argument('--output', required=True)
+    score_parser.add_argument('--chunk-rows', type=int, default=100_000)
+    score_parser.add_argument('--workers', type=int, default=4)
+    score_parser.set_defaults(func=score)
+
+    profile_parser = commands.add_parser('profile', help='summary statistics of an export, in one pass')
+    profile_parser.add_argument('--input', required=True)
+    profile_parser.add_argument('--output', default='profile', help='directory for the describe/corr tables')
+    profile_parser.add_argument('--chunk-rows', type=int, default=100_000)
+    profile_parser.add_argument('--workers', type=int, default=4)
+    profile_parser.set_defaults(func=profile)
+
+    update_parser = commands.add_parser('update', help='continue a saved model on new listings')
+    update_parser.add_argument('--model', default='artifacts/models', help='artifact file or model directory')
+    update_parser.add_argument('--new', required=True, help='export with the new listings')
+    update_parser.add_argument('--holdout', required=True, help='export used to check the update')
+    update_parser.add_argument('--full', help='full export, used for a retrain if the update is rejected')
+    update_parser.add_argument('--trees', type=int, default=50)
+    update_parser.add_argument('--max-degradation', type=float, default=0.02)
+    update_parser.add_argument('--max-drift', type=float, default=0.5)
+    update_parser.set_defaults(func=update)
+
+    args = parser.parse_args(argv)
+    with stage(f'command/{args.command}'):
+        args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
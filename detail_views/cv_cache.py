@@ -0,0 +1,205 @@
+"""Content-addressed on-disk cache of cross_validate results.
+
+Entries are keyed on the estimator class and its parameters (recursively
+for pipelines), a fingerprint of the data, the CV splitter, the scoring
+list, the cross_validate arguments that change the results and the data
+path (XGBoost models train natively, see xgb_data), and hold the
+per-fold scores and fit/score times (and train scores when asked for).
+The cache directory is kept under ``max_bytes`` by evicting the least
+recently used entries.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.model_selection import cross_validate
+
+from detail_views.instrument import enabled, stage
+from detail_views.matrix_cache import frame_fingerprint
+from detail_views.scoring import SCORING
+
+CACHE_DIR = '.cache/cv'
+MAX_BYTES = 64 * 2**20
+
+# cross_validate arguments that only change how the folds are run
+EXECUTION_KWARGS = ('n_jobs', 'verbose', 'pre_dispatch')
+# arguments that change the results; they are part of the key
+RESULT_KWARGS = ('groups', 'return_train_score', 'error_score')
+
+
+def estimator_key(estimator):
+    """JSON-able description of an estimator and its (nested) parameters."""
+    if hasattr(estimator, 'get_params') and not isinstance(estimator, type):
+        cls = type(estimator)
+        params = estimator.get_params(deep=False)
+        return [f'{cls.__module__}.{cls.__qualname__}',
+                {k: estimator_key(v) for k, v in sorted(params.items())}]
+    if isinstance(estimator, (list, tuple)):
+        return [estimator_key(v) for v in estimator]
+    if isinstance(estimator, dict):
+        return {str(k): estimator_key(v) for k, v in sorted(estimator.items())}
+    if isinstance(estimator, (str, int, float, bool)) or estimator is None:
+        return estimator
+    return repr(estimator)
+
+
+def data_fingerprint(*arrays):
+    h = hashlib.sha256()
+    for a in arrays:
+        if isinstance(a, (pd.DataFrame, pd.Series)):
+            h.update(frame_fingerprint(a.to_frame() if isinstance(a, pd.Series) else a).encode())
+            continue
+        a = np.ascontiguousarray(a)
+        h.update(f'{a.dtype.str}{a.shape}'.encode())
+        h.update(memoryview(a).cast('B'))
+    return h.hexdigest()
+
+
+def result_options(kwargs):
+    """Key of the cross_validate arguments in ``kwargs`` that change the results.
+
+    Arguments with results that are not JSON arrays (``return_estimator``,
+    ``return_indices``) or that are not fingerprinted (``params``) raise.
+    """
+    unknown = set(kwargs).difference(EXECUTION_KWARGS, RESULT_KWARGS)
+    if unknown:
+        raise ValueError(f'cannot cache cross_validate with {", ".join(sorted(unknown))}, pass cache_dir=None')
+    options = {}
+    for name in RESULT_KWARGS:
+        if kwargs.get(name) is not None:
+            options[name] = data_fingerprint(kwargs[name]) if name == 'groups' else repr(kwargs[name])
+    return options
+
+
+def cache_key(estimator, X, y, cv, scoring, options=None):
+    cv_key = f'KFold(n_splits={cv})' if isinstance(cv, int) else repr(cv)
+    config = [estimator_key(estimator), data_fingerprint(X, y), cv_key, list(scoring)]
+    if options:
+        config.append(options)
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def estimator_params(estimator):
+    """Scalar parameters of an estimator (nested ones as ``step__param``)."""
+    return {k: v for k, v in estimator.get_params(deep=True).items()
+            if isinstance(v, (str, int, float, bool)) or v is None}
+
+
+class TracedEstimator(RegressorMixin, BaseEstimator):
+    """Regressor recording each fit and predict as an instrumentation stage.
+
+    cross_validate has no per-fold hook, so the folds are traced by wrapping
+    the estimator, after the cache key has been computed on the original.
+    """
+
+    def __init__(self, estimator, name=None):
+        self.estimator = estimator
+        self.name = name
+
+    def fit(self, X, y, **fit_params):
+        with stage('cv/fold_fit', rows=len(X), model=self.name, params=estimator_params(self.estimator)):
+            self.estimator_ = clone(self.estimator).fit(X, y, **fit_params)
+        return self
+
+    def predict(self, X):
+        with stage('cv/fold_predict', rows=len(X), model=self.name):
+            return self.estimator_.predict(X)
+
+
+def native_model(estimator, X, scoring, kwargs):
+    """The XGBRegressor trained by xgb_data.cross_validate_xgb for these arguments, else None."""
+    from detail_views import xgb_data
+
+    if not isinstance(X, np.ndarray) or not xgb_data.supports(scoring) or set(kwargs) - set(EXECUTION_KWARGS):
+        return None
+    return xgb_data.tree_model(estimator)
+
+
+def _cross_validate(estimator, X, y, name, cv, scoring, **kwargs):
+    from detail_views import xgb_data
+
+    model = native_model(estimator, X, scoring, kwargs)
+    if model is not None:
+        return xgb_data.cross_validate_xgb(model, X, np.asarray(y), cv=cv, scoring=scoring, name=name)
+    if enabled():
+        estimator = TracedEstimator(estimator, name)
+    return cross_validate(estimator, X, y, cv=cv, scoring=scoring, **kwargs)
+
+
+def cached_cross_validate(estimator, X, y, cv=5, scoring=SCORING, cache_dir=CACHE_DIR,
+                          max_bytes=MAX_BYTES, name=None, **kwargs):
+    """``cross_validate`` with results memoized on disk.
+
+    Returns the same dict of per-fold arrays (``test_<scorer>``,
+    ``fit_time``, ``score_time``). Extra keyword arguments are passed to
+    cross_validate: ``groups``, ``return_train_score`` and ``error_score``
+    are part of the key, ``n_jobs``, ``verbose`` and ``pre_dispatch`` are
+    not, and any other raises ValueError unless ``cache_dir`` is None.
+    ``name`` only labels the traced folds when instrumentation is on.
+    """
+    # a shuffling splitter without a seed gives different folds on every call
+    unseeded = getattr(cv, 'shuffle', False) and getattr(cv, 'random_state', 0) is None
+    if cache_dir is None or unseeded:
+        return _cross_validate(estimator, X, y, name, cv=cv, scoring=scoring, **kwargs)
+
+    path = entry_path(estimator, X, y, cv, scoring, cache_dir, **kwargs)
+    result = read_entry(path, name)
+    if result is None:
+        result = _cross_validate(estimator, X, y, name, cv=cv, scoring=scoring, **kwargs)
+        write_entry(path, result, max_bytes)
+    return result
+
+
+def entry_path(estimator, X, y, cv, scoring, cache_dir=CACHE_DIR, **kwargs):
+    options = result_options(kwargs)
+    if native_model(estimator, X, scoring, kwargs) is not None:
+        # the native booster does not reproduce the scores of XGBRegressor.fit bit for bit
+        options['data_path'] = 'xgb_native'
+    key = cache_key(estimator, X, y, cv, scoring, options)
+    return os.path.join(cache_dir, key + '.json')
+
+
+def read_entry(path, name=None):
+    """The cached result at ``path``, or None on a miss."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    os.utime(path)
+    with stage('cv/cache_hit', model=name):
+        return {k: np.asarray(v) for k, v in entry.items()}
+
+
+def write_entry(path, result, max_bytes=MAX_BYTES):
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f'{path}.tmp{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump({k: np.asarray(v).tolist() for k, v in result.items()}, f)
+    os.replace(tmp, path)
+    evict(cache_dir, max_bytes)
+
+
+def evict(cache_dir, max_bytes=MAX_BYTES):
+    """Remove the least recently used entries until the directory fits in ``max_bytes``."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.json'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,124 @@
+"""Aggregated exploration plots whose cost depends on the number of bins, not rows.
+
+Scatter and strip plots are replaced by 2D histograms computed with one
+vectorized pass per column pair, and box plots are drawn from per-group
+quantiles computed with one groupby. The aggregates are small, so they can
+be computed on the full data and rendered (or stored) cheaply.
+"""
+
+from collections import namedtuple
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+Binned2D = namedtuple('Binned2D', ['counts', 'x_edges', 'y_edges', 'x', 'y'])
+
+# integer columns with at most this many distinct values get one bin per value
+MAX_DISCRETE_BINS = 200
+
+
+def bin_edges(values, bins=50):
+    """Histogram edges, one bin per value for integer columns of small range."""
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.linspace(0, 1, bins + 1)
+    lo, hi = values.min(), values.max()
+    if np.all(np.mod(values, 1) == 0) and hi - lo < MAX_DISCRETE_BINS:
+        return np.arange(lo - 0.5, hi + 1.5)
+    return np.linspace(lo, hi, bins + 1) if hi > lo else np.array([lo - 0.5, lo + 0.5])
+
+
+def histogram2d(df, x, y, bins=50):
+    xs = df[x].to_numpy(dtype=np.float64)
+    ys = df[y].to_numpy(dtype=np.float64)
+    finite = np.isfinite(xs) & np.isfinite(ys)
+    x_edges, y_edges = bin_edges(xs[finite], bins), bin_edges(ys[finite], bins)
+    counts, _, _ = np.histogram2d(xs[finite], ys[finite], bins=[x_edges, y_edges])
+    return Binned2D(counts, x_edges, y_edges, x, y)
+
+
+def binned_pairs(df, x_vars, y_vars, bins=50):
+    """2D histograms of every (x, y) column pair, as ``{(x, y): Binned2D}``."""
+    return {(x, y): histogram2d(df, x, y, bins) for y, x in product(y_vars, x_vars)}
+
+
+def plot_binned(binned, ax=None, cmap='viridis'):
+    """Render one Binned2D as a heatmap with a logarithmic color scale."""
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LogNorm
+
+    ax = ax or plt.gca()
+    counts = np.ma.masked_equal(binned.counts.T, 0)
+    if counts.count():
+        ax.pcolormesh(binned.x_edges, binned.y_edges, counts, cmap=cmap,
+                      norm=LogNorm(vmin=1, vmax=max(counts.max(), 1)))
+    ax.set_xlabel(binned.x)
+    ax.set_ylabel(binned.y)
+    return ax
+
+
+def plot_binned_pairs(pairs, height=4, aspect=1.0):
+    """Grid of heatmaps from binned_pairs (rows: y columns, columns: x columns)."""
+    import matplotlib.pyplot as plt
+
+    x_vars = list(dict.fromkeys(x for x, _ in pairs))
+    y_vars = list(dict.fromkeys(y for _, y in pairs))
+    fig, axes = plt.subplots(len(y_vars), len(x_vars), squeeze=False,
+                             figsize=(len(x_vars) * height * aspect, len(y_vars) * height))
+    for (x, y), binned in pairs.items():
+        ax = axes[y_vars.index(y), x_vars.index(x)]
+        if x == y:
+            counts, edges = binned.counts.sum(axis=1), binned.x_edges
+            ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge')
+            ax.set_xlabel(x)
+        else:
+            plot_binned(binned, ax)
+    fig.tight_layout()
+    return fig
+
+
+def box_stats(df, value, by=None, hue=None, whis=(1, 99)):
+    """Box plot statistics per group for ``Axes.bxp``.
+
+    Quartiles and whiskers (the ``whis`` percentiles) come from one groupby
+    quantile call. Outliers are not drawn, so the plot does not depend on
+    the number of rows.
+    """
+    keys = [k for k in (by, hue) if k is not None]
+    qs = [whis[0] / 100, 0.25, 0.5, 0.75, whis[1] / 100]
+    if keys:
+        table = df.groupby(keys, observed=True)[value].quantile(qs).unstack()
+    else:
+        table = pd.DataFrame([df[value].quantile(qs).to_numpy()], columns=qs, index=[value])
+    stats = []
+    for label, row in table.iterrows():
+        stats.append({'label': ' / '.join(map(str, label)) if isinstance(label, tuple) else str(label),
+                      'whislo': row[qs[0]], 'q1': row[qs[1]], 'med': row[qs[2]], 'q3': row[qs[3]],
+                      'whishi': row[qs[4]], 'fliers': []})
+    return stats
+
+
+def plot_box_stats(stats, ax=None, vert=True, ylabel=None):
+    import matplotlib.pyplot as plt
+
+    ax = ax or plt.gca()
+    ax.bxp(stats, showfliers=False, orientation='vertical' if vert else 'horizontal')
+    if ylabel:
+        (ax.set_ylabel if vert else ax.set_xlabel)(ylabel)
+    ax.tick_params(axis='x', labelrotation=90)
+    return ax
+
+
+def stratified_sample(df, by, n_per_group, random_state=0):
+    """At most ``n_per_group`` random rows of every group of ``by``."""
+    rng = np.random.default_rng(random_state)
+    codes = df.groupby(by, observed=True, sort=False).ngroup().to_numpy()
+    order = rng.permutation(len(df))
+    codes = codes[order]
+    # rank of every row within its group in the shuffled order
+    sorted_idx = np.argsort(codes, kind='stable')
+    starts = np.searchsorted(codes[sorted_idx], codes[sorted_idx], side='left')
+    rank = np.empty(len(df), dtype=np.int64)
+    rank[sorted_idx] = np.arange(len(df)) - starts
+    return df.iloc[np.sort(order[rank < n_per_group])]
@@ -0,0 +1,144 @@
+"""Single-pass feature transform for the listings frame."""
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.preprocessing import StandardScaler
+
+CATEGORICAL = ['product_tier', 'make_name']
+NUMERIC = ['price', 'first_zip_digit', 'first_registration_year', 'search_views', 'stock_days']
+FEATURES = ['product_tier', 'make_name', 'price', 'first_zip_digit', 'first_registration_year',
+            'search_views', 'stock_days', 'peak_season']
+TARGET = 'detail_views'
+# skewed columns, transformed with log10(x+1) since some of them contain 0
+LOG_COLUMNS = ['price', 'first_registration_year', 'search_views']
+INPUT_COLUMNS = CATEGORICAL + NUMERIC + ['created_date', 'deleted_date']
+# XGBoost feature types of the FEATURES columns: category codes ('c') and numbers ('q')
+FEATURE_TYPES = ['c' if col in CATEGORICAL else 'q' for col in FEATURES]
+# up to this many values a dict lookup per value beats building a hash table
+_SMALL_INPUT = 64
+
+# Spring: from March through the end of May, and Fall: from September through November
+PEAK_MONTHS = np.zeros(13, dtype=bool)
+PEAK_MONTHS[[3, 4, 5, 9, 10, 11]] = True
+
+_INV_LN10 = 1.0 / np.log(10.0)
+
+
+def months(dates):
+    """Calendar month (1-12) of a datetime column, computed on the raw datetime64 values."""
+    values = np.asarray(dates, dtype='datetime64[M]').astype(np.int64)
+    return (values % 12 + 1).astype(np.int8)
+
+
+def peak_season(created_date, deleted_date):
+    """1 when the listing was created or deleted in the peak season of car sales, else 0."""
+    return (PEAK_MONTHS[months(created_date)] | PEAK_MONTHS[months(deleted_date)]).astype(np.int8)
+
+
+def log_target(views):
+    return np.log10(np.asarray(views, dtype=np.float64) + 1)
+
+
+def inverse_target(y):
+    """Undo log_target, i.e. 10**y - 1."""
+    return np.power(10.0, y) - 1
+
+
+class CategoryEncoder:
+    """Frozen code table of one categorical column.
+
+    The codes are the positions in the sorted ``categories``. Missing and
+    unseen values get the extra ``unknown`` code (``len(categories)``), so
+    every code is a valid non-negative category for XGBoost and a new
+    make_name at scoring time does not fail.
+    """
+
+    def __init__(self, categories):
+        self.categories = pd.Index(categories)
+        self.unknown = len(self.categories)
+        self.codes = dict(zip(self.categories, range(self.unknown)))
+
+    @classmethod
+    def fit(cls, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.remove_unused_categories().cat.categories
+        else:
+            categories = pd.Index(pd.unique(values.dropna()))
+        return cls(categories.sort_values())
+
+    def encode(self, values):
+        """int32 codes of a Series."""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            if values.cat.categories.equals(self.categories):
+                return np.where(codes < 0, self.unknown, codes).astype(np.int32)
+            # one lookup per category of the input, then an array take per row;
+            # the appended entry catches the -1 code of missing values
+            table = np.append(self.categories.get_indexer(values.cat.categories), self.unknown)
+            table[table < 0] = self.unknown
+            return table.astype(np.int32)[codes]
+        if len(values) <= _SMALL_INPUT:
+            return np.fromiter((self.codes.get(v, self.unknown) for v in values), np.int32, len(values))
+        codes = self.categories.get_indexer(values).astype(np.int32)
+        codes[codes < 0] = self.unknown
+        return codes
+
+
+class ListingFeatures(BaseEstimator, TransformerMixin):
+    """Build the model feature matrix from the raw listings frame.
+
+    Fitting only freezes the category tables of product_tier and make_name
+    (one CategoryEncoder per column). ``transform`` writes the month based
+    peak_season flag, the log10(x+1) transforms and the category codes
+    straight into one preallocated float32 matrix with the columns of
+    FEATURES, so no intermediate copies of the frame are made. Missing and
+    unknown categories get the unknown code of their column.
+    """
+
+    def __init__(self, log_transform=True):
+        self.log_transform = log_transform
+
+    def fit(self, X, y=None):
+        self.encoders_ = {col: CategoryEncoder.fit(X[col]) for col in CATEGORICAL}
+        self.categories_ = {col: encoder.categories for col, encoder in self.encoders_.items()}
+        self.n_features_in_ = len(INPUT_COLUMNS)
+        return self
+
+    def transform(self, X):
+        out = np.empty((len(X), len(FEATURES)), dtype=np.float32)
+        for j, col in enumerate(FEATURES):
+            if col == 'peak_season':
+                out[:, j] = peak_season(X['created_date'], X['deleted_date'])
+            elif col in CATEGORICAL:
+                out[:, j] = self.encoders_[col].encode(X[col])
+            else:
+                out[:, j] = X[col].to_numpy()
+                if self.log_transform and col in LOG_COLUMNS:
+                    np.log1p(out[:, j], out=out[:, j])
+                    out[:, j] *= _INV_LN10
+        return out
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(FEATURES, dtype=object)
+
+
+class FeatureScaler(StandardScaler):
+    """StandardScaler that leaves the ``passthrough`` columns of FEATURES unscaled.
+
+    Used in front of XGBoost with native categorical splits, which needs the
+    category codes unchanged. Their mean and scale are pinned to 0 and 1.
+    """
+
+    def __init__(self, *, passthrough=tuple(CATEGORICAL), copy=True, with_mean=True, with_std=True):
+        super().__init__(copy=copy, with_mean=with_mean, with_std=with_std)
+        self.passthrough = passthrough
+
+    def partial_fit(self, X, y=None, sample_weight=None):
+        super().partial_fit(X, y, sample_weight)
+        columns = [FEATURES.index(col) for col in self.passthrough]
+        if self.mean_ is not None:
+            self.mean_[columns] = 0.0
+        if self.scale_ is not None:
+            self.scale_[columns] = 1.0
+        return self
@@ -0,0 +1,163 @@
+"""Concurrent evaluation of named model pipelines under a CPU budget.
+
+Each model is cross-validated in its own fresh process, so the peak memory
+of the process is the peak memory of that model. Models are started as long
+as the sum of their thread counts fits in the CPU budget, which lets
+single-threaded fits (SVR) overlap with multi-threaded ones (XGBoost). The
+leaderboard is built once from all results at the end.
+
+With ``farm`` (a taskfarm.TaskFarm) every (model, fold) pair is one task on
+the task farm instead, and the fold results are merged per model.
+"""
+
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from detail_views.cv_cache import CACHE_DIR, cached_cross_validate, entry_path, read_entry, write_entry
+from detail_views.instrument import stage
+from detail_views.matrix_cache import array_source, open_array
+from detail_views.models import ModelSpec
+from detail_views.scoring import SCORING, print_scores
+
+
+def _evaluate(estimator, threads, X, y, cv, scoring, cache_dir, name=None):
+    from threadpoolctl import threadpool_limits
+
+    X, y = open_array(X), open_array(y)
+    start = time.perf_counter()
+    with threadpool_limits(limits=threads), stage('evaluate/model', rows=len(X), model=name, threads=threads):
+        result = cached_cross_validate(estimator, X, y, cv=cv, scoring=scoring, cache_dir=cache_dir,
+                                       name=name)
+    wall_time = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result, wall_time, peak_memory
+
+
+def _evaluate_fold(estimator, threads, X, y, cv, fold, scoring, name=None):
+    from threadpoolctl import threadpool_limits
+
+    from detail_views.tuning import fold_splits
+
+    X, y = open_array(X), open_array(y)
+    start = time.perf_counter()
+    with threadpool_limits(limits=threads):
+        result = cached_cross_validate(estimator, X, y, cv=[fold_splits(len(y), cv)[fold]], scoring=scoring,
+                                       cache_dir=None, name=name)
+    wall_time = time.perf_counter() - start
+    return result, wall_time, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _evaluate_on_farm(farm, X, y, specs, cv, scoring, cache_dir, verbose):
+    from detail_views.taskfarm import shared_path
+
+    if not isinstance(cv, int):
+        raise ValueError('the task farm workers rebuild the folds, cv has to be a number of folds')
+    results = {}
+    submitted = {}
+    for name, spec in specs.items():
+        X_model, y_model = spec.data if spec.data is not None else (X, y)
+        path = entry_path(spec.estimator, X_model, y_model, cv, scoring, cache_dir) if cache_dir else None
+        cached = read_entry(path, name) if path else None
+        if cached is not None:
+            results[name] = (cached, np.nan, np.nan, spec.threads)
+            continue
+        sources = (shared_path(X_model), shared_path(y_model))
+        submitted[name] = (path, [farm.submit(_evaluate_fold, spec.estimator, spec.threads, *sources, cv, fold,
+                                              scoring, name) for fold in range(cv)])
+    for name, (path, futures) in submitted.items():
+        folds = [future.result() for future in futures]
+        result = {k: np.concatenate([fold[0][k] for fold in folds]) for k in folds[0][0]}
+        if path:
+            write_entry(path, result)
+        # the wall time of a model is the summed wall time of its fold tasks
+        results[name] = (result, sum(fold[1] for fold in folds), max(fold[2] for fold in folds),
+                         specs[name].threads)
+        if verbose:
+            print(name)
+            print_scores(result)
+    return results
+
+
+def evaluate_models(X, y, models, cv=5, scoring=SCORING, cpu_budget=None, cache_dir=CACHE_DIR,
+                    verbose=True, farm=None):
+    """Cross-validate ``models`` ({name: ModelSpec}) concurrently.
+
+    Returns ``(leaderboard, cv_results)``: one leaderboard row per model with
+    the mean scores, summed fit/score times, the wall time and the peak
+    memory (MB) of the model's process, and the raw cross_validate dicts.
+    With ``farm`` the folds run on the task farm workers, which open the
+    data by path (memory-mapped cache entries only); the wall time is then
+    the sum over the folds and the peak memory the largest worker's.
+    """
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    specs = {name: spec if isinstance(spec, ModelSpec) else ModelSpec(*spec)
+             for name, spec in models.items()}
+    if farm is not None:
+        results = _evaluate_on_farm(farm, X, y, specs, cv, scoring, cache_dir, verbose)
+        cv_results = {name: results[name][0] for name in models}
+        return leaderboard(cv_results, {name: results[name][1:] for name in models}), cv_results
+    pending = list(specs)
+    results = {}
+    running = {}
+    free = cpu_budget
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(cpu_budget, len(pending)) or 1, mp_context=context,
+                             max_tasks_per_child=1) as pool:
+        while pending or running:
+            for name in list(pending):
+                spec = specs[name]
+                threads = min(spec.threads, cpu_budget)
+                if threads > free:
+                    continue
+                X_model, y_model = spec.data if spec.data is not None else (X, y)
+                future = pool.submit(_evaluate, spec.estimator, threads, array_source(X_model),
+                                     array_source(y_model), cv, scoring, cache_dir, name)
+                running[future] = (name, threads)
+                pending.remove(name)
+                free -= threads
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, threads = running.pop(future)
+                free += threads
+                results[name] = future.result() + (threads,)
+                if verbose:
+                    print(name)
+                    print_scores(results[name][0])
+
+    names = [name for name in models if name in results]
+    cv_results = {name: results[name][0] for name in names}
+    return leaderboard(cv_results, {name: results[name][1:] for name in names}), cv_results
+
+
+def leaderboard(cv_results, timings=None):
+    """Mean scores per model, with the MAE, RMSE and R2 columns of the notebook table first.
+
+    Results scored with ``scoring_with_n_iter()`` also get the mean training
+    iterations and the mean fit time per fold (the time to converge).
+    """
+    timings = timings or {}
+    rows = []
+    for name, result in cv_results.items():
+        row = {
+            'MAE': -np.mean(result['test_neg_mean_absolute_error']),
+            'RMSE': -np.mean(result['test_neg_root_mean_squared_error']),
+            'R2': np.mean(result['test_r2']),
+            'Explained variance': np.mean(result['test_explained_variance']),
+            'fit_time': np.sum(result['fit_time']),
+            'score_time': np.sum(result['score_time']),
+        }
+        if 'test_n_iter' in result:
+            # with early stopping, the fit time of a fold is its time to converge
+            row['n_iter'] = np.mean(result['test_n_iter'])
+            row['time_to_converge'] = np.mean(result['fit_time'])
+        if name in timings:
+            row['wall_time'], row['peak_memory_mb'], row['threads'] = timings[name]
+        rows.append(row)
+    return pd.DataFrame(rows, index=list(cv_results))
@@ -0,0 +1,99 @@
+"""Hierarchical group-statistic imputation of missing view counts.
+
+At fit time the median (or another quantile) of every view column is
+precomputed per group on a hierarchy of levels, from product_tier x
+make_name x stock_days bucket down to the global value, into dense arrays
+indexed by the group codes. At transform time a missing value is filled
+with an O(1) array lookup at the finest level that has enough data, and
+the coarser levels are used as fallbacks.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+VIEW_COLUMNS = ['search_views', 'detail_views']
+GROUP_LEVELS = [('product_tier', 'make_name', 'stock_bucket'), ('product_tier', 'make_name'),
+                ('product_tier',), ()]
+STOCK_DAYS_BUCKETS = [0, 7, 14, 30, 60, 90, 120]
+
+
+class GroupImputer(BaseEstimator, TransformerMixin):
+    """Fill missing view counts with group quantiles, falling back to coarser groups.
+
+    Groups with fewer than ``min_count`` observed values are treated as
+    empty. Unknown categories fall through to the levels without them.
+    """
+
+    def __init__(self, columns=VIEW_COLUMNS, quantile=0.5, min_count=5, stock_days_buckets=STOCK_DAYS_BUCKETS):
+        self.columns = columns
+        self.quantile = quantile
+        self.min_count = min_count
+        self.stock_days_buckets = stock_days_buckets
+
+    def _codes(self, X):
+        codes = {}
+        for col in ('product_tier', 'make_name'):
+            codes[col] = self.categories_[col].get_indexer(X[col])
+        codes['stock_bucket'] = np.searchsorted(self.stock_days_buckets, X['stock_days'].to_numpy(), side='right')
+        return codes
+
+    def _shape(self, level):
+        sizes = {'product_tier': len(self.categories_['product_tier']),
+                 'make_name': len(self.categories_['make_name']),
+                 'stock_bucket': len(self.stock_days_buckets) + 1}
+        return tuple(sizes[name] for name in level)
+
+    def fit(self, X, y=None):
+        self.categories_ = {col: pd.Index(pd.unique(X[col].dropna())).sort_values()
+                            for col in ('product_tier', 'make_name')}
+        codes = self._codes(X)
+        self.tables_ = {}
+        for col in self.columns:
+            values = X[col].to_numpy(dtype=np.float64)
+            observed = ~np.isnan(values)
+            tables = []
+            for level in GROUP_LEVELS:
+                shape = self._shape(level)
+                table = np.full(shape, np.nan)
+                if level:
+                    # rows with a missing category (code -1) only count towards the coarser levels
+                    known = observed & np.logical_and.reduce([codes[name] >= 0 for name in level])
+                    keys = [codes[name][known] for name in level]
+                    groups = pd.Series(values[known]).groupby(keys)
+                    stats = groups.quantile(self.quantile)[groups.size() >= self.min_count]
+                    index = tuple(np.asarray(stats.index.get_level_values(i)) for i in range(len(level)))
+                    table[index] = stats.to_numpy()
+                elif observed.any():
+                    table[()] = np.quantile(values[observed], self.quantile)
+                tables.append(table)
+            self.tables_[col] = tables
+        return self
+
+    def transform(self, X):
+        X = X.copy(deep=False)
+        # the target column is absent when scoring new listings
+        missing = {col: X[col].isna().to_numpy(copy=True) for col in self.columns if col in X}
+        if not any(m.any() for m in missing.values()):
+            return X
+        codes = self._codes(X)
+        for col, todo in missing.items():
+            if not todo.any():
+                continue
+            filled = X[col].to_numpy(dtype=np.float64, copy=True)
+            for level, table in zip(GROUP_LEVELS, self.tables_[col]):
+                rows = np.flatnonzero(todo)
+                if level:
+                    keys = [codes[name][rows] for name in level]
+                    known = np.logical_and.reduce([k >= 0 for k in keys])
+                    rows = rows[known]
+                    values = table[tuple(k[known] for k in keys)]
+                else:
+                    values = np.full(len(rows), table[()])
+                found = ~np.isnan(values)
+                filled[rows[found]] = values[found]
+                todo[rows[found]] = False
+                if not todo.any():
+                    break
+            X[col] = filled.astype(X[col].dtype, copy=False) if X[col].dtype.kind == 'f' else filled
+        return X
@@ -0,0 +1,75 @@
+"""Incremental update of a saved model with a batch of new listings.
+
+The booster of the artifact is continued with ``n_trees`` extra trees fitted
+on the new batch only, so the cost is proportional to the new data. The
+scaler is deliberately left as it is: the existing trees split on its
+scaling, so the new trees have to see the same one. Running moments
+(partial_fit on a copy) only measure how far the new batch has drifted.
+The update is accepted only when the holdout error does not get worse by
+more than ``max_degradation`` and the drift stays below ``max_drift``;
+otherwise the model is fully retrained when the full data is given (which
+refits the scaler on it), or left unchanged.
+"""
+
+import copy
+
+import numpy as np
+from sklearn.base import clone
+
+from detail_views.artifact import ModelArtifact, save_model, versions
+from detail_views.features import INPUT_COLUMNS, TARGET, log_target
+from detail_views.scoring import regression_scores
+
+
+def scaler_drift(scaler, X_new):
+    """Largest shift of the feature means when ``X_new`` is added, in units of the old std."""
+    updated = copy.deepcopy(scaler).partial_fit(X_new)
+    shift = np.abs(updated.mean_ - scaler.mean_) / np.where(scaler.scale_ > 0, scaler.scale_, 1)
+    return float(shift.max())
+
+
+def update_model(artifact, new_df, holdout_df, n_trees=50, max_degradation=0.02, max_drift=0.5,
+                 full_df=None, directory=None):
+    """Continue ``artifact``'s booster on ``new_df`` and check the result on ``holdout_df``.
+
+    Returns ``(artifact, report)`` where the artifact is the updated, fully
+    retrained or unchanged model and ``report['action']`` says which. When
+    ``directory`` is given, a new model version is saved there.
+    """
+    features, scaler, booster = artifact.pipeline[0], artifact.pipeline[1], artifact.pipeline[-1]
+    X_new = features.transform(new_df)
+    y_new = log_target(new_df[TARGET])
+    X_holdout = scaler.transform(features.transform(holdout_df))
+    y_holdout = log_target(holdout_df[TARGET])
+
+    drift = scaler_drift(scaler, X_new)
+    before = regression_scores(y_holdout, booster.predict(X_holdout))
+
+    continued = clone(booster).set_params(n_estimators=n_trees)
+    continued.fit(scaler.transform(X_new), y_new, xgb_model=booster.get_booster())
+    after = regression_scores(y_holdout, continued.predict(X_holdout))
+
+    rmse_before = -before['neg_root_mean_squared_error']
+    rmse_after = -after['neg_root_mean_squared_error']
+    report = {'rows': len(new_df), 'drift': drift, 'rmse_before': rmse_before, 'rmse_after': rmse_after}
+
+    if drift <= max_drift and rmse_after <= rmse_before * (1 + max_degradation):
+        pipeline = copy.copy(artifact.pipeline)
+        pipeline.steps = pipeline.steps[:-1] + [(pipeline.steps[-1][0], continued)]
+        report['action'] = 'updated'
+    elif full_df is not None:
+        pipeline = clone(artifact.pipeline).fit(full_df[INPUT_COLUMNS], log_target(full_df[TARGET]))
+        scores = regression_scores(y_holdout, pipeline.predict(holdout_df))
+        report['rmse_after'] = -scores['neg_root_mean_squared_error']
+        report['action'] = 'retrained'
+    else:
+        report['action'] = 'rejected'
+        return artifact, report
+
+    metadata = dict(artifact.metadata, update=report, parent_version=artifact.version)
+    version = None
+    if directory is not None:
+        path = save_model(pipeline, directory, metadata=metadata, imputer=artifact.imputer)
+        report['model'] = path
+        version = versions(directory)[-1]
+    return ModelArtifact(pipeline, version, metadata, artifact.imputer), report
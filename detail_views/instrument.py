@@ -0,0 +1,215 @@
+"""Opt-in timing and memory instrumentation of the pipeline stages.
+
+Tracing is switched on by the environment, so it can stay in production
+jobs and costs one function call per stage when it is off:
+
+    DETAIL_VIEWS_TRACE=traces python -m detail_views run
+
+Every ``with stage(name, rows=..., **attrs)`` block records its wall time,
+the process CPU time, the resident memory at exit and the peak resident
+memory during the block, plus the given attributes. Events are appended to
+one JSONL file per process in a run directory under ``$DETAIL_VIEWS_TRACE``,
+so the worker processes of the harness and the tuning pool record into the
+same run. When the process that started the run exits, the events are
+merged into ``trace.json`` (Chrome trace format, open it in chrome://tracing
+or Perfetto) and a per-stage summary table is printed to stderr and written
+to ``summary.txt``.
+
+The peak memory of a block uses the kernel high-water mark (``VmHWM``),
+which is reset when a block starts. It is per process: blocks running
+concurrently on threads of one process see each other's allocations.
+"""
+
+import atexit
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+ENV_VAR = 'DETAIL_VIEWS_TRACE'
+# set by the process that starts a run, inherited by its workers
+RUN_ENV_VAR = 'DETAIL_VIEWS_TRACE_RUN'
+
+_local = threading.local()
+_lock = threading.Lock()
+_events_file = None
+_hwm_reset = None
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def _run_directory():
+    root = os.environ.get(ENV_VAR)
+    if not root:
+        return None
+    run = os.environ.get(RUN_ENV_VAR)
+    if run is None:
+        run = os.path.join(root, time.strftime('run-%Y%m%d-%H%M%S') + f'-{os.getpid()}')
+        os.makedirs(run, exist_ok=True)
+        os.environ[RUN_ENV_VAR] = run
+        atexit.register(finish, run)
+    return run
+
+
+def _memory_kb():
+    """Current and peak resident memory of the process in kilobytes."""
+    rss = hwm = 0
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1])
+                elif line.startswith('VmHWM:'):
+                    hwm = int(line.split()[1])
+    except OSError:
+        import resource
+        hwm = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss, hwm
+
+
+def _reset_peak():
+    # writing 5 to clear_refs resets VmHWM to the current RSS (Linux >= 4.0)
+    global _hwm_reset
+    if _hwm_reset is False:
+        return
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        _hwm_reset = True
+    except OSError:
+        _hwm_reset = False
+
+
+def _write(event):
+    global _events_file
+    with _lock:
+        if _events_file is None:
+            _events_file = open(os.path.join(RUN_DIR, f'events-{os.getpid()}.jsonl'), 'a')
+            name = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python'
+            _events_file.write(json.dumps({'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                                           'args': {'name': f'{name} ({os.getpid()})'}}) + '\n')
+        _events_file.write(json.dumps(event, default=repr) + '\n')
+        # worker processes end with os._exit, which skips buffered writes
+        _events_file.flush()
+
+
+class _Stage:
+    __slots__ = ('name', 'attrs', 'start_us', 'start_ns', 'cpu', 'rss', 'child_peak')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """Add attributes known only inside the block (e.g. the rows read)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault('stack', [])
+        self.rss, hwm = _memory_kb()
+        if stack:
+            # the peak of the enclosing block up to here, before it is reset
+            stack[-1].child_peak = max(stack[-1].child_peak, hwm)
+        self.child_peak = 0
+        _reset_peak()
+        stack.append(self)
+        self.cpu = time.process_time()
+        self.start_us = time.time_ns() // 1000
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_us = (time.perf_counter_ns() - self.start_ns) / 1000
+        cpu = time.process_time() - self.cpu
+        rss, hwm = _memory_kb()
+        stack = _local.stack
+        stack.pop()
+        peak = max(hwm, self.child_peak)
+        if stack:
+            stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        args = {'cpu_s': round(cpu, 6), 'rss_mb': round(rss / 1024, 1), 'peak_rss_mb': round(peak / 1024, 1),
+                'rss_delta_mb': round((rss - self.rss) / 1024, 1), **self.attrs}
+        if exc_type is not None:
+            args['error'] = exc_type.__name__
+        _write({'name': self.name, 'ph': 'X', 'ts': self.start_us, 'dur': duration_us, 'pid': os.getpid(),
+                'tid': threading.get_native_id(), 'args': args})
+        return False
+
+
+def stage(name, rows=None, **attrs):
+    """Context manager recording one pipeline stage; a no-op unless tracing is on."""
+    if RUN_DIR is None:
+        return _NULL_STAGE
+    if rows is not None:
+        attrs['rows'] = rows
+    return _Stage(name, attrs)
+
+
+def read_events(run_dir):
+    events = []
+    for path in sorted(glob.glob(os.path.join(run_dir, 'events-*.jsonl'))):
+        with open(path) as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    return events
+
+
+def summarize(events):
+    """One row per stage name: calls, total wall and CPU seconds, max peak memory, rows."""
+    rows = {}
+    for event in events:
+        if event.get('ph') != 'X':
+            continue
+        args = event['args']
+        row = rows.setdefault(event['name'], {'stage': event['name'], 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                              'peak_rss_mb': 0.0, 'rows': 0})
+        row['calls'] += 1
+        row['wall_s'] += event['dur'] / 1e6
+        row['cpu_s'] += args.get('cpu_s', 0.0)
+        row['peak_rss_mb'] = max(row['peak_rss_mb'], args.get('peak_rss_mb', 0.0))
+        row['rows'] += args.get('rows') or 0
+    return sorted(rows.values(), key=lambda row: -row['wall_s'])
+
+
+def format_summary(rows):
+    lines = [f'{"stage":<40} {"calls":>6} {"wall_s":>10} {"cpu_s":>10} {"peak_mb":>9} {"rows":>12}']
+    for row in rows:
+        lines.append(f'{row["stage"]:<40} {row["calls"]:>6} {row["wall_s"]:>10.3f} {row["cpu_s"]:>10.3f} '
+                     f'{row["peak_rss_mb"]:>9.1f} {row["rows"]:>12}')
+    return '\n'.join(lines)
+
+
+def finish(run_dir):
+    """Merge the events of a run into trace.json and write/print the summary table."""
+    if _events_file is not None:
+        _events_file.flush()
+    events = read_events(run_dir)
+    if not events:
+        return
+    with open(os.path.join(run_dir, 'trace.json'), 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    table = format_summary(summarize(events))
+    with open(os.path.join(run_dir, 'summary.txt'), 'w') as f:
+        f.write(table + '\n')
+    print(f'trace written to {os.path.join(run_dir, "trace.json")}\n{table}', file=sys.stderr)
+
+
+# resolved once at import, so a disabled stage() is a global lookup and a return
+RUN_DIR = _run_directory()
+
+
+def enabled():
+    return RUN_DIR is not None
@@ -0,0 +1,232 @@
+"""Parallel learning curves with all metrics computed in one pass.
+
+Every (train size, fold) cell is one task on a process pool; each cell
+scores the fitted model once under every metric of SCORING. As in
+sklearn's learning_curve, the subset of size n is the first n rows of the
+fold's training indices, so the subsets are nested.
+
+In incremental mode (XGBoost models) each fold is one task that keeps a
+single booster and continues training it on the growing subsets instead of
+refitting from zero; the preprocessing steps of the pipeline are fitted
+once on the full training fold.
+
+XGBoost models (alone or behind StandardScaler) train natively on
+quantized subsets (xgb_data.TrainingData), skipping the sklearn wrapper.
+The cuts are sketched once per fold from its full training set (memoized
+per worker), and every subset of the fold is quantized against them, so
+a size costs a quantization pass but no sketch. Unlike
+``XGBRegressor.fit`` on the subset alone, the small sizes thus use cuts
+from training rows they do not contain (never from the validation rows).
+
+Every task trains with ``threads`` threads (the model's n_jobs is
+overridden), and the pool runs as many tasks as the CPUs allow.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+
+from detail_views.cv_cache import data_fingerprint, estimator_key
+from detail_views.instrument import stage
+from detail_views.matrix_cache import array_source, open_array
+from detail_views.scoring import SCORING, regression_scores
+from detail_views.tuning import fold_splits
+from detail_views.xgb_data import TrainingData, booster_params, feature_types, tree_model
+
+CACHE_DIR = '.cache/learning_curves'
+
+LABELS = {
+    'explained_variance': 'Explained variance',
+    'neg_mean_absolute_error': 'Mean absolute error',
+    'neg_root_mean_squared_error': 'Root mean squared error',
+    'r2': 'R2',
+}
+
+_worker = {}
+
+
+def _init_worker(X, y, folds, threads):
+    _worker['X'] = open_array(X)
+    _worker['y'] = open_array(y)
+    _worker['folds'] = folds
+    _worker['threads'] = threads
+
+
+def default_train_sizes(n_samples, cv=5, n_sizes=10, min_size=100):
+    """Train sizes from ``min_size`` up to the full training fold, evenly spaced."""
+    n_train = n_samples - int(np.ceil(n_samples / cv))
+    sizes = np.linspace(min(min_size, n_train), n_train, n_sizes)
+    return np.unique(sizes.astype(int))
+
+
+def _training_data(model):
+    if 'data' not in _worker:
+        _worker['data'] = TrainingData(_worker['X'], _worker['y'], _worker['threads'],
+                                       feature_types=feature_types(model))
+    return _worker['data']
+
+
+def _subset_matrix(data, fold, train, size):
+    # the subsets of a fold share the cuts of the full training fold
+    fold_matrix = data.matrix(train, key=('train', fold))
+    return fold_matrix if size >= len(train) else data.matrix(train[:size], reference=fold_matrix)
+
+
+def _score_cell_xgb(model, fold, train, subset, test):
+    import xgboost as xgb
+
+    params, rounds = booster_params(model, _worker['threads'])
+    data = _training_data(model)
+    booster = xgb.train(params, _subset_matrix(data, fold, train, len(subset)), num_boost_round=rounds)
+    return (regression_scores(data.y[subset], data.predict(booster, subset)),
+            regression_scores(data.y[test], data.predict(booster, test)))
+
+
+def _score_cell(estimator, size, fold):
+    from threadpoolctl import threadpool_limits
+
+    X, y = _worker['X'], _worker['y']
+    train, test = _worker['folds'][fold]
+    subset = train[:size]
+    model = tree_model(estimator)
+    with threadpool_limits(limits=_worker['threads']), stage('learning_curve/cell', rows=size, fold=fold):
+        if model is not None:
+            return _score_cell_xgb(model, fold, train, subset, test)
+        model = clone(estimator).fit(X[subset], y[subset])
+        return (regression_scores(y[subset], model.predict(X[subset])),
+                regression_scores(y[test], model.predict(X[test])))
+
+
+def _score_fold_incremental(estimator, sizes, fold):
+    X, y = _worker['X'], _worker['y']
+    train, test = _worker['folds'][fold]
+    model = tree_model(estimator)
+    if model is not None:
+        return _score_fold_incremental_xgb(model, sizes, fold, train, test)
+    if isinstance(estimator, Pipeline):
+        prep, booster = clone(estimator[:-1]), clone(estimator[-1])
+        prep.fit(X[train])
+        transform = prep.transform
+    else:
+        booster, transform = clone(estimator), (lambda a: a)
+    X_train, X_test = transform(X[train]), transform(X[test])
+    y_train = y[train]
+
+    # spread the trees of the final model over the steps
+    trees = max(1, booster.get_params()['n_estimators'] // len(sizes))
+    booster.set_params(n_estimators=trees, n_jobs=_worker['threads'])
+    cells = []
+    previous = None
+    for size in sizes:
+        with stage('learning_curve/cell', rows=size, fold=fold, incremental=True):
+            booster.fit(X_train[:size], y_train[:size], xgb_model=previous)
+            previous = booster.get_booster()
+            cells.append((regression_scores(y_train[:size], booster.predict(X_train[:size])),
+                          regression_scores(y[test], booster.predict(X_test))))
+    return cells
+
+
+def _score_fold_incremental_xgb(model, sizes, fold, train, test):
+    import xgboost as xgb
+
+    params, rounds = booster_params(model, _worker['threads'])
+    data = _training_data(model)
+    trees = max(1, rounds // len(sizes))
+    cells = []
+    booster = None
+    for size in sizes:
+        with stage('learning_curve/cell', rows=size, fold=fold, incremental=True):
+            booster = xgb.train(params, _subset_matrix(data, fold, train, size), num_boost_round=trees,
+                                xgb_model=booster)
+            cells.append((regression_scores(data.y[train[:size]], data.predict(booster, train[:size])),
+                          regression_scores(data.y[test], data.predict(booster, test))))
+    return cells
+
+
+def curve_key(estimator, X, y, sizes, cv, incremental):
+    config = [estimator_key(estimator), data_fingerprint(X, y), [int(s) for s in sizes], cv,
+              SCORING, bool(incremental)]
+    if tree_model(estimator) is not None:
+        # scores of the native path, with the cuts of the full training folds
+        config.append('xgb_fold_cuts')
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def learning_curve_scores(estimator, X, y, train_sizes=None, cv=5, n_workers=None, threads=1, incremental=False,
+                          cache_dir=CACHE_DIR):
+    """Train and validation scores of ``estimator`` for growing training sizes.
+
+    Returns a dict with ``train_sizes`` and, for every metric of SCORING,
+    ``train_<metric>`` and ``test_<metric>`` arrays of shape
+    (n_sizes, n_folds). Results are cached as ``.npz`` in ``cache_dir``.
+    ``incremental`` needs an XGBRegressor, alone or as the last pipeline step.
+    Each task trains with ``threads`` threads on one of ``n_workers``
+    processes (by default as many as the CPUs allow).
+    """
+    if incremental:
+        from xgboost import XGBRegressor
+
+        final = estimator[-1] if isinstance(estimator, Pipeline) else estimator
+        if not isinstance(final, XGBRegressor):
+            raise ValueError(f'incremental learning curves continue an XGBRegressor, got {type(final).__name__}')
+    sizes = default_train_sizes(len(y), cv) if train_sizes is None else np.asarray(train_sizes)
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, curve_key(estimator, X, y, sizes, cv, incremental) + '.npz')
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                return dict(cached)
+
+    folds = fold_splits(len(y), cv)
+    if n_workers is None:
+        n_workers = max(1, (os.cpu_count() or 1) // threads)
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(array_source(X), array_source(y), folds, threads)) as pool:
+        if incremental:
+            futures = [pool.submit(_score_fold_incremental, estimator, sizes, fold) for fold in range(cv)]
+            cells = [future.result() for future in futures]
+            cell = lambda i, fold: cells[fold][i]  # noqa: E731
+        else:
+            futures = {(i, fold): pool.submit(_score_cell, estimator, size, fold)
+                       for i, size in enumerate(sizes) for fold in range(cv)}
+            cell = lambda i, fold: futures[i, fold].result()  # noqa: E731
+
+        result = {'train_sizes': sizes}
+        for name in SCORING:
+            result['train_' + name] = np.empty((len(sizes), cv))
+            result['test_' + name] = np.empty((len(sizes), cv))
+        for i in range(len(sizes)):
+            for fold in range(cv):
+                train_scores, test_scores = cell(i, fold)
+                for name in SCORING:
+                    result['train_' + name][i, fold] = train_scores[name]
+                    result['test_' + name][i, fold] = test_scores[name]
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f'{path}.tmp{os.getpid()}'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **result)
+        os.replace(tmp, path)
+    return result
+
+
+def plot_learning_curve(result, scoring='explained_variance', title=None, ax=None):
+    """Plot mean training and validation scores of a learning_curve_scores result."""
+    import matplotlib.pyplot as plt
+
+    ax = ax or plt.gca()
+    sign = -1 if scoring.startswith('neg_') else 1
+    ax.plot(result['train_sizes'], sign * result['train_' + scoring].mean(axis=1), label='Training error')
+    ax.plot(result['train_sizes'], sign * result['test_' + scoring].mean(axis=1), label='Validation error')
+    ax.set_ylabel(LABELS.get(scoring, scoring), fontsize=14)
+    ax.set_xlabel('Training set size', fontsize=14)
+    if title:
+        ax.set_title(title, fontsize=18, y=1.03)
+    ax.legend()
+    return ax
@@ -0,0 +1,154 @@
+"""Typed loading of Items_Cars_Data.csv with an on-disk columnar cache."""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from detail_views.instrument import stage
+
+# Declared schema of the raw export. ctr is read as text because the export
+# contains thousands-separator mangled values (e.g. 27.624.309.392.265.100);
+# it is recomputed from the view counts during cleaning.
+SCHEMA = {
+    'article_id': 'int64',
+    'product_tier': 'category',
+    'make_name': 'category',
+    'price': 'int32',
+    'first_zip_digit': 'int8',
+    'first_registration_year': 'int16',
+    'search_views': 'float32',
+    'detail_views': 'float32',
+    'stock_days': 'int16',
+    'ctr': 'string',
+}
+# read as text when the typed parse fails on thousands-separator mangled numbers
+# (12.950 for 12950); validation.repair_numeric_columns parses and casts them
+TEXT_NUMERIC_COLUMNS = ['price', 'first_zip_digit', 'first_registration_year', 'search_views',
+                        'detail_views', 'stock_days']
+TEXT_SCHEMA = {**SCHEMA, **dict.fromkeys(TEXT_NUMERIC_COLUMNS, 'string')}
+DATE_COLUMNS = ['created_date', 'deleted_date']
+DATE_FORMAT = '%d.%m.%y'
+CSV_OPTIONS = {'delimiter': ';'}
+
+_CACHE_VERSION = 1
+
+
+def read_items_csv(path, date_format=DATE_FORMAT, **kwargs):
+    """Parse the raw export with the declared schema and explicit date format.
+
+    When a numeric column holds mangled values the typed parse fails, and
+    the file is read again with those columns as text (TEXT_SCHEMA).
+    """
+    try:
+        df = pd.read_csv(path, dtype=SCHEMA, **CSV_OPTIONS, **kwargs)
+    except ValueError:
+        df = pd.read_csv(path, dtype=TEXT_SCHEMA, **CSV_OPTIONS, **kwargs)
+    return parse_dates(df, date_format)
+
+
+def parse_dates(df, date_format=DATE_FORMAT):
+    for col in DATE_COLUMNS:
+        try:
+            df[col] = pd.to_datetime(df[col], format=date_format)
+        except (ValueError, TypeError):
+            # unexpected layout in this export, fall back to the slow path
+            df[col] = pd.to_datetime(df[col], dayfirst=True)
+    return df
+
+
+def file_hash(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_format():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return 'pickle'
+    return 'parquet'
+
+
+def write_frame(df, stem):
+    """Write ``df`` to ``stem.parquet`` (``stem.pickle`` without pyarrow) and return the path."""
+    fmt = _cache_format()
+    path = f'{stem}.{fmt}'
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_pickle(path)
+    return path
+
+
+def read_frame(stem):
+    """Read a frame written by write_frame."""
+    if os.path.exists(f'{stem}.parquet'):
+        return pd.read_parquet(f'{stem}.parquet')
+    if os.path.exists(f'{stem}.pickle'):
+        return pd.read_pickle(f'{stem}.pickle')
+    raise FileNotFoundError(f'no frame stored at {stem}')
+
+
+def load_items(path='Items_Cars_Data.csv', cache_dir='.cache', date_format=DATE_FORMAT):
+    """Load the listings, reusing the columnar cache when the source is unchanged.
+
+    The cache is keyed on the source size and mtime; when only the mtime
+    changed, the content hash is compared before reparsing. Pass
+    ``cache_dir=None`` to always parse the CSV.
+    """
+    if cache_dir is None:
+        return read_items_csv(path, date_format)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    fmt = _cache_format()
+    data_path = os.path.join(cache_dir, f'{stem}.{fmt}')
+    meta_path = os.path.join(cache_dir, f'{stem}.meta.json')
+
+    stat = os.stat(path)
+    meta = {}
+    if os.path.exists(meta_path) and os.path.exists(data_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+    valid = (meta.get('version') == _CACHE_VERSION and meta.get('format') == fmt
+             and meta.get('date_format') == date_format and meta.get('size') == stat.st_size)
+    if valid and meta.get('mtime_ns') != stat.st_mtime_ns:
+        # touched but possibly unchanged: fall back to the content hash
+        digest = file_hash(path)
+        valid = meta.get('sha256') == digest
+        if valid:
+            meta['mtime_ns'] = stat.st_mtime_ns
+            _write_meta(meta_path, meta)
+
+    if valid:
+        with stage('load/cache', format=fmt) as timing:
+            df = read_frame(os.path.join(cache_dir, stem))
+            timing.set(rows=len(df))
+        return df
+
+    with stage('load/read_csv', path=path) as timing:
+        df = read_items_csv(path, date_format)
+        timing.set(rows=len(df))
+    write_frame(df, os.path.join(cache_dir, stem))
+    _write_meta(meta_path, {
+        'version': _CACHE_VERSION,
+        'format': fmt,
+        'date_format': date_format,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_hash(path),
+    })
+    return df
+
+
+def _write_meta(meta_path, meta):
+    tmp = meta_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
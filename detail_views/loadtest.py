@@ -0,0 +1,96 @@
+"""Load-test client for the scoring service.
+
+Each of ``--concurrency`` threads keeps one connection open and sends
+single-listing requests; the client reports throughput and latency
+percentiles.
+
+    python -m detail_views.loadtest --url http://127.0.0.1:8080 --requests 20000 --concurrency 32
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+EXAMPLE_LISTING = {
+    'product_tier': 'Basic', 'make_name': 'Volkswagen', 'price': 12950, 'first_zip_digit': 5,
+    'first_registration_year': 2014, 'search_views': 3091.0, 'stock_days': 31,
+    'created_date': '2018-07-24', 'deleted_date': '2018-08-24',
+}
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.unix_path)
+
+
+def connect(url=None, unix_socket=None):
+    if unix_socket:
+        return UnixHTTPConnection(unix_socket)
+    parsed = urlparse(url)
+    return http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+
+
+def run(url=None, unix_socket=None, n_requests=10000, concurrency=32, listing=None):
+    """Send ``n_requests`` single-listing requests and return the latency summary."""
+    body = json.dumps(listing or EXAMPLE_LISTING).encode()
+    headers = {'Content-Type': 'application/json'}
+    per_thread = [n_requests // concurrency + (i < n_requests % concurrency) for i in range(concurrency)]
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+
+    def worker(i):
+        conn = connect(url, unix_socket)
+        for _ in range(per_thread[i]):
+            start = time.perf_counter()
+            conn.request('POST', '/predict', body, headers)
+            response = conn.getresponse()
+            response.read()
+            latencies[i].append(time.perf_counter() - start)
+            errors[i] += response.status != 200
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    ms = np.concatenate([np.asarray(lat) for lat in latencies]) * 1000
+    return {
+        'requests': len(ms),
+        'errors': sum(errors),
+        'requests_per_sec': len(ms) / elapsed,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the detail_views scoring service.')
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--unix-socket')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args(argv)
+
+    summary = run(args.url, args.unix_socket, args.requests, args.concurrency)
+    for key, value in summary.items():
+        print(f'{key}: {value:.2f}' if isinstance(value, float) else f'{key}: {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Memory-mapped cache of the transformed train/test matrices.
+
+The final float32 matrices are written as ``.npy`` files in a directory named
+after a hash of the data fingerprint, the feature list, the transform
+settings and the split settings. Opening them with ``mmap_mode='r'`` is
+zero-copy, so worker processes that open the same files share one physical
+copy of the data through the page cache.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from detail_views.features import FEATURES, TARGET, ListingFeatures, log_target
+from detail_views.instrument import stage
+
+ARRAYS = ['X_train', 'X_test', 'y_train', 'y_test']
+
+FeatureSplit = namedtuple('FeatureSplit', ['path', 'X_train', 'X_test', 'y_train', 'y_test', 'transformer'])
+
+
+def frame_fingerprint(df):
+    """Content hash of a frame (values, column names and dtypes, not the index)."""
+    h = hashlib.sha256()
+    h.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def split_key(fingerprint, transformer, train_size, random_state):
+    config = {
+        'data': fingerprint,
+        'features': FEATURES,
+        'target': TARGET,
+        'transform': [type(transformer).__name__, transformer.get_params()],
+        'split': {'train_size': train_size, 'random_state': random_state},
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:20]
+
+
+def cached_split(df, transformer=None, cache_dir='.cache/matrices', train_size=0.7, random_state=100):
+    """Return the memory-mapped train/test matrices for ``df``, building them on a cache miss.
+
+    The transformer is fitted on the whole frame (the category tables), as
+    the label encoding in the notebook was, and stored next to the arrays.
+    Row order matches ``train_test_split(X, y, train_size=train_size,
+    random_state=random_state)`` on the same frame.
+    """
+    transformer = ListingFeatures() if transformer is None else transformer
+    key = split_key(frame_fingerprint(df), transformer, train_size, random_state)
+    path = os.path.join(cache_dir, key)
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        with stage('features/build_split', rows=len(df)):
+            _build_split(df, transformer, path, train_size, random_state)
+    return load_split(path)
+
+
+def _build_split(df, transformer, path, train_size, random_state):
+    tmp = f'{path}.tmp{os.getpid()}'
+    os.makedirs(tmp, exist_ok=True)
+    transformer = transformer.fit(df)
+    X = transformer.transform(df)
+    y = log_target(df[TARGET]).astype(np.float32)
+    train_idx, test_idx = train_test_split(np.arange(len(df)), train_size=train_size,
+                                           random_state=random_state)
+    arrays = {'X_train': X[train_idx], 'X_test': X[test_idx],
+              'y_train': y[train_idx], 'y_test': y[test_idx]}
+    for name, a in arrays.items():
+        np.save(os.path.join(tmp, f'{name}.npy'), np.ascontiguousarray(a, dtype=np.float32))
+    with open(os.path.join(tmp, 'transformer.pkl'), 'wb') as f:
+        pickle.dump(transformer, f)
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'features': FEATURES, 'rows': len(df), 'train_size': train_size,
+                   'random_state': random_state}, f)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # another process built the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_split(path, mmap_mode='r'):
+    arrays = [np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAYS]
+    with open(os.path.join(path, 'transformer.pkl'), 'rb') as f:
+        transformer = pickle.load(f)
+    return FeatureSplit(path, *arrays, transformer)
+
+
+def array_source(a):
+    """Path of a memory-mapped cache entry, so worker processes reopen it instead of unpickling a copy."""
+    if isinstance(a, np.memmap) and a.filename:
+        return a.filename
+    return a
+
+
+def open_array(path_or_array, mmap_mode='r'):
+    """Open a cached ``.npy`` file zero-copy; arrays are passed through."""
+    if isinstance(path_or_array, (str, os.PathLike)):
+        return np.load(path_or_array, mmap_mode=mmap_mode)
+    return path_or_array
@@ -0,0 +1,105 @@
+"""Registry of the candidate models compared in the notebook.
+
+Every entry is a factory building the pipeline for a given thread count,
+so the heavy model libraries are only imported when a model is built. The
+pipelines work on the feature matrix produced by ListingFeatures.
+"""
+
+from collections import namedtuple
+
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from detail_views.features import FEATURE_TYPES, FeatureScaler
+
+# data overrides the (X, y) passed to the harness for this model
+ModelSpec = namedtuple('ModelSpec', ['estimator', 'threads', 'data'], defaults=[1, None])
+
+MODELS = {}
+
+
+def register(name, threads=1):
+    def decorator(factory):
+        MODELS[name] = (factory, threads)
+        return factory
+    return decorator
+
+
+def build(names=None, **overrides):
+    """ModelSpecs of the registered models (all by default), in registration order.
+
+    ``overrides`` maps a model name to its thread count.
+    """
+    names = list(MODELS) if names is None else names
+    specs = {}
+    for name in names:
+        factory, threads = MODELS[name]
+        threads = overrides.get(name, threads)
+        specs[name] = ModelSpec(factory(threads), threads)
+    return specs
+
+
+@register('Linear regression log')
+def linear_regression(threads):
+    from sklearn.linear_model import LinearRegression
+    return make_pipeline(StandardScaler(), LinearRegression())
+
+
+@register('SVR log')
+def svr(threads):
+    from sklearn.svm import SVR
+    return make_pipeline(StandardScaler(), SVR(kernel='rbf', epsilon=0.1))
+
+
+# rank of the Nystroem approximation of the RBF kernel used by 'SVR fast log'; the
+# registry entry (and so the CLI) always uses it, other ranks are built in Python
+SVR_FAST_COMPONENTS = 500
+
+
+@register('SVR fast log')
+def svr_fast(threads, n_components=SVR_FAST_COMPONENTS):
+    """RBF SVR approximated by a Nystroem feature map and a linear epsilon-insensitive fit.
+
+    The fit is linear in the number of rows and a prediction costs
+    ``n_components`` kernel evaluations instead of one per support vector.
+    The kernel width matches SVR's gamma='scale' on standardized features.
+    ``build`` uses SVR_FAST_COMPONENTS; call ``svr_fast(threads,
+    n_components=...)`` for a ModelSpec of another rank.
+    """
+    from sklearn.kernel_approximation import Nystroem
+    from sklearn.svm import LinearSVR
+    return make_pipeline(StandardScaler(), Nystroem(kernel='rbf', n_components=n_components, random_state=100),
+                         LinearSVR(epsilon=0.1, loss='epsilon_insensitive', dual=True, max_iter=10000,
+                                   random_state=100))
+
+
+@register('XGB log', threads=4)
+def xgb_log(threads):
+    import xgboost as xgb
+    # category codes as native categorical splits, so they pass the scaler unchanged
+    return make_pipeline(FeatureScaler(), xgb.XGBRegressor(objective='reg:squarederror', max_depth=5,
+                                                           learning_rate=0.1, n_estimators=100,
+                                                           tree_method='hist', enable_categorical=True,
+                                                           feature_types=FEATURE_TYPES, n_jobs=threads))
+
+
+def _mlp(width):
+    # float32, stopped on a validation plateau instead of running to the iteration cap; the
+    # BLAS threads are limited to the registered count by the harness (threadpool_limits)
+    from detail_views.mlp import mlp_pipeline
+    return mlp_pipeline(width)
+
+
+@register('MLP 100 log', threads=2)
+def mlp_100(threads):
+    return _mlp(100)
+
+
+@register('MLP 500 log', threads=2)
+def mlp_500(threads):
+    return _mlp(500)
+
+
+@register('MLP 1000 log', threads=2)
+def mlp_1000(threads):
+    return _mlp(1000)
@@ -0,0 +1,46 @@
+"""Regression metrics shared by the evaluation and tuning stages."""
+
+import numpy as np
+from sklearn.metrics import explained_variance_score, mean_absolute_error, mean_squared_error, r2_score
+
+# same names as the sklearn scorers passed to cross_validate
+SCORING = ['explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2']
+
+
+def n_iter(estimator, X, y):
+    """Scorer reporting the training iterations of the final step (NaN if it has none)."""
+    final = estimator[-1] if hasattr(estimator, 'steps') else estimator
+    return float(np.max(getattr(final, 'n_iter_', np.nan)))
+
+
+def scoring_with_n_iter(scoring=SCORING):
+    """``scoring`` as a cross_validate scorer dict, plus the ``n_iter`` of each fold's fit."""
+    from sklearn.metrics import get_scorer
+    return {**{name: get_scorer(name) for name in scoring}, 'n_iter': n_iter}
+
+
+def regression_scores(y_true, y_pred):
+    """Scores of one fold under the cross_validate scorer names (errors negated)."""
+    return {
+        'explained_variance': explained_variance_score(y_true, y_pred),
+        'neg_mean_absolute_error': -mean_absolute_error(y_true, y_pred),
+        'neg_root_mean_squared_error': -np.sqrt(mean_squared_error(y_true, y_pred)),
+        'r2': r2_score(y_true, y_pred),
+    }
+
+
+def print_scores(scores, r2=True):
+    """Print the summary lines used throughout the notebook.
+
+    ``scores`` maps scorer names (with or without the ``test_`` prefix of a
+    cross_validate result) to per-fold values or their mean.
+    """
+    def mean(name):
+        value = scores[name] if name in scores else scores['test_' + name]
+        return np.mean(value)
+
+    print(f"Explained variance: {mean('explained_variance'):.3f}")
+    print(f"Mean absolute error: {-mean('neg_mean_absolute_error'):.3f}")
+    print(f"Root mean squared error: {-mean('neg_root_mean_squared_error'):.3f}")
+    if r2:
+        print(f"R2: {mean('r2'):.3f}")
@@ -0,0 +1,186 @@
+"""Local HTTP scoring service with micro-batching.
+
+Concurrent requests are queued and coalesced by one batching thread: the
+first queued request opens a window of ``window_ms`` milliseconds (or until
+``max_batch`` listings are queued), then the whole batch is scored with a
+single predict call and every waiting request gets its slice back. When
+the batch fails, its requests are scored one by one, so a malformed
+listing only fails the request that sent it.
+
+    python -m detail_views.serving --model models --port 8080
+    python -m detail_views.serving --model models --unix-socket /tmp/views.sock
+
+POST /predict takes one listing object or a list of them and returns
+``{"detail_views": [...]}``; GET /health returns the model version.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from detail_views.artifact import load_model, records_to_frame
+
+
+class _Pending:
+    __slots__ = ('records', 'done', 'result', 'error')
+
+    def __init__(self, records):
+        self.records = records
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesce concurrent predict calls into batches scored by ``predict_frame``."""
+
+    def __init__(self, predict_frame, window_ms=2.0, max_batch=512):
+        self.predict_frame = predict_frame
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def predict(self, records):
+        pending = _Pending(records)
+        self.queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            size = len(batch[0].records)
+            deadline = time.perf_counter() + self.window
+            while size < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item.records)
+            self._score(batch)
+
+    def _score(self, batch):
+        records = [record for pending in batch for record in pending.records]
+        try:
+            predictions = self.predict_frame(records_to_frame(records)).tolist()
+        except Exception as error:
+            if len(batch) > 1:
+                # find the request(s) at fault instead of failing the whole batch
+                for pending in batch:
+                    self._score([pending])
+                return
+            batch[0].error = error
+            batch[0].done.set()
+            return
+        start = 0
+        for pending in batch:
+            end = start + len(pending.records)
+            pending.result = predictions[start:end]
+            start = end
+            pending.done.set()
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._reply(404, {'error': 'not found'})
+        self._reply(200, {'status': 'ok', 'model_version': self.server.artifact.version})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            return self._reply(404, {'error': 'not found'})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            records = body if isinstance(body, list) else [body]
+            if not all(isinstance(record, dict) for record in records):
+                raise TypeError('a listing must be a JSON object')
+            predictions = self.server.batcher.predict(records)
+        except (ValueError, KeyError, TypeError) as error:
+            return self._reply(400, {'error': str(error)})
+        except Exception as error:
+            return self._reply(500, {'error': f'{type(error).__name__}: {error}'})
+        self._reply(200, {'detail_views': predictions})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # per-request logging costs more than the prediction
+        pass
+
+
+class TCPHTTPServer(ThreadingHTTPServer):
+    # the default backlog of 5 resets connections under concurrent load
+    request_queue_size = 1024
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects an (host, port) address
+        return request, ('local', 0)
+
+
+def make_server(artifact, host='127.0.0.1', port=8080, unix_socket=None, window_ms=2.0, max_batch=512):
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixHTTPServer(unix_socket, ScoringHandler)
+    else:
+        server = TCPHTTPServer((host, port), ScoringHandler)
+    server.artifact = artifact
+    server.batcher = MicroBatcher(artifact.predict_views, window_ms, max_batch)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve detail_views predictions over HTTP.')
+    parser.add_argument('--model', default='models', help='artifact file or model directory')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unix-socket', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--window-ms', type=float, default=2.0, help='micro-batching window')
+    parser.add_argument('--max-batch', type=int, default=512)
+    parser.add_argument('--threads', type=int, default=1, help='prediction threads of the model')
+    args = parser.parse_args(argv)
+
+    artifact = load_model(args.model)
+    model = artifact.pipeline[-1]
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=args.threads)
+    server = make_server(artifact, args.host, args.port, args.unix_socket, args.window_ms, args.max_batch)
+    where = args.unix_socket or f'http://{args.host}:{args.port}'
+    print(f'Serving model version {artifact.version} on {where}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
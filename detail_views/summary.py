@@ -0,0 +1,318 @@
+"""Single-pass summary statistics for exports that do not fit in memory.
+
+``StreamingSummary`` consumes chunks of listings and keeps, per numeric
+column, exact moments and extremes plus a mergeable quantile sketch, a
+pairwise co-moment matrix for Pearson correlation, and bounded top-k counts
+for the categorical columns. Summaries of different chunks can be merged in
+any order, so workers can summarize parts of a file independently. The
+outputs have the layout of ``df.describe()`` and ``df.corr()``.
+
+Moments and co-moments are accumulated with the pairwise update of Chan et
+al.: each chunk is centered on its own means before the sums are taken, so
+large values (prices, view counts) do not lose precision. Like
+``df.corr()``, correlations use the rows where both columns are present.
+
+``summarize_file`` reads a raw export, so every chunk is first brought to
+the types of the loaded frame (``prepare_chunk``) on its worker thread.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from detail_views.batch_scoring import read_chunks
+from detail_views.features import CATEGORICAL
+from detail_views.loading import DATE_FORMAT, parse_dates
+from detail_views.validation import parse_ctr, repair_numeric_columns
+
+PERCENTILES = (0.25, 0.5, 0.75)
+
+
+def _divide(a, b):
+    return np.divide(a, b, out=np.full(np.broadcast(a, b).shape, np.nan), where=b > 0)
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch in the style of KLL.
+
+    Values are kept in levels; an item at level ``h`` stands for ``2**h``
+    values. A full level is sorted and every other item (random offset) is
+    promoted to the next level. Lower levels get geometrically smaller
+    capacities, so memory is ``O(k)`` and the rank error is about ``1/k``.
+    Quantiles are exact while nothing has been compacted.
+    """
+
+    def __init__(self, k=2000, random_state=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self._rng = np.random.default_rng(random_state)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # an odd item out stays at this level
+                keep, items = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = keep
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        self.levels += [np.empty(0)] * (len(other.levels) - len(self.levels))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)
+        if len(self.levels) == 1:
+            return np.quantile(self.levels[0], q)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2.0 ** level)
+                                  for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        ranks = np.cumsum(weights[order])
+        position = np.searchsorted(ranks, q * ranks[-1], side='left')
+        return items[order][np.minimum(position, len(items) - 1)]
+
+
+class TopKCounter:
+    """Counts of the most frequent values, bounded to ``capacity`` entries.
+
+    When more values are seen, the Misra-Gries summary is kept: every count
+    is reduced by the ``capacity + 1``-th largest and the non-positive ones
+    are dropped. ``error`` bounds how much any count may be underestimated,
+    and ``unique`` is a lower bound once it is non-zero.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.count = 0
+        self.error = 0
+
+    def _add(self, counts):
+        counts = self.counts.add(counts, fill_value=0).astype(np.int64)
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        if len(counts) > self.capacity:
+            threshold = counts.iloc[self.capacity]
+            counts = counts.iloc[:self.capacity] - threshold
+            counts = counts[counts > 0]
+            self.error += threshold
+        self.counts = counts
+
+    def update(self, values):
+        counts = values.value_counts(sort=False)
+        counts.index = counts.index.astype(object)
+        self.count += int(counts.sum())
+        self._add(counts)
+        return self
+
+    def merge(self, other):
+        self.count += other.count
+        self.error += other.error
+        self._add(other.counts)
+        return self
+
+    @property
+    def unique(self):
+        return len(self.counts)
+
+    def top(self, k=10):
+        return self.counts.iloc[:k]
+
+
+class StreamingSummary:
+    """Summary statistics accumulated chunk by chunk.
+
+    ``numeric`` and ``categorical`` default to the numeric and the
+    category/string columns of the first chunk, as ``df.describe()`` picks
+    them.
+    """
+
+    def __init__(self, numeric=None, categorical=None, k=2000, capacity=1000, random_state=0):
+        self.numeric = None if numeric is None else list(numeric)
+        self.categorical = None if categorical is None else list(categorical)
+        self.k = k
+        self.capacity = capacity
+        self.random_state = random_state
+        self.rows = 0
+        self._ready = False
+
+    def _init(self, chunk):
+        if self.numeric is None:
+            self.numeric = list(chunk.select_dtypes('number').columns)
+        if self.categorical is None:
+            self.categorical = list(chunk.select_dtypes(['category', 'object', 'string']).columns)
+        p = len(self.numeric)
+        # [i, j] entries are over the rows where columns i and j are both present;
+        # the diagonal holds the per-column count, mean and sum of squared deviations
+        self.n = np.zeros((p, p))
+        self.mean = np.zeros((p, p))
+        self.m2 = np.zeros((p, p))
+        self.comoment = np.zeros((p, p))
+        self.min = np.full(p, np.inf)
+        self.max = np.full(p, -np.inf)
+        rng = np.random.default_rng(self.random_state)
+        self.sketches = [QuantileSketch(self.k, rng.integers(2**32)) for _ in self.numeric]
+        self.top = {column: TopKCounter(self.capacity) for column in self.categorical}
+        self._ready = True
+
+    def _merge_moments(self, n, mean, m2, comoment):
+        total = self.n + n
+        delta = mean - self.mean
+        weight = _divide(self.n * n, total)
+        self.mean = self.mean + np.nan_to_num(_divide(delta * n, total))
+        self.m2 = self.m2 + m2 + np.nan_to_num(delta ** 2 * weight)
+        self.comoment = self.comoment + comoment + np.nan_to_num(delta * delta.T * weight)
+        self.n = total
+
+    def update(self, chunk):
+        if not self._ready:
+            self._init(chunk)
+        self.rows += len(chunk)
+        X = chunk[self.numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+        present = np.isfinite(X)
+        with np.errstate(invalid='ignore'):
+            shift = np.nan_to_num(np.nanmean(np.where(present, X, np.nan), axis=0))
+        X0 = np.where(present, X - shift, 0.0)
+        P = present.astype(np.float64)
+
+        n = P.T @ P
+        sums = X0.T @ P
+        mean = np.nan_to_num(_divide(sums, n))
+        m2 = np.maximum((X0 ** 2).T @ P - mean * sums, 0.0)
+        comoment = X0.T @ X0 - mean * sums.T
+        self._merge_moments(n, mean + shift[:, None], m2, comoment)
+
+        with np.errstate(invalid='ignore'):
+            self.min = np.fmin(self.min, np.nanmin(np.where(present, X, np.nan), axis=0, initial=np.inf))
+            self.max = np.fmax(self.max, np.nanmax(np.where(present, X, np.nan), axis=0, initial=-np.inf))
+        for sketch, values in zip(self.sketches, X.T):
+            sketch.update(values)
+        for column, counter in self.top.items():
+            counter.update(chunk[column])
+        return self
+
+    def merge(self, other):
+        if not other._ready:
+            return self
+        if not self._ready:
+            self.__dict__.update(other.__dict__)
+            return self
+        if self.numeric != other.numeric or self.categorical != other.categorical:
+            raise ValueError(f'cannot merge summaries of different columns: {self.numeric} {self.categorical} '
+                             f'and {other.numeric} {other.categorical}')
+        self.rows += other.rows
+        self._merge_moments(other.n, other.mean, other.m2, other.comoment)
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        for sketch, sketch_other in zip(self.sketches, other.sketches):
+            sketch.merge(sketch_other)
+        for column, counter in self.top.items():
+            counter.merge(other.top[column])
+        return self
+
+    def describe(self, include='number', percentiles=PERCENTILES):
+        """Same layout as ``df.describe()``; ``include='category'`` for the categorical columns."""
+        if include == 'category':
+            rows = {}
+            for column, counter in self.top.items():
+                top = counter.top(1)
+                rows[column] = {'count': counter.count, 'unique': counter.unique,
+                                'top': top.index[0] if len(top) else np.nan,
+                                'freq': top.iloc[0] if len(top) else np.nan}
+            return pd.DataFrame(rows, index=['count', 'unique', 'top', 'freq'], dtype=object)
+
+        count = np.diag(self.n)
+        rows = {'count': count,
+                'mean': np.where(count > 0, np.diag(self.mean), np.nan),
+                'std': np.sqrt(_divide(np.diag(self.m2), count - 1)),
+                'min': np.where(count > 0, self.min, np.nan)}
+        quantiles = np.array([sketch.quantile(percentiles) for sketch in self.sketches]).reshape(-1, len(percentiles))
+        for i, q in enumerate(percentiles):
+            rows[f'{q * 100:g}%'] = quantiles[:, i]
+        rows['max'] = np.where(count > 0, self.max, np.nan)
+        return pd.DataFrame(rows, index=self.numeric).T
+
+    def corr(self):
+        """Pearson correlation over pairwise complete rows, as ``df.corr()``."""
+        with np.errstate(invalid='ignore'):
+            corr = _divide(self.comoment, np.sqrt(self.m2 * self.m2.T))
+        corr[self.n < 2] = np.nan
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.numeric, columns=self.numeric)
+
+
+def prepare_chunk(chunk, date_format=DATE_FORMAT):
+    """Raw export chunk with parsed dates, repaired counts and a numeric ctr (mangled values as NaN)."""
+    chunk, _ = repair_numeric_columns(parse_dates(chunk, date_format))
+    if 'ctr' in chunk:
+        chunk['ctr'], _ = parse_ctr(chunk['ctr'])
+    return chunk
+
+
+def _summarize_chunk(chunk, prepare, kwargs):
+    if prepare is not None:
+        chunk = prepare(chunk)
+    return StreamingSummary(**kwargs).update(chunk)
+
+
+def summarize_chunks(chunks, n_workers=4, prepare=None, **kwargs):
+    """Summarize an iterable of frames, each chunk on a worker thread.
+
+    ``prepare`` is applied to every chunk on its worker before it is
+    summarized. Columns not given are picked from the first chunk, which is
+    summarized before the others so that they all use the same columns. At
+    most ``2 * n_workers`` chunks are in flight; the partial summaries are
+    merged as they finish.
+    """
+    total = StreamingSummary(**kwargs)
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        for chunk in chunks:
+            if total.numeric is None or total.categorical is None:
+                total.merge(_summarize_chunk(chunk, prepare, kwargs))
+                kwargs = dict(kwargs, numeric=total.numeric, categorical=total.categorical)
+                continue
+            in_flight.append(pool.submit(_summarize_chunk, chunk, prepare, kwargs))
+            while len(in_flight) >= 2 * n_workers:
+                total.merge(in_flight.popleft().result())
+        while in_flight:
+            total.merge(in_flight.popleft().result())
+    return total
+
+
+def summarize_file(path, chunk_rows=100_000, n_workers=4, categorical=CATEGORICAL, date_format=DATE_FORMAT,
+                   **kwargs):
+    """Summarize a raw export without loading it whole.
+
+    The numeric columns include ctr; the dates are parsed and left out, as
+    ``df.describe()`` does.
+    """
+    return summarize_chunks(read_chunks(path, chunk_rows), n_workers,
+                            prepare=lambda chunk: prepare_chunk(chunk, date_format),
+                            categorical=categorical, **kwargs)
@@ -0,0 +1,165 @@
+"""Synthetic listings exports with the schema of Data_Description.csv.
+
+The marginals are calibrated on the summary statistics of the real export
+(78k listings, Jul-Nov 2018): a Zipf-like ``make_name`` distribution over
+91 manufacturers, a mostly Basic ``product_tier``, log-normal prices that
+fall with the car age, exponential ``stock_days`` and log-normal
+``search_views`` growing with the listing duration. ``detail_views`` is a
+binomial draw of the search impressions with a log-normal click through
+rate, so search and detail views are correlated as in the real data.
+A small fraction of rows carries the defects of the real export (missing
+views, mangled ctr, impossible registration years, negative stock days).
+
+Rows are generated in chunks from independent seeds, so a file of any size
+is reproducible and written in bounded memory.
+
+    python -m detail_views.synthetic --rows 1000000 --output Items_Cars_Data.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from detail_views.loading import CSV_OPTIONS, DATE_FORMAT
+
+COLUMNS = ['article_id', 'product_tier', 'make_name', 'price', 'first_zip_digit',
+           'first_registration_year', 'created_date', 'deleted_date', 'search_views',
+           'detail_views', 'stock_days', 'ctr']
+
+# ordered by frequency; the weights are 1 / rank**MAKE_EXPONENT
+MAKES = [
+    'Volkswagen', 'Mercedes-Benz', 'BMW', 'Opel', 'Audi', 'Ford', 'Renault', 'Peugeot', 'Skoda',
+    'Toyota', 'Fiat', 'Hyundai', 'Seat', 'Citroen', 'Nissan', 'Mazda', 'Kia', 'Volvo', 'Smart',
+    'MINI', 'Dacia', 'Porsche', 'Honda', 'Suzuki', 'Mitsubishi', 'Chevrolet', 'Land Rover', 'Jeep',
+    'Jaguar', 'Alfa Romeo', 'Subaru', 'Daihatsu', 'Chrysler', 'Lancia', 'Saab', 'Dodge', 'SsangYong',
+    'Maserati', 'Lexus', 'Infiniti', 'Cadillac', 'Ferrari', 'Bentley', 'Aston Martin', 'Tesla',
+    'DS Automobiles', 'Abarth', 'Lamborghini', 'Rolls-Royce', 'Lada', 'Rover', 'Daewoo', 'Isuzu',
+    'Corvette', 'Hummer', 'Lincoln', 'MG', 'Trabant', 'Wartburg', 'Piaggio', 'Lotus', 'Morgan',
+    'Buick', 'Pontiac', 'GMC', 'Ligier', 'Microcar', 'Aixam', 'Tata', 'Proton', 'Great Wall',
+    'Alpina', 'Caterham', 'Donkervoort', 'McLaren', 'Bugatti', 'Maybach', 'Santana', 'Artega',
+    'Austin', 'Triumph', 'Oldsmobile', 'Plymouth', 'Mercury', 'Datsun', 'Talbot', 'Borgward', 'NSU',
+    'DAF', 'Austin-Healey', 'Ruf',
+]
+MAKE_EXPONENT = 0.8
+TIERS = ['Basic', 'Premium', 'Plus']
+TIER_WEIGHTS = [0.963, 0.025, 0.012]
+# log effect of the tier on search impressions and on the click through rate
+TIER_SEARCH_EFFECT = np.array([0.0, 0.8, 0.5])
+TIER_CTR_EFFECT = np.array([0.0, 0.15, 0.1])
+ZIP_WEIGHTS = [0.12, 0.13, 0.12, 0.12, 0.11, 0.1, 0.11, 0.1, 0.09]
+
+FIRST_CREATED = np.datetime64('2018-07-01')
+CREATED_DAYS = 140
+REFERENCE_YEAR = 2018
+MAX_STOCK_DAYS = 127
+FIRST_ARTICLE_ID = 347_232_400
+
+
+def _make_price_effects():
+    # fixed log price level per manufacturer, independent of the data seed
+    return np.random.default_rng(len(MAKES)).normal(0.0, 0.3, len(MAKES))
+
+
+def _mangle(ctr):
+    # 0.027624309392265100 -> 27.624.309.392.265.100, as in the real export
+    digits = f'{ctr:.18f}'[2:].lstrip('0') or '0'
+    head = len(digits) % 3 or 3
+    return '.'.join([digits[:head]] + [digits[i:i + 3] for i in range(head, len(digits), 3)])
+
+
+def generate_items(n_rows, random_state=0, dirty=1e-4, first_row=0):
+    """A raw export frame of ``n_rows`` listings (dates and ctr as text).
+
+    ``first_row`` offsets the article ids, so chunks generated with
+    different seeds can be concatenated into one export.
+    """
+    rng = np.random.default_rng(random_state)
+    makes = np.array(MAKES, dtype=object)
+    make_weights = 1.0 / np.arange(1, len(MAKES) + 1) ** MAKE_EXPONENT
+    make = rng.choice(len(MAKES), n_rows, p=make_weights / make_weights.sum())
+    tier = rng.choice(len(TIERS), n_rows, p=TIER_WEIGHTS)
+
+    age = np.floor(rng.gamma(1.5, 4.5, n_rows))
+    year = np.maximum(REFERENCE_YEAR - age, 1924).astype(np.int64)
+    log_price = 9.3 + _make_price_effects()[make] - 0.09 * (age - 5) + rng.normal(0.0, 0.8, n_rows)
+    price = np.clip(np.round(np.exp(log_price)), 50, 250_000).astype(np.int64)
+
+    stock_days = np.minimum(np.floor(rng.exponential(36.0, n_rows)), MAX_STOCK_DAYS).astype(np.int64)
+    created = FIRST_CREATED + rng.integers(0, CREATED_DAYS, n_rows).astype('timedelta64[D]')
+
+    log_search = (6.82 + 0.45 * (np.log1p(stock_days) - np.log1p(25)) + TIER_SEARCH_EFFECT[tier]
+                  + rng.normal(0.0, 1.2, n_rows))
+    search_views = np.maximum(np.round(np.exp(log_search)), 1)
+    log_ctr = (-3.27 + TIER_CTR_EFFECT[tier] - 0.15 * (log_price - 9.3) + 0.02 * (age - 5)
+               + rng.normal(0.0, 0.6, n_rows))
+    clicks = rng.binomial(search_views.astype(np.int64), np.minimum(np.exp(log_ctr), 1.0))
+    detail_views = clicks.astype(np.float64)
+
+    defects = np.flatnonzero(rng.random(n_rows) < dirty)
+    kind = rng.integers(0, 4, len(defects))
+    missing = defects[kind == 0]
+    search_views[missing] = np.nan
+    detail_views[missing] = np.nan
+    year[defects[kind == 1]] = 2106
+    stock_days[defects[kind == 2]] = -rng.integers(1, 4, (kind == 2).sum())
+    deleted = created + stock_days.astype('timedelta64[D]')
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ctr = detail_views / search_views
+    ctr_text = pd.Series(ctr).astype(str).to_numpy(dtype=object)
+    ctr_text[missing] = np.nan
+    mangled = defects[kind == 3]
+    ctr_text[mangled] = [_mangle(value) for value in ctr[mangled]]
+
+    # few distinct days, so format each day once and index
+    days = np.arange(FIRST_CREATED - 5, FIRST_CREATED + CREATED_DAYS + MAX_STOCK_DAYS + 1)
+    day_text = pd.DatetimeIndex(days).strftime(DATE_FORMAT).to_numpy(dtype=object)
+    offset = (FIRST_CREATED - 5).astype(np.int64)
+
+    ids = FIRST_ARTICLE_ID + 3 * (first_row + np.arange(n_rows)) + rng.integers(0, 3, n_rows)
+    return pd.DataFrame({
+        'article_id': ids,
+        'product_tier': np.array(TIERS, dtype=object)[tier],
+        'make_name': makes[make],
+        'price': price,
+        'first_zip_digit': rng.choice(np.arange(1, 10), n_rows, p=ZIP_WEIGHTS),
+        'first_registration_year': year,
+        'created_date': day_text[created.astype(np.int64) - offset],
+        'deleted_date': day_text[deleted.astype(np.int64) - offset],
+        'search_views': search_views,
+        'detail_views': detail_views,
+        'stock_days': stock_days,
+        'ctr': ctr_text,
+    }, columns=COLUMNS)
+
+
+def write_items_csv(path, n_rows, random_state=0, chunk_rows=1_000_000, dirty=1e-4):
+    """Write a synthetic export of ``n_rows`` listings chunk by chunk; returns ``path``.
+
+    Chunk ``i`` is generated from the ``i``-th child seed of ``random_state``,
+    so the file only depends on ``n_rows``, ``random_state`` and ``chunk_rows``.
+    """
+    n_chunks = max(1, -(-n_rows // chunk_rows))
+    seeds = np.random.SeedSequence(random_state).spawn(n_chunks)
+    for i, seed in enumerate(seeds):
+        first_row = i * chunk_rows
+        chunk = generate_items(min(chunk_rows, n_rows - first_row), seed, dirty, first_row)
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False,
+                     sep=CSV_OPTIONS['delimiter'])
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic Items_Cars_Data export.')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--output', default='Items_Cars_Data.csv')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    parser.add_argument('--dirty', type=float, default=1e-4, help='fraction of rows with export defects')
+    args = parser.parse_args(argv)
+    write_items_csv(args.output, args.rows, args.seed, args.chunk_rows, args.dirty)
+
+
+if __name__ == '__main__':
+    main()
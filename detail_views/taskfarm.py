@@ -0,0 +1,339 @@
+"""Coordinator/worker backend for the (config, fold) tasks of the tuning and evaluation stages.
+
+The coordinator keeps a queue of tasks, each a module-level function and
+its arguments, and serves it over TCP with ``multiprocessing.managers``
+(authenticated with an authkey). Workers on any machine that has the
+package and the feature cache pull a task, run it and push the result
+back; they open the cached feature matrices by path, so the tasks only
+carry paths, parameters and fold numbers.
+
+    # coordinator, here the tune stage of the pipeline
+    DETAIL_VIEWS_FARM_KEY=secret python -m detail_views run --stages tune --farm 0.0.0.0:5577
+    # on every worker machine
+    DETAIL_VIEWS_FARM_KEY=secret python -m detail_views worker --connect coordinator:5577 --processes 8
+
+A task is leased to one worker at a time. The worker renews the lease
+while the task runs; when a worker dies its lease expires and the task is
+queued again, up to ``max_attempts`` times. A task that raises fails its
+future at once, unless the error is one of the worker's own
+(``WORKER_ERRORS``: connection, file system, memory), which is retried
+like a lost worker. Tasks are pure functions of
+their arguments and keyed on their content, so running one twice is
+harmless: the first result wins and late duplicates are dropped.
+``TaskFarm(local_workers=N)`` starts N worker processes on this machine,
+which is all that is needed on a single box.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import pickle
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.managers import BaseManager
+
+from detail_views.instrument import stage
+from detail_views.matrix_cache import array_source
+
+AUTHKEY_ENV = 'DETAIL_VIEWS_FARM_KEY'
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 0.2
+# errors of the worker rather than of the task; another worker may succeed
+WORKER_ERRORS = (OSError, EOFError, MemoryError)
+
+
+class TaskFailed(RuntimeError):
+    """A task raised, or lost its worker (or hit WORKER_ERRORS) ``max_attempts`` times."""
+
+
+class FarmManager(BaseManager):
+    pass
+
+
+FarmManager.register('tasks')
+
+
+def task_key(fn, args):
+    return hashlib.sha256(pickle.dumps((fn, args))).hexdigest()
+
+
+class _Task:
+    __slots__ = ('key', 'fn', 'args', 'future', 'attempts', 'lease', 'deadline', 'worker')
+
+    def __init__(self, key, fn, args):
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+        self.attempts = 0
+        self.lease = None
+        self.deadline = None
+        self.worker = None
+
+
+class TaskQueue:
+    """The coordinator's tasks, shared with the workers through the manager server.
+
+    ``submit``, ``expire`` and ``close`` are called by the coordinator, the
+    other methods by the workers; every call holds one lock.
+    """
+
+    def __init__(self, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._pending = deque()
+        self._leased = {}
+        self._next_lease = 0
+        self._closed = False
+
+    def submit(self, fn, args):
+        key = task_key(fn, args)
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = _Task(key, fn, args)
+                self._pending.append(task)
+            return task.future
+
+    def expire(self):
+        """Queue the tasks of workers that stopped renewing their lease again."""
+        now = time.monotonic()
+        with self._lock:
+            lost = [task for task in self._leased.values() if task.deadline < now]
+            failed = [task for task in lost if not self._retry(task)]
+        for task in failed:
+            task.future.set_exception(TaskFailed(
+                f'{task.fn.__qualname__} lost its worker {task.attempts} times, last {task.worker}'))
+
+    def _retry(self, task):
+        # under the lock; False once the attempts are used up
+        del self._leased[task.key]
+        task.lease = None
+        if task.attempts >= self.max_attempts:
+            return False
+        self._pending.appendleft(task)
+        return True
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+
+    def closed(self):
+        return self._closed
+
+    def settings(self):
+        return {'lease_seconds': self.lease_seconds}
+
+    def counts(self):
+        with self._lock:
+            done = sum(task.future.done() for task in self._tasks.values())
+            return {'pending': len(self._pending), 'leased': len(self._leased), 'done': done}
+
+    def lease(self, worker):
+        """``(key, lease, fn, args)`` of the next task for ``worker``, or None when there is none."""
+        with self._lock:
+            if not self._pending:
+                return None
+            task = self._pending.popleft()
+            self._next_lease += 1
+            task.attempts += 1
+            task.lease = self._next_lease
+            task.worker = worker
+            task.deadline = time.monotonic() + self.lease_seconds
+            self._leased[task.key] = task
+            return task.key, task.lease, task.fn, task.args
+
+    def renew(self, key, lease):
+        with self._lock:
+            task = self._leased.get(key)
+            if task is None or task.lease != lease:
+                return False
+            task.deadline = time.monotonic() + self.lease_seconds
+            return True
+
+    def complete(self, key, lease, result):
+        """Store the result of a task; False when it was already done."""
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None or task.future.done():
+                return False
+            if self._leased.pop(key, None) is None and task in self._pending:
+                # queued again after its lease expired, but the first worker finished
+                self._pending.remove(task)
+            task.lease = None
+        task.future.set_result(result)
+        return True
+
+    def fail(self, key, lease, error, retry=False):
+        """Fail the future of a task that raised in the worker.
+
+        With ``retry`` the task is queued again instead, until it has used
+        ``max_attempts``.
+        """
+        with self._lock:
+            task = self._leased.get(key)
+            if task is None or task.lease != lease:
+                return
+            if retry:
+                if self._retry(task):
+                    return
+            else:
+                del self._leased[key]
+                task.lease = None
+        task.future.set_exception(TaskFailed(f'{task.fn.__qualname__} failed on attempt {task.attempts}:\n{error}'))
+
+
+def parse_address(address):
+    """``'host:port'`` as a ``(host, port)`` tuple."""
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def shared_path(array):
+    """Path the workers open ``array`` from; it has to be a memory-mapped cache entry."""
+    source = array_source(array)
+    if not isinstance(source, (str, os.PathLike)):
+        raise ValueError('the task farm shares the data by path, pass the memory-mapped arrays '
+                         'of matrix_cache.cached_split')
+    return os.path.abspath(source)
+
+
+class TaskFarm:
+    """Coordinator serving a TaskQueue on ``address``, optionally with local worker processes.
+
+    Used as a context manager; ``submit(fn, *args)`` returns a
+    ``concurrent.futures.Future`` like an executor. ``fn`` must be a
+    module-level function, so the workers can import it.
+    """
+
+    def __init__(self, address=('127.0.0.1', 0), authkey=None, local_workers=0,
+                 lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.requested_address = address
+        self.authkey = authkey if authkey is not None else os.urandom(16)
+        self.local_workers = local_workers
+        self.queue = TaskQueue(lease_seconds, max_attempts)
+        self.address = None
+        self._server = None
+        self._workers = []
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        queue = self.queue
+
+        class Coordinator(BaseManager):
+            pass
+
+        Coordinator.register('tasks', callable=lambda: queue)
+        self._server = Coordinator(address=self.requested_address, authkey=self.authkey).get_server()
+        self.address = self._server.address
+        # what Server.serve_forever does, except that the stop event exists before
+        # any connection and the thread does not end in sys.exit
+        self._server.stop_event = threading.Event()
+        threading.Thread(target=self._server.accepter, name='taskfarm-server', daemon=True).start()
+        for _ in range(self.local_workers):
+            self._start_worker()
+        threading.Thread(target=self._watch, name='taskfarm-watch', daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self.queue.close()
+        for process in self._workers:
+            process.join(timeout=10 * POLL_SECONDS)
+            if process.is_alive():
+                process.terminate()
+        # ends the connections of the workers; the accepting thread stays up until the process exits
+        self._server.stop_event.set()
+        return False
+
+    def _start_worker(self):
+        host, port = self.address
+        if host in ('', '0.0.0.0'):
+            host = '127.0.0.1'
+        process = multiprocessing.get_context('spawn').Process(
+            target=run_worker, args=((host, port), self.authkey), daemon=True)
+        process.start()
+        self._workers.append(process)
+
+    def _watch(self):
+        # expires lost leases and replaces local workers that died
+        interval = min(1.0, self.queue.lease_seconds / 4)
+        while not self._stop.wait(interval):
+            self.queue.expire()
+            for process in list(self._workers):
+                if not process.is_alive() and process.exitcode != 0:
+                    self._workers.remove(process)
+                    if not self._stop.is_set():
+                        self._start_worker()
+
+    def submit(self, fn, *args):
+        return self.queue.submit(fn, args)
+
+
+def _renew(queue, key, lease, interval, done):
+    try:
+        while not done.wait(interval):
+            if not queue.renew(key, lease):
+                return
+    except (EOFError, OSError):
+        return
+
+
+def run_worker(address, authkey, poll_seconds=POLL_SECONDS):
+    """Run tasks from the coordinator at ``address`` until it closes the queue or goes away."""
+    manager = FarmManager(address=address, authkey=authkey)
+    manager.connect()
+    queue = manager.tasks()
+    interval = queue.settings()['lease_seconds'] / 3
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    while True:
+        try:
+            lease = queue.lease(worker)
+            if lease is None:
+                if queue.closed():
+                    return
+                time.sleep(poll_seconds)
+                continue
+        except (EOFError, OSError):
+            return
+        key, lease_id, fn, args = lease
+        done = threading.Event()
+        renewer = threading.Thread(target=_renew, args=(queue, key, lease_id, interval, done), daemon=True)
+        renewer.start()
+        try:
+            with stage('farm/task', task=fn.__qualname__, worker=worker):
+                result = fn(*args)
+        except WORKER_ERRORS:
+            done.set()
+            queue.fail(key, lease_id, traceback.format_exc(), retry=True)
+        except Exception:
+            done.set()
+            queue.fail(key, lease_id, traceback.format_exc())
+        else:
+            done.set()
+            queue.complete(key, lease_id, result)
+        renewer.join()
+
+
+def authkey_from_env():
+    key = os.environ.get(AUTHKEY_ENV)
+    if not key:
+        raise SystemExit(f'set {AUTHKEY_ENV} to the authkey shared by the coordinator and the workers')
+    return key.encode()
+
+
+def run_workers(address, authkey, processes=1):
+    """Run ``processes`` workers for the coordinator at ``address`` until it is done."""
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=run_worker, args=(address, authkey)) for _ in range(processes)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
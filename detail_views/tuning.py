@@ -0,0 +1,221 @@
+"""Parallel joint hyperparameter search for the XGBoost model.
+
+Every (config, fold) pair is one task on a process pool. The fold splits are
+computed once and shared by all configs, each worker trains with a fixed
+number of XGBoost threads, and weak configs are pruned with successive
+halving: all configs are scored on the first fold(s), the best
+``1/halving_factor`` continue on more folds, until the survivors have seen
+all folds.
+
+Configs that differ only in ``n_estimators`` share their fits: the largest
+forest is trained once per fold and every smaller tree count is scored from
+it with truncated-iteration prediction, since a smaller forest is a prefix
+of the larger one. Each worker quantizes a fold once (xgb_data.TrainingData)
+and trains every config on it with the native hist booster; the category
+code columns (``feature_types``) get native categorical splits.
+
+With ``farm`` (a taskfarm.TaskFarm) the (config, fold) tasks go to the
+task farm workers instead of the local pool.
+"""
+
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler
+
+from detail_views.features import FEATURE_TYPES
+from detail_views.instrument import stage
+from detail_views.matrix_cache import array_source, open_array
+from detail_views.scoring import SCORING, regression_scores
+from detail_views.xgb_data import TrainingData
+
+XGB_PARAMS = {'objective': 'reg:squarederror', 'tree_method': 'hist'}
+
+_worker = {}
+
+
+def _init_worker(X, y, folds, threads, feature_types):
+    _worker['data'] = TrainingData(open_array(X), open_array(y), threads, feature_types=feature_types)
+    _worker['folds'] = folds
+    _worker['threads'] = threads
+
+
+def _fit_fold(params, n_estimators, fold, early_stopping_rounds=None):
+    """Train the largest forest of ``n_estimators`` on one fold and score every tree count."""
+    import xgboost as xgb
+
+    data = _worker['data']
+    train, test = _worker['folds'][fold]
+    dtrain = data.matrix(train, key=('train', fold))
+    booster_params = {**XGB_PARAMS, **params, 'nthread': _worker['threads']}
+    start = time.perf_counter()
+    with stage('tune/fold_fit', rows=len(train), fold=fold, params=params, n_estimators=max(n_estimators)):
+        if early_stopping_rounds:
+            dtest = data.matrix(test, key=('test', fold), reference=dtrain)
+            booster = xgb.train(booster_params, dtrain, num_boost_round=max(n_estimators),
+                                evals=[(dtest, 'validation')], early_stopping_rounds=early_stopping_rounds,
+                                verbose_eval=False)
+            n_trees = booster.best_iteration + 1
+        else:
+            booster = xgb.train(booster_params, dtrain, num_boost_round=max(n_estimators))
+            n_trees = max(n_estimators)
+    fit_time = time.perf_counter() - start
+
+    y_test = data.y[test]
+    all_scores = []
+    for n in n_estimators:
+        start = time.perf_counter()
+        y_pred = data.predict(booster, test, min(n, n_trees))
+        scores = regression_scores(y_test, y_pred)
+        # the shared fit is charged to each tree count in proportion to its size
+        scores['fit_time'] = fit_time * min(n, n_trees) / n_trees
+        scores['score_time'] = time.perf_counter() - start
+        scores['n_trees'] = min(n, n_trees)
+        all_scores.append(scores)
+    return all_scores
+
+
+def _fit_fold_shared(source, params, n_estimators, fold, early_stopping_rounds=None):
+    """_fit_fold for task farm workers, which set up their state from ``source`` on first use."""
+    if _worker.get('source') != source:
+        X, y, cv, threads, feature_types = source
+        _init_worker(X, y, fold_splits(len(open_array(y)), cv), threads, feature_types)
+        _worker['source'] = source
+    return _fit_fold(params, n_estimators, fold, early_stopping_rounds)
+
+
+@contextmanager
+def _fold_runner(X, y, folds, cv, n_workers, threads, feature_types, farm):
+    # yields submit(params, n_estimators, fold, early_stopping_rounds) -> future
+    if farm is not None:
+        from detail_views.taskfarm import shared_path
+
+        source = (shared_path(X), shared_path(y), cv, threads, feature_types)
+        yield lambda *task: farm.submit(_fit_fold_shared, source, *task)
+        return
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(array_source(X), array_source(y), folds, threads,
+                                       feature_types)) as pool:
+        yield lambda *task: pool.submit(_fit_fold, *task)
+
+
+def fold_splits(n_samples, cv=5):
+    """Same splits cross_validate uses for a regressor with ``cv=cv``."""
+    return list(KFold(n_splits=cv).split(np.empty((n_samples, 1))))
+
+
+def candidates(param_grid, n_iter=None, random_state=100):
+    """The full grid, or ``n_iter`` random configs sampled from it."""
+    if n_iter is None:
+        return list(ParameterGrid(param_grid))
+    return list(ParameterSampler(param_grid, n_iter=n_iter, random_state=random_state))
+
+
+def group_by_trees(configs):
+    """Group config indices that only differ in n_estimators.
+
+    Returns ``[(params without n_estimators, [n_estimators], [config index])]``.
+    """
+    groups = {}
+    for i, params in enumerate(configs):
+        rest = {k: v for k, v in params.items() if k != 'n_estimators'}
+        key = tuple(sorted(rest.items()))
+        group = groups.setdefault(key, (rest, [], []))
+        group[1].append(params.get('n_estimators', 100))
+        group[2].append(i)
+    return list(groups.values())
+
+
+def rung_folds(n_folds, halving_factor, min_folds=1):
+    """Number of folds seen by the survivors at each rung, e.g. [1, 3, 5]."""
+    if not halving_factor:
+        return [n_folds]
+    rungs = []
+    budget = min_folds
+    while budget < n_folds:
+        rungs.append(budget)
+        budget *= halving_factor
+    return rungs + [n_folds]
+
+
+def search_xgb(X, y, param_grid, n_iter=None, cv=5, n_workers=None, threads_per_worker=2,
+               halving_factor=3, min_folds=1, early_stopping_rounds=None, feature_types=FEATURE_TYPES,
+               random_state=100, verbose=True, farm=None):
+    """Cross-validated search over the joint ``param_grid`` of XGBRegressor.
+
+    ``X``/``y`` are arrays or memory-mapped cache entries (see
+    matrix_cache.cached_split). ``n_iter`` samples that many random configs
+    instead of the full grid, ``halving_factor=None`` disables pruning.
+    With ``early_stopping_rounds`` each fold stops adding trees once the
+    validation fold stops improving, and larger tree counts are scored at
+    the stopping point (reported in ``n_trees``). ``feature_types`` describes
+    the columns of ``X`` (FEATURES by default); None treats them all as numbers.
+    With ``farm`` the fits run on the task farm workers, which open ``X`` and
+    ``y`` by path, so they have to be memory-mapped cache entries.
+    Returns one row per config, best (lowest RMSE) first, with the mean
+    scores over the folds the config was evaluated on.
+    """
+    configs = candidates(param_grid, n_iter, random_state)
+    groups = group_by_trees(configs)
+    folds = fold_splits(len(y), cv)
+    if n_workers is None:
+        n_workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    results = {i: [] for i in range(len(configs))}
+    alive = list(range(len(configs)))
+    done_folds = 0
+    with _fold_runner(X, y, folds, cv, n_workers, threads_per_worker, feature_types, farm) as submit:
+        for rung, n_folds in enumerate(rung_folds(cv, halving_factor, min_folds)):
+            alive_set = set(alive)
+            tasks = [(members, submit(params, n_estimators, fold, early_stopping_rounds))
+                     for params, n_estimators, members in groups
+                     if alive_set.intersection(members)
+                     for fold in range(done_folds, n_folds)]
+            for members, future in tasks:
+                for i, scores in zip(members, future.result()):
+                    results[i].append(scores)
+            # every config of a surviving group was evaluated, free of charge
+            alive = [i for i in range(len(configs)) if len(results[i]) == n_folds]
+            done_folds = n_folds
+            if n_folds < cv:
+                keep = max(1, math.ceil(len(alive) / halving_factor))
+                alive = sorted(alive, key=lambda i: _mean(results[i], 'neg_root_mean_squared_error'),
+                               reverse=True)[:keep]
+
+    table = _summarize(configs, results)
+    if verbose:
+        print_table(table)
+    return table
+
+
+def _mean(fold_scores, name):
+    return float(np.mean([s[name] for s in fold_scores]))
+
+
+def _summarize(configs, results):
+    rows = []
+    for i, params in enumerate(configs):
+        row = dict(params)
+        row['params'] = params
+        row['n_folds'] = len(results[i])
+        for name in SCORING + ['fit_time', 'score_time', 'n_trees']:
+            row[name] = _mean(results[i], name)
+        rows.append(row)
+    table = pd.DataFrame(rows)
+    # configs pruned early rank below the ones evaluated on all folds
+    return table.sort_values(['n_folds', 'neg_root_mean_squared_error'],
+                             ascending=False, ignore_index=True)
+
+
+def print_table(table):
+    for _, row in table.iterrows():
+        settings = ', '.join(f'{k}: {v}' for k, v in row['params'].items())
+        print(f"For {settings} ({row['n_folds']} folds)")
+        print(f"Explained variance: {row['explained_variance']:.3f}")
+        print(f"Mean absolute error: {-row['neg_mean_absolute_error']:.3f}")
+        print(f"Root mean squared error: {-row['neg_root_mean_squared_error']:.3f}")
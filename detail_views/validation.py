@@ -0,0 +1,140 @@
+"""Rule-based validation and repair of a listings export.
+
+Every rule is a single vectorized pass over the frame producing a boolean
+mask. Rules marked ``drop`` remove the offending rows, ``flag`` rules are
+only reported. Instead of per-row displays, the result is a compact report
+with the number of violations per rule and a few example article ids.
+"""
+
+import numpy as np
+import pandas as pd
+
+from detail_views.instrument import stage
+from detail_views.loading import SCHEMA
+
+NUMERIC_COLUMNS = ['price', 'first_zip_digit', 'first_registration_year', 'search_views',
+                   'detail_views', 'stock_days']
+MIN_REGISTRATION_YEAR = 1900
+# tolerance of the stock_days check, dates are truncated to days in the export
+STOCK_DAYS_TOLERANCE = 1
+CTR_TOLERANCE = 1e-6
+
+# groups of 3 digits separated by dots, e.g. 12.950 or 27.624.309.392.265.100
+_THOUSANDS = r'^\d{1,3}(?:\.\d{3})+$'
+
+
+def parse_numeric(values):
+    """Numbers from a text column of integer counts, repairing thousands-separator mangled values.
+
+    The columns only hold whole numbers, so a value with dot-separated
+    groups of 3 digits is a mangled thousands value (12.950 is 12950).
+    Returns ``(parsed, repaired_mask)``; values that cannot be parsed are NaN.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(np.float64), np.zeros(len(values), dtype=bool)
+    text = values.astype('string')
+    mangled = text.str.match(_THOUSANDS).fillna(False).to_numpy(dtype=bool)
+    if mangled.any():
+        text = text.where(~mangled, text.str.replace('.', '', regex=False))
+    parsed = pd.to_numeric(text, errors='coerce')
+    return parsed.astype(np.float64), mangled
+
+
+def parse_ctr(values):
+    """ctr as numbers, with the mangled values as NaN.
+
+    A mangled ratio (27.624.309.392.265.100 for 0.0276...) lost its decimal
+    point and leading zeros, so it is not repaired: cleaning recomputes ctr
+    from the view counts. Returns ``(ctr, mangled_mask)``.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64), np.zeros(len(values), dtype=bool)
+    text = values.astype('string')
+    ctr = pd.to_numeric(text, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    mangled = np.isnan(ctr) & text.str.match(_THOUSANDS).fillna(False).to_numpy(dtype=bool)
+    return ctr, mangled
+
+
+def check_rules(df):
+    """Masks of the validation rules, as ``{name: (action, mask)}``.
+
+    Expects numeric view counts (see repair_numeric_columns). ``ctr`` is
+    compared with detail_views / search_views when it is present.
+    """
+    created = df['created_date'].to_numpy()
+    deleted = df['deleted_date'].to_numpy()
+    year = df['first_registration_year'].to_numpy()
+    stock_days = df['stock_days'].to_numpy()
+    search = df['search_views'].to_numpy(dtype=np.float64)
+    detail = df['detail_views'].to_numpy(dtype=np.float64)
+    created_year = created.astype('datetime64[Y]').astype(np.int64) + 1970
+    listed_days = (deleted - created) / np.timedelta64(1, 'D')
+
+    rules = {
+        'missing_views': ('drop', np.isnan(search) | np.isnan(detail)),
+        'impossible_registration_year': ('drop', (year < MIN_REGISTRATION_YEAR) | (year > created_year)),
+        'missing_dates': ('drop', np.isnat(created) | np.isnat(deleted)),
+        'negative_stock_days': ('flag', stock_days < 0),
+        'deleted_before_created': ('flag', listed_days < 0),
+        'stock_days_mismatch': ('flag', np.abs(stock_days - listed_days) > STOCK_DAYS_TOLERANCE),
+        'detail_exceeds_search': ('flag', detail > search),
+    }
+    if 'ctr' in df:
+        ctr, mangled = parse_ctr(df['ctr'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = detail / search
+        comparable = np.isfinite(expected)
+        rules['ctr_mangled'] = ('flag', mangled)
+        rules['ctr_missing'] = ('flag', np.isnan(ctr) & ~mangled & comparable)
+        rules['ctr_mismatch'] = ('flag', comparable & ~np.isnan(ctr)
+                                 & ~np.isclose(ctr, expected, rtol=CTR_TOLERANCE, atol=CTR_TOLERANCE))
+    return rules
+
+
+def repair_numeric_columns(df):
+    """Parse numeric columns that were read as text; returns the frame and repair counts.
+
+    The parsed columns are cast to their SCHEMA dtype, or to float64 when an
+    integer column has unparseable (NaN) values.
+    """
+    repaired = {}
+    for col in NUMERIC_COLUMNS:
+        if col in df and not pd.api.types.is_numeric_dtype(df[col]):
+            parsed, mangled = parse_numeric(df[col])
+            dtype = np.dtype(SCHEMA[col])
+            if dtype.kind in 'iu' and parsed.isna().any():
+                dtype = np.float64
+            df[col] = parsed.astype(dtype)
+            repaired[col] = int(mangled.sum())
+    return df, repaired
+
+
+def validate_items(df, examples=5):
+    """Repair, check and filter an export.
+
+    Returns ``(clean_df, report)``. The clean frame has the ``drop`` rule
+    violations removed and ctr recomputed as detail_views / search_views.
+    The report has one row per rule with its action, the number of
+    violating rows and up to ``examples`` article ids.
+    """
+    with stage('validate', rows=len(df)):
+        df, repaired = repair_numeric_columns(df.copy(deep=False))
+        rules = check_rules(df)
+
+        article_id = df['article_id'].to_numpy() if 'article_id' in df else np.arange(len(df))
+        rows = []
+        for col, count in repaired.items():
+            rows.append({'rule': f'repaired_{col}', 'action': 'repair', 'count': count, 'examples': []})
+        drop = np.zeros(len(df), dtype=bool)
+        for name, (action, mask) in rules.items():
+            rows.append({'rule': name, 'action': action, 'count': int(mask.sum()),
+                         'examples': article_id[mask][:examples].tolist()})
+            if action == 'drop':
+                drop |= mask
+        report = pd.DataFrame(rows).set_index('rule')
+
+        df = df.loc[~drop].reset_index(drop=True)
+        # the exported ctr contains mangled values, so it is recalculated
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df['ctr'] = df['detail_views'] / df['search_views']
+        return df, report
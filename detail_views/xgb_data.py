@@ -0,0 +1,140 @@
+"""Data path for the XGBoost models: quantize each training set once, reuse it across configs.
+
+``XGBRegressor.fit`` converts its input and sketches the feature quantiles
+on every call, so a tuning grid redoes the same work for every config.
+``TrainingData`` builds the ``QuantileDMatrix`` of a fold or subset from row
+indices (a QuantileDMatrix cannot be sliced in place) and memoizes it, so
+every config of a grid and every tree count trains on the same quantized
+data. As in ``fit``, the histogram cuts of a training matrix are sketched
+from its own rows only; validation matrices (early stopping) are quantized
+against the cuts of their training matrix. Predictions use
+``inplace_predict`` on the raw rows, without any DMatrix.
+
+Trees only depend on the order of each feature's values, so StandardScaler
+in front of the booster is skipped on this path. The feature types of the
+model (category codes, see features.FEATURE_TYPES) are passed to the
+matrices, so the native categorical splits are used.
+"""
+
+import os
+import time
+
+import numpy as np
+from sklearn.model_selection import check_cv
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from detail_views.instrument import stage
+from detail_views.scoring import SCORING, regression_scores
+
+MAX_BIN = 256
+# scorers computed on this path: the regression scores and the tree count
+SCORERS = {'explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2', 'n_iter'}
+
+
+def tree_model(estimator):
+    """The XGBRegressor of ``estimator`` if only scalers precede it, else None."""
+    try:
+        from xgboost import XGBRegressor
+    except ImportError:
+        return None
+
+    if isinstance(estimator, Pipeline):
+        if not all(isinstance(step, StandardScaler) for _, step in estimator.steps[:-1]):
+            return None
+        estimator = estimator.steps[-1][1]
+    return estimator if isinstance(estimator, XGBRegressor) else None
+
+
+def booster_params(model, threads=None):
+    """Native training parameters and number of boosting rounds of an XGBRegressor.
+
+    The thread count is always explicit: ``threads``, else the model's
+    ``n_jobs``, else all CPUs.
+    """
+    params = {k: v for k, v in model.get_xgb_params().items() if v is not None}
+    n_jobs = params.pop('n_jobs', None)
+    params['nthread'] = threads or (n_jobs if n_jobs and n_jobs > 0 else os.cpu_count() or 1)
+    if 'random_state' in params:
+        params['seed'] = params.pop('random_state')
+    params.setdefault('tree_method', 'hist')
+    return params, model.get_num_boosting_rounds()
+
+
+def feature_types(model):
+    """The feature types of an XGBRegressor with categorical support, else None."""
+    return model.feature_types if model.enable_categorical else None
+
+
+class TrainingData:
+    """Quantized XGBoost matrices of one training set, built on first use."""
+
+    def __init__(self, X, y, threads=1, max_bin=MAX_BIN, feature_types=None):
+        self.X = X
+        self.y = y
+        self.threads = threads
+        self.max_bin = max_bin
+        self.feature_types = feature_types
+        self._matrices = {}
+
+    def matrix(self, rows, key=None, reference=None):
+        """Matrix of ``X[rows]``, memoized under ``key`` unless it is None.
+
+        The cuts are sketched from these rows, or taken from ``reference``:
+        the training matrix of a validation set, or the full training fold
+        of the nested subsets of a learning curve.
+        """
+        import xgboost as xgb
+
+        if key is not None and key in self._matrices:
+            return self._matrices[key]
+        with stage('xgb/quantize', rows=len(rows)):
+            matrix = xgb.QuantileDMatrix(self.X[rows], label=self.y[rows], ref=reference,
+                                         nthread=self.threads, max_bin=self.max_bin, **self._types())
+        if key is not None:
+            self._matrices[key] = matrix
+        return matrix
+
+    def _types(self):
+        if self.feature_types is None:
+            return {}
+        return {'feature_types': self.feature_types, 'enable_categorical': 'c' in self.feature_types}
+
+    def predict(self, booster, rows, n_trees=None):
+        iteration_range = (0, n_trees) if n_trees else (0, 0)
+        return booster.inplace_predict(self.X[rows], iteration_range=iteration_range)
+
+
+def _scorer_names(scoring):
+    return [scoring] if isinstance(scoring, str) else list(scoring)
+
+
+def supports(scoring):
+    return set(_scorer_names(scoring)) <= SCORERS
+
+
+def cross_validate_xgb(model, X, y, cv=5, scoring=SCORING, threads=None, name=None):
+    """cross_validate for an XGBRegressor on shared quantized fold matrices.
+
+    Returns the same dict of per-fold arrays (``test_<scorer>``,
+    ``fit_time``, ``score_time``); ``scoring`` is restricted to SCORERS.
+    """
+    import xgboost as xgb
+
+    params, rounds = booster_params(model, threads)
+    data = TrainingData(X, y, params['nthread'], params.get('max_bin', MAX_BIN), feature_types(model))
+    names = _scorer_names(scoring)
+    result = {'fit_time': [], 'score_time': [], **{'test_' + n: [] for n in names}}
+    for fold, (train, test) in enumerate(check_cv(cv).split(X, y)):
+        dtrain = data.matrix(train)
+        start = time.perf_counter()
+        with stage('cv/fold_fit', rows=len(train), model=name, params=params, n_estimators=rounds):
+            booster = xgb.train(params, dtrain, num_boost_round=rounds)
+        result['fit_time'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        scores = regression_scores(y[test], data.predict(booster, test))
+        scores['n_iter'] = booster.num_boosted_rounds()
+        result['score_time'].append(time.perf_counter() - start)
+        for n in names:
+            result['test_' + n].append(scores[n])
+    return {k: np.asarray(v) for k, v in result.items()}
@@ -23,14 +23,16 @@ from sklearn.metrics import explained_variance_score
 from sklearn.pipeline import Pipeline
 from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import cross_validate
 
 """# **Load data**
 
 The data will be loaded into a pandas DataFrame, which are good tools for manipulating and displaying the data. Date columns are converted to datetime.
+The loader uses a declared schema (categories for product_tier and make_name, small integers, float32 view counts) and an explicit date format. After the first parse the data is cached in a columnar file under .cache, which is reused until the csv file changes.
 """
 
-df = pd.read_csv ('Items_Cars_Data.csv', delimiter=';', parse_dates=["created_date", 'deleted_date'], dayfirst=True)
+from detail_views.loading import load_items
+
+df = load_items('Items_Cars_Data.csv', cache_dir='.cache')
 
 description = pd.read_csv ('Data_Description.csv', delimiter=';')
 
@@ -65,18 +67,14 @@ np.where(df['detail_views'].isnull() == True)[0]
 
 np.where(df['ctr'].isnull() == True)[0]
 
-"""There are 10 missing values in search_views and detail_view at the same locations, and 24 missing values in ctr, 10 of which overlap with the location of the missing values in the previously mentioned columns, i.e. locations [10151, 21423, 27830, 47864, 57347, 60752, 63571, 65121, 66492, 72388]. Let's now check the first 10 rows with the missing values in 'ctr'."""
+"""There are 10 missing values in search_views and detail_view at the same locations, and 24 missing values in ctr, 10 of which overlap with the location of the missing values in the previously mentioned columns. Instead of checking the rows one by one, the export is checked with a set of validation rules (detail_views/validation.py), each a single vectorized pass over the data. The report shows the number of violations per rule and a few example article ids."""
+
+from detail_views.validation import validate_items
+
+df_clean, validation_report = validate_items(df)
+validation_report
 
-display(df[6738:6739])
-display(df[10151:10152])
-display(df[19983:19984])
-display(df[21423:21424])
-display(df[26122:26123])
-display(df[27830:27831])
-display(df[28823:28824])
-display(df[38923:38924])
-display(df[43222:43223])
-display(df[47864:47865])
+df[df['ctr'].isna()].head(10)
 
 """There is clearly overlap of missing values for all 3 columns (search_views, detail_views, ctr), but ctr column has extra number of missing values. Due to the overlap of missing values in search_views and detail_views with ctr, or 0 values in search_views and detail_views, we cannot use search_views and detail_views to impute ctr here, or vice versa. Some rows have 0 search_views and 0 detail_views, where the stock days are 0 or negative. This may mean that the article was deleted shortly after it was created. I assume that these rows are not so important and meaningful for prediction, since the article was quickly deleted without being viewed, and there are only a few such cases.
 
@@ -104,22 +102,15 @@ df.groupby(['product_tier','stock_days','search_views'])['detail_views'].value_c
 
 Another possible approach could be to try to predict these values using the other columns/features. However, those predicted values would be only a proxy for the true values.
 
-The dataset has in total 78270 rows. Deleting 24 rows should not have much affect to the result comparing to the length of the complete dataset. Therefore, the rows with missing values will be removed in the next step.
-"""
-
-#deleting rows with missing values
-df.dropna(inplace = True)
-df.reset_index(drop=True, inplace=True)
+The dataset has in total 78270 rows. Deleting the rows with missing views should not have much affect to the result comparing to the length of the complete dataset. Therefore, the validation drops them (rule missing_views).
 
-df.isna().sum()
-
-"""Moreover, when checking the data, the error value in ctr is found in the row 849. Therefore it is better to recalculate the column."""
+Moreover, the ctr column contains error values such as 27.624.309.392.265.100 (it should be 0.27624309392265100), which are counted by the ctr_mismatch rule. Therefore the validation re-calculates the 'ctr' column as the quotient of detail_views over search_views.
 
-#27.624.309.392.265.100 is error value, it should be 0.27624309392265100 
-df[849:850]
+The validation also drops listings with an impossible first_registration_year, i.e. before 1900 or after the year the listing was created. There is one value "2106" in the data, which is an anomaly. I suspect it should be 2016, but it might be 2006. Since I cannot verify this, the row is removed.
+"""
 
-#because of the problems with values, I will re-calculate again 'ctr' column as the quotient of detail_views over search_views
-df['ctr']=df['detail_views'] / df['search_views']
+df = df_clean
+df.isna().sum()
 
 df
 
@@ -130,19 +121,11 @@ df
 We can create new feature from time information, for example, to analyze seasonality. A simple search on the Internet shows that the peak season for car purchases is in spring (from March to the end of May) and in fall (from September to November). Then we could expect higher search_views and detail_views in spring and fall. So let's create a new function that contains information about whether a car is offered in one of these two seasons.
 """
 
-#extract months
-df['created_month'] = pd.DatetimeIndex(df['created_date']).month
-df['deleted_month'] = pd.DatetimeIndex(df['deleted_date']).month
-
-#Spring: from March through the end of May, and Fall: from September through November
-spring_fall= ((df['created_month'] > 2) & (df['created_month'] < 6)) | ((df['deleted_month'] > 2) & (df['deleted_month'] < 6)) | ((df['created_month'] > 8) & (df['created_month'] < 12)) | ((df['deleted_month'] > 8) & (df['deleted_month'] < 12))
-df_peak_season = df.loc[spring_fall]
+"""If a car is listed, the peak_season feature  has the value 1, if it is not listed, it has the value 0. The months are looked up in a table of the peak season months (spring: from March through the end of May, and fall: from September through November), see detail_views/features.py. The same function is used by the feature transformer of the models."""
 
-"""If a car is listed, the peak_season feature  has the value 1, if it is not listed, it has the value 0."""
+from detail_views.features import peak_season
 
-df_peak_season['peak_season']=1
-df['peak_season'] = df_peak_season['peak_season']
-df['peak_season'] = df['peak_season'].fillna(0)
+df['peak_season'] = peak_season(df['created_date'], df['deleted_date'])
 
 df
 
@@ -151,16 +134,21 @@ df
 Now I will perform data exploratory analysis in order to better understand the data, to discover patterns, to spot anomalies and to check assumptions with the help of statistic summary and graphical representations.
 
 Statistical summary
+
+The summary is accumulated in one pass with StreamingSummary (detail_views/summary.py): exact moments, min and max, approximate quartiles from a quantile sketch, and top-k counts for the categorical columns. The same code profiles exports that do not fit in memory, chunk by chunk, with summarize_file() or `python -m detail_views profile`.
 """
 
+from detail_views.summary import StreamingSummary
+
 #Descriptive statistics
-df.describe()
+stats = StreamingSummary(categorical=['product_tier', 'make_name']).update(df)
+stats.describe()
 
 """Numerical data: The distribution for search_views and detail_views looks skewed as mean & median (50%) values are not close."""
 
 categ = ['product_tier','make_name']
 
-df[categ].describe()
+stats.describe('category')
 
 """Categorical data: The data in product_tier has 3 unique values with the most common value being "Basic". The data in make_name has 91 unique values with the most common value being "Volkswagen".
 
@@ -177,18 +165,7 @@ sns.countplot(data = df, x="first_registration_year")
 plt.xticks(rotation=90)
 plt.show()
 
-"""We see that the registration years are from 1924, but after 2000 we see a significant increase in the amount of data. Most items have a registration year between 2010 and 2018. Also, there is a value for first_registration_year "2106", which is an anomaly here. I suspect it should be 2016, but it might be  2006. This could be double checked to be sure what year it is. Since I cannot verify this, I will remove this row since it is only one. First I will check the problematic row."""
-
-is_anomaly=(df['first_registration_year']==2106)
-is_anomaly_index=df[is_anomaly].index
-i=is_anomaly_index
-print (i)
-
-df[36295:36296]
-
-#remove row with outlier
-df.drop([36295], inplace = True )
-df.reset_index(drop=True, inplace=True)
+"""We see that the registration years are from 1924, but after 2000 we see a significant increase in the amount of data. Most items have a registration year between 2010 and 2018. The anomalous year "2106" was already removed by the validation."""
 
 plt.plot(df['search_views'])
 
@@ -198,11 +175,15 @@ plt.plot(df['detail_views'])
 
 numeric=['price', 'first_zip_digit', 'first_registration_year', 'search_views', 'detail_views', 'stock_days', 'ctr'	]
 
+"""The plots below are drawn from aggregates (quantiles for the box plots, 2D histograms instead of scatter plots), computed in one vectorized pass on the full data, see detail_views/exploration.py. This keeps the plotting time independent of the number of rows. The box plot whiskers show the 1st and 99th percentile."""
+
+from detail_views.exploration import binned_pairs, box_stats, plot_binned_pairs, plot_box_stats
+
 features = numeric
 plt.figure(figsize=(18, 4))
 for i in range(0, len(features)):
     plt.subplot(1, 8, i+1)
-    sns.boxplot(y=df[features[i]], color='purple',orient='v')
+    plot_box_stats(box_stats(df, features[i]))
     plt.tight_layout();
 
 """In the boxplot graph can be seen that the price, first_registration_year, search_views, detail_views and ctr features have many outliers. Logarithmic (log) transformation can be used here to address skewed data effectively.
@@ -216,28 +197,27 @@ k = len(data_num.columns)
 n = 3
 m = (k - 1) // n + 1
 fig, axes = plt.subplots(m, n, figsize=(n * 5, m * 3))
-for i, (name, col) in enumerate(data_num.iteritems()):
+for i, (name, col) in enumerate(data_num.items()):
     r, c = i // n, i % n
     ax = axes[r, c]
     col.hist(ax=ax, color='red')
-    ax2 = col.plot.kde(ax=ax, secondary_y=True, title=name, color='black')
+    #the density estimate grows with the number of rows, so it is computed on a sample
+    ax2 = col.sample(min(len(col), 20000), random_state=0).plot.kde(ax=ax, secondary_y=True, title=name, color='black')
     ax2.set_ylim(0)
 fig.tight_layout();
 
 #since detail_views and ctr have min values of 0, I used log(x+1) to avoid -inf values after transformation
-df_log=df.copy()
-df_log['price'] = np.log10(df['price']+1)
-df_log['first_registration_year'] = np.log10(df['first_registration_year']+1)
-df_log['search_views'] = np.log10(df['search_views']+1)
-df_log['detail_views'] = np.log10(df['detail_views']+1)
-df_log['ctr'] = np.log10(df['ctr']+1)
+#only the numeric columns are copied for the plots, the models use the feature transformer below
+log_columns = ['price', 'first_registration_year', 'search_views', 'detail_views', 'ctr']
+df_log = df[numeric + ['product_tier', 'peak_season']].copy()
+df_log[log_columns] = np.log10(df_log[log_columns] + 1)
 
 #Features after logaritmic transformation
 features = numeric
 plt.figure(figsize=(18, 4))
 for i in range(0, len(features)):
     plt.subplot(1, 8, i+1)
-    sns.boxplot(y=df_log[features[i]], color='purple',orient='v')
+    plot_box_stats(box_stats(df_log, features[i]))
     plt.tight_layout();
 
 """After log transformation, distribution of price, searc_views and detail_views corresponds better to normal distribution."""
@@ -248,78 +228,70 @@ k = len(data_num.columns)
 n = 3
 m = (k - 1) // n + 1
 fig, axes = plt.subplots(m, n, figsize=(n * 5, m * 3))
-for i, (name, col) in enumerate(data_num.iteritems()):
+for i, (name, col) in enumerate(data_num.items()):
     r, c = i // n, i % n
     ax = axes[r, c]
     col.hist(ax=ax, color='red')
-    ax2 = col.plot.kde(ax=ax, secondary_y=True, title=name, color='black')
+    #the density estimate grows with the number of rows, so it is computed on a sample
+    ax2 = col.sample(min(len(col), 20000), random_state=0).plot.kde(ax=ax, secondary_y=True, title=name, color='black')
     ax2.set_ylim(0)
 fig.tight_layout();
 
-#create a pairplot graph from each numeric data
-plt.figure(figsize=(12,5))
-sns.pairplot(data=df, 
-             x_vars=['price','first_zip_digit','first_registration_year','search_views','ctr', 'stock_days'], 
-             y_vars=['detail_views'], height=5, aspect=0.5);
-fig.tight_layout();
+#create a binned pairplot graph from each numeric data
+pair_x_vars = ['price','first_zip_digit','first_registration_year','search_views','ctr', 'stock_days']
+plot_binned_pairs(binned_pairs(df, pair_x_vars, ['detail_views']), height=5, aspect=0.5);
 
 """From the above scatter plot, it can be seen that more detail_views have items with lower price, items offered in regions 2 and 6, and newer first_registration_years. In terms of region, the number of detail views is lowest in Region 9, which is consistent with the earlier finding that the fewest items are offered there. As the search_viewes increase, the number of detail_views also increases. There is no clear pattern for stock_days, but it can be seen that the most detail_views occur at higher values of stock_days (especially in the middle between 50 and 100 days).
 
 The scatter plot below with logarithmic transformation of price, first_registration_year, search_views, detail_views and ctr shows a clear relationship between detail_views and search_views.
 """
 
-#create a pairplot graph from each numeric data with log transformed features
-plt.figure(figsize=(12,5))
-sns.pairplot(data=df_log, 
-             x_vars=['price','first_zip_digit','first_registration_year','search_views','ctr', 'stock_days'], 
-             y_vars=['detail_views'], height=5, aspect=0.5);
-fig.tight_layout();
-
-df_plot = df.drop(['article_id', 'make_name', 'created_date', 'deleted_date'], axis=1)
+#create a binned pairplot graph from each numeric data with log transformed features
+plot_binned_pairs(binned_pairs(df_log, pair_x_vars, ['detail_views']), height=5, aspect=0.5);
 
-df_log_plot = df_log.drop(['article_id', 'make_name', 'created_date', 'deleted_date'], axis=1)
+plot_binned_pairs(binned_pairs(df, numeric + ['peak_season'], numeric + ['peak_season']), height=2.5);
 
-sns.pairplot(df_plot)
-
-sns.pairplot(df_log_plot)
+plot_binned_pairs(binned_pairs(df_log, numeric + ['peak_season'], numeric + ['peak_season']), height=2.5);
 
 """Patterns between detail_views and first_zip_digit can be more clearly visible in the graph below."""
 
-sns.catplot(data=df, y='detail_views', x='first_zip_digit', hue='product_tier')
+plt.figure(figsize=(14,5))
+plot_box_stats(box_stats(df, 'detail_views', by='first_zip_digit', hue='product_tier'), ylabel='detail_views')
+plt.show()
 
-sns.catplot(data=df, y='detail_views', x='peak_season',  hue='product_tier')
+plt.figure(figsize=(8,5))
+plot_box_stats(box_stats(df, 'detail_views', by='peak_season', hue='product_tier'), ylabel='detail_views')
+plt.show()
 
 """The graph above shows that there are more detail_views for articles listed during the peak season of car sales (spring and fall) (value 1), than for articles listed outside of the peak season (value 0), with tendency of more detailed views for Basic and Premium categories.
 
 As the stock days on which an item is listed increases, the number of detailed views also increases. A significant increase can be observed from 20 days onwards.
 """
 
-sns.catplot(data=df, y='detail_views', x='stock_days', height=5, aspect=5)
-plt.xticks(rotation=90)
+plot_binned_pairs(binned_pairs(df, ['stock_days'], ['detail_views'], bins=100), height=5, aspect=5)
 plt.show()
 
-sns.catplot(data=df, y='detail_views', x='first_registration_year', height=5, aspect=4)
-plt.xticks(rotation=90)
+plot_binned_pairs(binned_pairs(df, ['first_registration_year'], ['detail_views'], bins=100), height=5, aspect=4)
 plt.show()
 
-sns.catplot(data=df, y='detail_views', x='first_registration_year', hue='product_tier', height=5, aspect=4)
-plt.xticks(rotation=90)
+plt.figure(figsize=(20,5))
+plot_box_stats(box_stats(df, 'detail_views', by='first_registration_year', hue='product_tier'), ylabel='detail_views')
 plt.show()
 
 """On the graph above it can be clearly seen that more detail_views apply to articles with registration_year from 2000 with the peak in 2014 and 2015, i.e. for the cars with registration 5-6 years old (relative to the last article offered in 2020). There is a tendency for the number of detailed views to increase for the Premium tiers."""
 
-sns.catplot( data = df, x='make_name', y='detail_views', hue='product_tier', kind='box', height=7, aspect=4)
-plt.xticks(rotation=90)
+plt.figure(figsize=(28,7))
+plot_box_stats(box_stats(df, 'detail_views', by='make_name', hue='product_tier'), ylabel='detail_views')
 plt.show()
 
 """On the graph above it can be seen that Premium type articles mostly have more detail_views, while Basic articles have larger outliers. This is also confirmed with the plot below, which showes larger median and maximum detail_views for the Premium and Plus articles."""
 
-sns.catplot( data = df, x='detail_views', y='product_tier', kind='box', height=5, aspect=4)
-plt.xticks(rotation=90)
+plt.figure(figsize=(20,5))
+plot_box_stats(box_stats(df, 'detail_views', by='product_tier'), vert=False, ylabel='detail_views')
 plt.show()
 
-sns.catplot( data = df, x='stock_days', y='product_tier', kind='box', height=5, aspect=2)
-plt.xticks(rotation=90)
+plt.figure(figsize=(10,5))
+plot_box_stats(box_stats(df, 'stock_days', by='product_tier'), vert=False, ylabel='stock_days')
 plt.show()
 
 """The graph above shows that the Plus articles have generally larger stock_days then the Basic articles. The median stock_days for Basic Premium is about 20 days and of about 30 stock days for Plus articles.
@@ -335,15 +307,7 @@ Based on data exploratory analysis the following conclusions can be drawn:
 ## **Preparing data for training**
 """
 
-#Encoding categorical features. I chose label encoding because the number of categories in make_name is quite large and categories in product tier might be ordinal
-from sklearn.preprocessing import LabelEncoder
-# Creating a instance of label Encoder.
-label_encoder = LabelEncoder()
-# Encode labels in columns 'product_tier' and 'make_name'. 
-df_log['product_tier']= label_encoder.fit_transform(df_log['product_tier']) 
-df_log['make_name']= label_encoder.fit_transform(df_log['make_name'])
-
-c = np.round(df.corr(), 2)
+c = np.round(StreamingSummary(categorical=[]).update(df).corr(), 2)
 plt.figure(figsize=(12,12))
 sns.heatmap(c, annot=True, vmin=-1, vmax=1, cmap='coolwarm', square=True)
 plt.rcParams.update({'font.size':12})
@@ -353,15 +317,16 @@ plt.rcParams.update({'font.size':12})
 Since we want to predict detail views, the feature "ctr" should be removed from the input features because it is computed from the detail views we want to predict, so it will bias our model. I assume here that the feature search_views is available at the time of prediction and therefore can be used as a predictor.
 """
 
-X = df.loc[:, ['product_tier', 'make_name', 'price', 'first_zip_digit', 'first_registration_year', 'search_views', 'stock_days', 'peak_season']]
-y = df['detail_views'].to_numpy()
+"""The features are built by the ListingFeatures transformer, which is the first step of every model pipeline, so the same fitted object is used at scoring time. It encodes product_tier and make_name with label codes (I chose label encoding because the number of categories in make_name is quite large and categories in product tier might be ordinal) from code tables frozen at fit time, with an extra code for missing and unseen categories, derives peak_season from the dates and applies the log transformation to price, first_registration_year and search_views. The target detail_views is log transformed as well."""
 
-#split data into X and y from dataframe with log transformation
-X = df_log.loc[:, ['product_tier', 'make_name', 'price', 'first_zip_digit', 'first_registration_year', 'search_views', 'stock_days' 'peak_season']]
-y = df_log['detail_views'].to_numpy()
+from detail_views.features import FEATURE_TYPES, FEATURES, INPUT_COLUMNS, FeatureScaler, ListingFeatures, inverse_target, log_target
+
+#split data into X and y, X holds the raw columns used by the feature transformer
+X = df.loc[:, INPUT_COLUMNS]
+y = log_target(df['detail_views'])
 
 # storing column names in features
-features = X.columns
+features = FEATURES
 
 X.head()
 
@@ -369,134 +334,72 @@ X.head()
 from sklearn.model_selection import train_test_split
 X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.7, test_size = 0.3, random_state=100)
 
-"""## **Model Building, Training and Evaluation**"""
-
-from sklearn.model_selection import learning_curve
-def learning_curves(estimator, features, target, train_sizes, cv, scoring): 
-  train_sizes, train_scores, validation_scores = learning_curve(estimator, features, target, train_sizes = train_sizes, cv = cv, scoring = scoring)
-  train_scores_mean = train_scores.mean(axis = 1)
-  validation_scores_mean = validation_scores.mean(axis = 1)
-  
-  plt.plot(train_sizes, train_scores_mean, label = 'Training error')
-  plt.plot(train_sizes, validation_scores_mean, label = 'Validation error')
-  plt.ylabel('Explained variance', fontsize = 14)
-  plt.xlabel('Training set size', fontsize = 14)
-  title = 'Learning curves for a ' + str(estimator).split('(')[0] + ' model'
-  plt.title(title, fontsize = 18, y = 1.03)
-  plt.legend() 
-  plt.rcParams.update({'font.size': 14})
-#  plt.ylim(0,1.2)
-
-"""### **Linear regression**
+"""The transformed float32 matrices of the same split are cached as .npy files, keyed by the data, the feature list and the transform settings. They are opened memory-mapped, so the tuning workers below share one copy of the training matrix."""
+
+from detail_views.matrix_cache import cached_split
+split = cached_split(df, ListingFeatures(), train_size=0.7, random_state=100)
+
+"""## **Model Building, Training and Evaluation**
+
+The cross-validation results are cached on disk (.cache/cv), keyed by the model and its parameters, the data, the folds and the scoring, so re-running the notebook only re-evaluates the models that changed.
+
+All candidate models (linear regression, SVR, XGB and MLP) are registered in detail_views/models.py and cross-validated together on the cached feature matrix. The models run concurrently in separate processes within a CPU budget, so that the single-threaded SVR fit overlaps with the multi-threaded XGB fit. The results are collected in one table together with the fit/score times, wall time and peak memory of each model.
+
+### **Linear regression**
 
 Building the first model with original (no-log transform) data
 """
 
 from sklearn.linear_model import LinearRegression
+from detail_views import models
+from detail_views.harness import evaluate_models
+from detail_views.models import ModelSpec
+from detail_views.scoring import print_scores, scoring_with_n_iter
 
-# define model
-lr_reg = make_pipeline(StandardScaler(), LinearRegression())
-# define scoring
-scoring = ['explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2']
-# evaluate model
-cv_result = cross_validate(lr_reg, X_train, y_train, cv=5, scoring=scoring)
-# summarize performance
-print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
-print(f"R2: {cv_result['test_r2'].mean():.3f}")
-
-index = []
-scores = {"MAE": [], "RMSE": [], "R2": []}
-
-index += ['Linear regression']
-scores["MAE"].append(-cv_result['test_neg_mean_absolute_error'].mean())
-scores["RMSE"].append(-cv_result['test_neg_root_mean_squared_error'].mean())
-scores["R2"].append(cv_result['test_r2'].mean())
-df_scores = pd.DataFrame(scores, index=index)
-df_scores
+# define models, the first one on features and target without log transformation
+model_specs = {'Linear regression': ModelSpec(make_pipeline(ListingFeatures(log_transform=False), StandardScaler(), LinearRegression()),
+                                              threads=1, data=(X_train, inverse_target(y_train)))}
+model_specs.update(models.build())
+# evaluate models
+df_scores, cv_results = evaluate_models(split.X_train, split.y_train, model_specs, cv=5, scoring=scoring_with_n_iter(), verbose=False)
+
+print_scores(cv_results['Linear regression'])
 
 """Building the model with log transformed data"""
 
-# define model
-lr_reg = make_pipeline(StandardScaler(), LinearRegression())
-# define scoring
-scoring = ['explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2']
-# evaluate model
-cv_result = cross_validate(lr_reg, X_train, y_train, cv=5, scoring=scoring)
-# summarize performance
-print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
-print(f"R2: {cv_result['test_r2'].mean():.3f}")
-
-"""It can be seen that the higher accuracy is achieved when skewed features are transformed with log transformation. This transformation led to better learning from training data and better prediction on validation data."""
-
-index = ["Logistic regression log"]
-scores["MAE"]=-cv_result['test_neg_mean_absolute_error'].mean()
-scores["RMSE"]=-cv_result['test_neg_root_mean_squared_error'].mean()
-scores["R2"]=cv_result['test_r2'].mean()
-df2 = pd.DataFrame(scores, index=index)
-df_scores = df_scores.append(df2)
-df_scores
+print_scores(cv_results['Linear regression log'])
+
+"""It can be seen that the higher accuracy is achieved when skewed features are transformed with log transformation. This transformation led to better learning from training data and better prediction on validation data.
 
-"""Based on the results above, I will use data with log transformation to train and evaluate other learning algorithms.
+Based on the results above, I will use data with log transformation to train and evaluate other learning algorithms.
 
 ### **Support Vector Regression (SVR)**
 
 Let's try with Support vector regression that find the best fit line in a form of the hyperplane that has the maximum number of points, i.e. which maximizes a specified margin, representing a tolerable error (epsilon).
 """
 
-from sklearn.svm import SVR
-# define model
-svm_reg = make_pipeline(StandardScaler(), SVR(kernel='rbf', epsilon=0.1))
-# define scoring
-scoring = ['explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2']
-# evaluate model
-cv_result = cross_validate(svm_reg, X_train, y_train, cv=5, scoring=scoring)
-# summarize performance
-print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
-print(f"R2: {cv_result['test_r2'].mean():.3f}")
-
-index = ["SVR log"]
-scores["MAE"]=-cv_result['test_neg_mean_absolute_error'].mean()
-scores["RMSE"]=-cv_result['test_neg_root_mean_squared_error'].mean()
-scores["R2"]=cv_result['test_r2'].mean()
-df2 = pd.DataFrame(scores, index=index)
-df_scores = df_scores.append(df2)
-df_scores
+print_scores(cv_results['SVR log'])
 
 """SVR model with log transformed data provides lower MAE and RMSE, while increasing R2 by 0.02.
 
-### **eXtreme Gradient Boosting (XGBoost)**
+The exact SVR scales superlinearly with the number of training rows, and its prediction cost grows with the number of support vectors. The "SVR fast" variant approximates the RBF kernel with a low-rank Nystroem feature map followed by a linear epsilon-insensitive fit, so training is linear in the number of rows and a prediction costs n_components kernel evaluations. Its accuracy and fit/score times are in the leaderboard next to the exact SVR.
+"""
+
+print_scores(cv_results['SVR fast log'])
+
+"""The rank of the approximation trades accuracy for time. Below, the fast SVR is evaluated for a few numbers of components."""
+
+svr_fast_specs = {f'SVR fast log ({n})': ModelSpec(models.svr_fast(1, n_components=n)) for n in [100, 300, 1000]}
+svr_fast_scores, _ = evaluate_models(split.X_train, split.y_train, svr_fast_specs, cv=5, verbose=False)
+df_scores = pd.concat([df_scores, svr_fast_scores])
+svr_fast_scores
+
+"""### **eXtreme Gradient Boosting (XGBoost)**
 
 Let's now try XGB - boosted decision trees for predicting detail_views as it is a highly effective and widely used method. It has proven to be one of the best algorithms for structured problems that use tabular datasets with numbers and categories. It is very fast to train and easy to optimize.
 """
 
-import xgboost as xgb
-# define model
-xgb_reg = make_pipeline(StandardScaler(), xgb.XGBRegressor(objective='reg:squarederror', 
-                                                           max_depth=5, learning_rates=0.1, 
-                                                           n_estimators=100))
-# define scoring
-scoring = ['explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2']
-# evaluate model
-cv_result = cross_validate(xgb_reg, X_train, y_train, cv=5, scoring=scoring)
-# summarize performance
-print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
-print(f"R2: {cv_result['test_r2'].mean():.3f}")
-
-index = ["XGB log"]
-scores["MAE"]=-cv_result['test_neg_mean_absolute_error'].mean()
-scores["RMSE"]=-cv_result['test_neg_root_mean_squared_error'].mean()
-scores["R2"]=cv_result['test_r2'].mean()
-df2 = pd.DataFrame(scores, index=index)
-df_scores = df_scores.append(df2)
-df_scores
+print_scores(cv_results['XGB log'])
 
 """The results from XGB are slightly improved w.r.t SVR results. So here we see that their accuracy performance is simmilar on this task, but from the computational efficiency SVR took much more time to train than XGB.
 
@@ -504,124 +407,68 @@ df_scores
 
 Let's also try a simple artificial neural network algorithm: MLP (Multi Layer Perceptron). I chose MLP because we have a limited data set and the problem is not so complex that it requires deep learning. Deep neural networks require large datasets so as not to overfit the data, and are best suited for unstructured problems, such as images, videos, sound, text.
 
-I will try MLP networks with 3 different sizes: one hidden layer with 100, 500 and 1000 neurons.
+I will try MLP networks with 3 different sizes: one hidden layer with 100, 500 and 1000 neurons. The networks are trained on float32 data and each fold stops when the R2 on a 10% validation split has not improved by 0.0005 for 5 epochs, instead of running to the iteration cap. The leaderboard reports the number of epochs (n_iter) and the time to converge per fold.
 """
 
-from sklearn.neural_network import MLPRegressor
-# define model
-mlp_reg = make_pipeline(StandardScaler(), MLPRegressor(hidden_layer_sizes=(100,), activation='relu', solver='sgd', 
-                                                       alpha=0.0001, batch_size='auto', learning_rate='constant', learning_rate_init=0.001,))
-# define scoring
-scoring = ['explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2']
-# evaluate model
-cv_result = cross_validate(mlp_reg, X_train, y_train, cv=5, scoring=scoring)
-# summarize performance
-print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
-print(f"R2: {cv_result['test_r2'].mean():.3f}")
-
-from sklearn.neural_network import MLPRegressor
-# define model
-mlp_reg = make_pipeline(StandardScaler(), MLPRegressor(hidden_layer_sizes=(500,), activation='relu', solver='sgd', 
-                                                       alpha=0.0001, batch_size='auto', learning_rate='constant', learning_rate_init=0.001,))
-# define scoring
-scoring = ['explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2']
-# evaluate model
-cv_result = cross_validate(mlp_reg, X_train, y_train, cv=5, scoring=scoring)
-# summarize performance
-print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
-print(f"R2: {cv_result['test_r2'].mean():.3f}")
-
-from sklearn.neural_network import MLPRegressor
-# define model
-mlp_reg = make_pipeline(StandardScaler(), MLPRegressor(hidden_layer_sizes=(1000,), activation='relu', solver='sgd', 
-                                                       alpha=0.0001, batch_size='auto', learning_rate='constant', learning_rate_init=0.001,))
-# define scoring
-scoring = ['explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2']
-# evaluate model
-cv_result = cross_validate(mlp_reg, X_train, y_train, cv=5, scoring=scoring)
-# summarize performance
-print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
-print(f"R2: {cv_result['test_r2'].mean():.3f}")
-
-"""Increasing the number of neurons resulted in a slight improvement in accuracy. The third model with 1000 neurons in the hidden layer had the best results among the other ANNs and is included in the final table of the algorithm comparison."""
-
-index = ["MLP log"]
-scores["MAE"]=-cv_result['test_neg_mean_absolute_error'].mean()
-scores["RMSE"]=-cv_result['test_neg_root_mean_squared_error'].mean()
-scores["R2"]=cv_result['test_r2'].mean()
-df2 = pd.DataFrame(scores, index=index)
-df_scores = df_scores.append(df2)
-df_scores
+print_scores(cv_results['MLP 100 log'])
 
-"""The results show that the MLP model has lower accuracy than the SVR and XGB for this problem. Since the XGBoost (XGB) model has the highest accuracy, it is fine-tuned in the next step to further improve the accuracy.
+print_scores(cv_results['MLP 500 log'])
 
-### **XGBoost fine-tuning**
+print_scores(cv_results['MLP 1000 log'])
+
+"""Increasing the number of neurons resulted in a slight improvement in accuracy. The third model with 1000 neurons in the hidden layer had the best results among the other ANNs.
+
+The widths can also be swept together with the mini-batch size. All candidates are trained concurrently within the CPU budget, with one thread each.
 """
 
-#parameters tuning
-max_depth = [3, 5, 8, 10, 15, 20]
+from detail_views.mlp import mlp_sweep
+
+mlp_scores, mlp_results = evaluate_models(split.X_train, split.y_train, mlp_sweep(widths=[100, 500, 1000], batch_sizes=[200, 1000]), cv=5, scoring=scoring_with_n_iter(), verbose=False)
+mlp_scores[['MAE', 'RMSE', 'R2', 'n_iter', 'time_to_converge', 'wall_time']]
 
-for count in max_depth:
-  cv_result = cross_validate(xgb.XGBRegressor(objective='reg:squarederror', max_depth=count, learning_rate=0.1, n_estimators=100), X_train, y_train, cv=5, scoring=scoring)
-  print(f'For max depth: {count}')
-  print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-  print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-  print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
+df_scores
+
+"""The results show that the MLP model has lower accuracy than the SVR and XGB for this problem. Since the XGBoost (XGB) model has the highest accuracy, it is fine-tuned in the next step to further improve the accuracy.
 
-estimators = [50, 100, 150, 200, 300, 400, 500]
+### **XGBoost fine-tuning**
 
-for count in estimators:
-  cv_result = cross_validate(xgb.XGBRegressor(objective='reg:squarederror', n_estimators=count, max_depth=5, learning_rate=0.1), X_train, y_train, cv=5, scoring=scoring)
-  print(f'For estimators: {count}')
-  print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-  print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-  print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
+The max_depth, n_estimators and learning_rate are tuned jointly. The (config, fold) fits run in parallel on a process pool that shares the cached training matrix, each worker with a fixed number of XGBoost threads. Weak configurations are pruned early with successive halving: all configurations are scored on the first fold, the best third continues on more folds, and the remaining ones are evaluated on all 5 folds. Configurations that differ only in n_estimators share one fit per fold: the 500-tree model is trained once and the smaller forests are scored from its first trees."""
 
-learning_rates = [0.01, 0.05, 0.1, 0.3, 0.5]
+#parameters tuning
+from detail_views.tuning import search_xgb
 
-for count in learning_rates:
-  cv_result = cross_validate(xgb.XGBRegressor(objective='reg:squarederror', learning_rates=count, n_estimators=300, max_depth=5), X_train, y_train, cv=5, scoring=scoring)
-  print(f'For learning rates: {count}')
-  print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-  print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-  print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
+param_grid = {'max_depth': [3, 5, 8, 10, 15, 20],
+              'n_estimators': [50, 100, 150, 200, 300, 400, 500],
+              'learning_rate': [0.01, 0.05, 0.1, 0.3, 0.5]}
+tuning = search_xgb(split.X_train, split.y_train, param_grid, cv=5, threads_per_worker=2)
+best_params = tuning['params'].iloc[0]
+best_params
 
+import xgboost as xgb
 # define model
-xgb_reg = make_pipeline(StandardScaler(), xgb.XGBRegressor(objective='reg:squarederror', 
-                                                           max_depth=5, learning_rate=0.1, 
-                                                           n_estimators=300))
-# define scoring
-scoring = ['explained_variance', 'neg_mean_absolute_error', 'neg_root_mean_squared_error', 'r2']
-# evaluate model
-cv_result = cross_validate(xgb_reg, X_train, y_train, cv=5, scoring=scoring)
-# summarize performance
-print(f"Explained variance: {cv_result['test_explained_variance'].mean():.3f}")
-print(f"Mean absolute error: {-cv_result['test_neg_mean_absolute_error'].mean():.3f}")
-print(f"Root mean squared error: {-cv_result['test_neg_root_mean_squared_error'].mean():.3f}")
-print(f"R2: {cv_result['test_r2'].mean():.3f}")
+# the category codes are split natively by XGBoost and pass the scaler unchanged
+xgb_reg = make_pipeline(ListingFeatures(), FeatureScaler(), xgb.XGBRegressor(objective='reg:squarederror', 
+                                                           **best_params, tree_method='hist', enable_categorical=True,
+                                                           feature_types=FEATURE_TYPES, n_jobs=4))
+# evaluate model on the cached feature matrix, i.e. without the feature step
+tuned_scores, tuned_results = evaluate_models(split.X_train, split.y_train, {'XGB tuned log': ModelSpec(xgb_reg[1:], threads=4)}, cv=5)
+
+"""The learning curves are computed once for all metrics, with the (train size, fold) fits running in parallel. The train sizes are derived from the size of the training folds. The scores are cached, and both plots are drawn from the cached arrays."""
+
+from detail_views.learning_curves import learning_curve_scores, plot_learning_curve
+curves = learning_curve_scores(xgb_reg[1:], split.X_train, split.y_train, cv=5)
 
 plt.figure(figsize = (14,5))
-train_sizes = [1, 100, 500, 2000, 5000, 10000, 20000, 30000, 40000, 43845]
-learning_curves(xgb_reg, X_train, y_train, train_sizes, 5, 'explained_variance')
+plot_learning_curve(curves, 'explained_variance', title='Learning curves for a XGBRegressor model')
+plt.rcParams.update({'font.size': 14})
 
 plt.figure(figsize = (14,5))
-train_sizes = [1, 100, 500, 2000, 5000, 10000, 20000, 30000, 40000, 43845]
-learning_curves(xgb_reg, X_train, y_train, train_sizes, 5, 'neg_mean_absolute_error')
+plot_learning_curve(curves, 'neg_mean_absolute_error', title='Learning curves for a XGBRegressor model')
+plt.rcParams.update({'font.size': 14})
 
 """The learning curves show that the accuracy on the validation data improves as the size of the training set increases. In the end, the validation error is similar to the training error."""
 
-index = ["XGB tuned log"]
-scores["MAE"]=-cv_result['test_neg_mean_absolute_error'].mean()
-scores["RMSE"]=-cv_result['test_neg_root_mean_squared_error'].mean()
-scores["R2"]=cv_result['test_r2'].mean()
-df2 = pd.DataFrame(scores, index=index)
-df_scores = df_scores.append(df2)
+df_scores = pd.concat([df_scores, tuned_scores])
 df_scores
 
 """XGB tuned model delivers the best performance metric results.
@@ -641,10 +488,29 @@ print(f"R2 score: {r2_score(y_true=y_test, y_pred=y_pred):.3f}")
 print(f"Mean absolute error: {mean_absolute_error(y_true=y_test, y_pred=y_pred):.3f}")
 print(f"Root mean squared error: {np.sqrt(mean_squared_error(y_true=y_test, y_pred=y_pred)):.3f}")
 
-"""Result on test dataset are similar as on cross-validation dataset, showing that the model is able to generalize well to new examples."""
+"""Result on test dataset are similar as on cross-validation dataset, showing that the model is able to generalize well to new examples.
+
+### **Backtest over created_date**
+
+The random split and the shuffled folds train on listings created after the ones they are scored on. The backtest trains on the listings created in the 8 weeks before a cutoff and scores the ones created in the 2 weeks after it, for cutoffs 2 weeks apart, as a retrained model would be used. The windows of both models are fitted in parallel."""
+
+from detail_views.backtest import backtest, summarize
+backtest_table = backtest(df, {'Linear regression log': models.build(['Linear regression log'])['Linear regression log'],
+                               'XGB tuned log': ModelSpec(xgb_reg[1:], threads=4)},
+                          test_days=14, train_days=56)
+summarize(backtest_table)
 
-y_pred_transf=10**(y_pred)
-y_test_transf=10**(y_test)
+"""The fitted pipeline (feature transform, scaler and XGB model) is saved as a new version in the models directory. It can be served with `python -m detail_views.serving --model models`, which returns detail_views on the original scale.
+
+Listings to be scored cannot be dropped when search_views is missing. The grouping explored at the beginning is therefore used for imputation at scoring time: medians of the views per product_tier, make_name and stock_days bucket are precomputed on the training data, with fallbacks to coarser groups (product_tier and make_name, product_tier, all data) where a group is too small. The imputer is saved together with the model."""
+
+from detail_views.artifact import save_model
+from detail_views.imputation import GroupImputer
+imputer = GroupImputer(columns=['search_views']).fit(X_train)
+save_model(xgb_reg, 'models', metadata={'params': best_params, 'test_r2': r2_score(y_true=y_test, y_pred=y_pred)}, imputer=imputer)
+
+y_pred_transf=inverse_target(y_pred)
+y_test_transf=inverse_target(y_test)
 
 fig, axs = plt.subplots(1)
 plt.plot(y_pred_transf, 'o', linewidth=1, markersize=4,  label='Prediction')
@@ -680,9 +546,10 @@ plt.rcParams ['figure.figsize'] = [6, 4]
 
 """From the distribution it can be seen that most of the errors are at 0. The higher errors are in the minority and they are mostly positive, which means that the model underestimates some outliers."""
 
-# Permutation feature importance
-from sklearn.inspection import permutation_importance
-result = permutation_importance(xgb_reg, X_test, y_test, n_repeats=10, random_state=42, n_jobs=2)
+# Permutation feature importance, all permuted copies of the test features are scored in a few batched predict calls
+from detail_views.importance import permutation_importance_batched, shap_importance
+X_test_features = xgb_reg[0].transform(X_test)
+result = permutation_importance_batched(xgb_reg[1:], X_test_features, y_test, n_repeats=10, random_state=42)
 xgb_importances = pd.Series(result.importances_mean, index=features)
 
 #Permutation feature importance on test dataset
@@ -699,6 +566,11 @@ plt.rcParams ['figure.figsize'] = [6, 5]
 for i,v in enumerate(xgb_importances):
 	print('Feature: %0d, Score: %.5f' % (i,v))
 
+"""The mean absolute SHAP contributions computed by XGBoost give a second, exact view of the feature importance."""
+
+shap_importances = pd.Series(shap_importance(xgb_reg[1:], X_test_features).importances_mean, index=features)
+shap_importances
+
 """Based on feature importance, it can be seen that the most important feature is search_views, while the other important features are stock_days, first_registration_year and price.
 
 ### Conclusion
@@ -0,0 +1,29 @@
+import pytest
+
+from detail_views.synthetic import write_items_csv
+
+
+@pytest.fixture
+def items_csv(tmp_path):
+    """A small synthetic export with some defective rows."""
+    return write_items_csv(str(tmp_path / 'Items_Cars_Data.csv'), 2000, random_state=0, dirty=0.01)
+
+
+@pytest.fixture
+def mangled_csv(items_csv):
+    """The export with the price of its first listing mangled to 12.950; returns (path, article_id)."""
+    with open(items_csv) as f:
+        header, first, *rest = f.read().splitlines()
+    fields = first.split(';')
+    fields[header.split(';').index('price')] = '12.950'
+    with open(items_csv, 'w') as f:
+        f.write('\n'.join([header, ';'.join(fields), *rest]) + '\n')
+    return items_csv, int(fields[0])
+
+
+@pytest.fixture
+def clean_df(items_csv):
+    """The synthetic export read and cleaned as in the notebook."""
+    from detail_views.cleaning import clean_items
+    from detail_views.loading import read_items_csv
+    return clean_items(read_items_csv(items_csv))
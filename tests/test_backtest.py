@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from detail_views.backtest import backtest, sorted_matrix, summarize, time_windows
+
+
+def days(start, n):
+    """One listing per day for ``n`` days (created at noon)."""
+    return np.datetime64(start) + np.arange(n).astype('timedelta64[D]') + np.timedelta64(12, 'h')
+
+
+def test_expanding_windows():
+    dates = days('2018-07-01', 70)
+    windows = time_windows(dates, test_days=14, min_train_days=28)
+    assert [str(w.cutoff) for w in windows] == ['2018-07-29', '2018-08-12', '2018-08-26']
+    assert all(w.train_start == 0 for w in windows)
+    assert [(w.train_stop, w.test_start, w.test_stop) for w in windows] == [(28, 28, 42), (42, 42, 56), (56, 56, 70)]
+
+
+def test_rolling_windows_with_a_step_and_a_gap():
+    dates = days('2018-07-01', 70)
+    windows = time_windows(dates, test_days=7, train_days=21, step_days=10, gap_days=3)
+    first = windows[0]
+    assert str(first.train_from) == '2018-07-01' and str(first.cutoff) == '2018-07-22'
+    assert str(first.test_from) == '2018-07-25' and str(first.test_to) == '2018-08-01'
+    assert (first.train_start, first.train_stop, first.test_start, first.test_stop) == (0, 21, 24, 31)
+    assert all(w.train_stop - w.train_start == 21 for w in windows)
+    assert np.diff([w.cutoff for w in windows]).astype(int).tolist() == [10] * (len(windows) - 1)
+    # the last window ends with the listings, however few test days are left
+    assert windows[-1].test_stop == 70
+
+
+def test_bounds_are_positions_in_the_sorted_dates():
+    rng = np.random.default_rng(0)
+    dates = np.sort(days('2018-07-01', 90)[rng.integers(0, 90, 1000)])
+    for w in time_windows(dates, test_days=14, min_train_days=28, gap_days=2):
+        assert (dates[w.train_start:w.train_stop] < w.cutoff).all()
+        assert (dates[w.test_start:w.test_stop] >= w.test_from).all()
+        assert (dates[w.test_start:w.test_stop] < w.test_to).all()
+        assert w.test_start == np.searchsorted(dates, w.test_from)
+
+
+def test_too_short_a_span_has_no_windows():
+    assert time_windows(days('2018-07-01', 20), min_train_days=28) == []
+
+
+def test_backtest_scores_every_window(clean_df):
+    X, y, dates = sorted_matrix(clean_df)
+    assert (np.diff(dates) >= np.timedelta64(0)).all()
+    assert X.shape == (len(clean_df), X.shape[1]) and X.dtype == np.float32
+
+    table = backtest(clean_df, {'linear': LinearRegression()}, test_days=14, min_train_days=56, n_workers=1,
+                     verbose=False)
+    windows = time_windows(dates, test_days=14, min_train_days=56)
+    assert len(table) == len(windows)
+    assert table['train_rows'].tolist() == [w.train_stop - w.train_start for w in windows]
+    assert np.isfinite(table['r2']).all()
+    assert summarize(table).loc['linear', ('r2', 'mean')] == pytest.approx(table['r2'].mean())
+
+
+def test_backtest_needs_a_window(clean_df):
+    with pytest.raises(ValueError, match='too short'):
+        backtest(clean_df, {'linear': LinearRegression()}, min_train_days=365, n_workers=1, verbose=False)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import make_pipeline
+
+from detail_views.artifact import ModelArtifact
+from detail_views.batch_scoring import read_chunks, score_file
+from detail_views.features import INPUT_COLUMNS, TARGET, ListingFeatures, log_target
+from detail_views.imputation import GroupImputer
+from detail_views.loading import read_items_csv
+from detail_views.validation import repair_numeric_columns, validate_items
+
+
+def test_only_the_chunk_with_mangled_numbers_is_read_as_text(mangled_csv):
+    path, article_id = mangled_csv
+    chunks = list(read_chunks(path, chunk_rows=300))
+    assert [len(chunk) for chunk in chunks] == [300] * 6 + [200]
+    assert [chunk['price'].dtype.name for chunk in chunks] == ['string'] + ['int32'] * 6
+    assert chunks[0]['price'].iloc[0] == '12.950'
+    assert pd.concat(chunks)['article_id'].tolist() == read_items_csv(path)['article_id'].tolist()
+
+
+def test_chunk_boundaries(items_csv):
+    assert [len(chunk) for chunk in read_chunks(items_csv, chunk_rows=1000)] == [1000, 1000]
+    assert [len(chunk) for chunk in read_chunks(items_csv, chunk_rows=5000)] == [2000]
+
+
+@pytest.fixture
+def artifact(items_csv):
+    clean, _ = validate_items(read_items_csv(items_csv))
+    train = clean.dropna(subset=['search_views', TARGET])
+    pipeline = make_pipeline(ListingFeatures(), LinearRegression(n_jobs=3))
+    pipeline.fit(train[INPUT_COLUMNS], log_target(train[TARGET]))
+    # the listings without view counts are filled from the group statistics
+    return ModelArtifact(pipeline, imputer=GroupImputer().fit(clean))
+
+
+def test_score_file_matches_predicting_the_whole_frame(artifact, mangled_csv, tmp_path):
+    path, article_id = mangled_csv
+    output = str(tmp_path / 'scores.csv')
+    stats = score_file(artifact, path, output, chunk_rows=300, n_workers=2, verbose=False)
+    scores = pd.read_csv(output)
+
+    df, _ = repair_numeric_columns(read_items_csv(path))
+    assert stats['rows'] == len(df)
+    assert scores['article_id'].tolist() == df['article_id'].tolist()
+    np.testing.assert_allclose(scores['detail_views_pred'], artifact.predict_views(df), rtol=1e-6)
+    # the caller's thread setting is restored
+    assert artifact.pipeline[-1].n_jobs == 3
@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import KFold
+
+from detail_views import cv_cache
+from detail_views.cv_cache import cached_cross_validate, entry_path, evict, read_entry, write_entry
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 3))
+    y = X @ [1.0, -2.0, 0.5] + rng.normal(0, 0.1, 200)
+    return X, y
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Count the cross-validations actually run."""
+    calls = []
+    cross_validate = cv_cache._cross_validate
+
+    def counting(*args, **kwargs):
+        calls.append(kwargs)
+        return cross_validate(*args, **kwargs)
+
+    monkeypatch.setattr(cv_cache, '_cross_validate', counting)
+    return calls
+
+
+def test_hit_returns_the_cached_result(data, tmp_path, runs):
+    X, y = data
+    first = cached_cross_validate(Ridge(), X, y, cv=4, cache_dir=str(tmp_path))
+    second = cached_cross_validate(Ridge(), X, y, cv=4, cache_dir=str(tmp_path), n_jobs=1)
+    assert len(runs) == 1
+    assert first.keys() == second.keys()
+    for key in first:
+        np.testing.assert_array_equal(first[key], second[key])
+
+    cached_cross_validate(Ridge(alpha=2), X, y, cv=4, cache_dir=str(tmp_path))
+    cached_cross_validate(Ridge(), X, y[::-1].copy(), cv=4, cache_dir=str(tmp_path))
+    assert len(runs) == 3
+
+
+def test_result_arguments_are_part_of_the_key(data, tmp_path):
+    X, y = data
+    path = entry_path(Ridge(), X, y, 4, ['r2'], str(tmp_path))
+    assert entry_path(Ridge(), X, y, 4, ['r2'], str(tmp_path), n_jobs=2, verbose=1) == path
+    assert entry_path(Ridge(), X, y, 4, ['r2'], str(tmp_path), return_train_score=True) != path
+    groups = np.arange(len(y)) % 5
+    with_groups = entry_path(Ridge(), X, y, 4, ['r2'], str(tmp_path), groups=groups)
+    assert with_groups != path
+    assert entry_path(Ridge(), X, y, 4, ['r2'], str(tmp_path), groups=groups[::-1].copy()) != with_groups
+
+
+def test_train_scores_are_cached(data, tmp_path, runs):
+    X, y = data
+    result = cached_cross_validate(Ridge(), X, y, cv=4, cache_dir=str(tmp_path), return_train_score=True)
+    cached = cached_cross_validate(Ridge(), X, y, cv=4, cache_dir=str(tmp_path), return_train_score=True)
+    assert len(runs) == 1
+    np.testing.assert_array_equal(cached['train_r2'], result['train_r2'])
+
+
+def test_uncacheable_arguments(data, tmp_path, runs):
+    X, y = data
+    with pytest.raises(ValueError, match='return_estimator'):
+        cached_cross_validate(Ridge(), X, y, cv=4, cache_dir=str(tmp_path), return_estimator=True)
+    result = cached_cross_validate(Ridge(), X, y, cv=4, cache_dir=None, return_estimator=True)
+    assert len(result['estimator']) == 4
+    # a shuffling splitter without a seed is never cached
+    cached_cross_validate(Ridge(), X, y, cv=KFold(4, shuffle=True), cache_dir=str(tmp_path))
+    assert not os.listdir(tmp_path)
+
+
+def test_evict_removes_the_least_recently_used(tmp_path):
+    result = {'test_r2': np.arange(10.0)}
+    paths = [str(tmp_path / f'{name}.json') for name in 'abc']
+    for i, path in enumerate(paths):
+        write_entry(path, result)
+        os.utime(path, (1000 + i, 1000 + i))
+    size = os.path.getsize(paths[0])
+    # reading an entry makes it the most recently used
+    assert read_entry(paths[0]) is not None
+    evict(str(tmp_path), max_bytes=2 * size)
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'c.json']
+    evict(str(tmp_path), max_bytes=size - 1)
+    assert not os.listdir(tmp_path)
+    assert read_entry(paths[0]) is None
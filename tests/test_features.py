@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from detail_views.features import (CATEGORICAL, FEATURES, INPUT_COLUMNS, CategoryEncoder, FeatureScaler,
+                                   ListingFeatures, months, peak_season)
+
+
+def test_months_and_peak_season():
+    created = pd.to_datetime(pd.Series(['2018-03-01', '2018-06-30', '2018-07-15', '2018-12-31']))
+    deleted = pd.to_datetime(pd.Series(['2018-03-20', '2018-07-01', '2018-09-01', '2019-01-02']))
+    assert months(created).tolist() == [3, 6, 7, 12]
+    assert months(deleted).tolist() == [3, 7, 9, 1]
+    assert peak_season(created, deleted).tolist() == [1, 0, 1, 0]
+
+
+def test_transform_matches_the_notebook_columns(clean_df):
+    features = ListingFeatures().fit(clean_df)
+    X = features.transform(clean_df[INPUT_COLUMNS])
+    assert X.shape == (len(clean_df), len(FEATURES)) and X.dtype == np.float32
+    assert features.get_feature_names_out().tolist() == FEATURES
+    column = dict(zip(FEATURES, X.T))
+
+    np.testing.assert_allclose(column['price'], np.log10(clean_df['price'] + 1), rtol=1e-6)
+    np.testing.assert_allclose(column['search_views'], np.log10(clean_df['search_views'] + 1), rtol=1e-6)
+    np.testing.assert_array_equal(column['stock_days'], clean_df['stock_days'].astype(np.float32))
+    np.testing.assert_array_equal(column['first_zip_digit'], clean_df['first_zip_digit'])
+    np.testing.assert_array_equal(column['peak_season'],
+                                  peak_season(clean_df['created_date'], clean_df['deleted_date']))
+    # the codes are the positions in the sorted categories, as with LabelEncoder
+    makes = np.unique(clean_df['make_name'])
+    np.testing.assert_array_equal(column['make_name'], np.searchsorted(makes, clean_df['make_name']))
+
+    raw = ListingFeatures(log_transform=False).fit(clean_df).transform(clean_df)
+    np.testing.assert_array_equal(raw[:, FEATURES.index('price')], clean_df['price'].astype(np.float32))
+
+
+def test_unknown_categories_get_the_extra_code(clean_df):
+    features = ListingFeatures().fit(clean_df)
+    rows = clean_df.iloc[:3].copy()
+    rows['make_name'] = ['Unseen', None, rows['make_name'].iloc[2]]
+    X = features.transform(rows)
+    unknown = len(features.categories_['make_name'])
+    assert X[:2, FEATURES.index('make_name')].tolist() == [unknown, unknown]
+    assert X[2, FEATURES.index('make_name')] < unknown
+
+
+@pytest.fixture
+def encoder():
+    return CategoryEncoder.fit(pd.Series(['Opel', 'Audi', 'BMW', None, 'Audi']))
+
+
+def test_codes_are_positions_in_the_sorted_categories(encoder):
+    assert encoder.categories.tolist() == ['Audi', 'BMW', 'Opel']
+    assert encoder.unknown == 3
+    categorical = pd.Series(['BMW', 'Audi'], dtype=pd.CategoricalDtype(['Zeta', 'BMW', 'Audi']))
+    # unused categories of a categorical column are not part of the table
+    assert CategoryEncoder.fit(categorical).categories.tolist() == ['Audi', 'BMW']
+
+
+@pytest.mark.parametrize('n', [5, 1000])
+def test_encode_paths_agree(encoder, n):
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.choice(np.array(['Audi', 'BMW', 'Opel', 'Zeta', None], dtype=object), n))
+    expected = [{'Audi': 0, 'BMW': 1, 'Opel': 2}.get(v, 3) for v in values]
+    assert encoder.encode(values).tolist() == expected
+    assert encoder.encode(values.astype('category')).tolist() == expected
+    known = values.where(values != 'Zeta')
+    same_categories = known.astype(pd.CategoricalDtype(encoder.categories))
+    assert encoder.encode(same_categories).tolist() == encoder.encode(known).tolist()
+    assert encoder.encode(values).dtype == np.int32
+
+
+def test_scaler_passes_the_category_codes_through(clean_df):
+    X = ListingFeatures().fit(clean_df).transform(clean_df)
+    scaler = FeatureScaler().fit(X)
+    scaled = scaler.transform(X)
+    for j, col in enumerate(FEATURES):
+        if col in CATEGORICAL:
+            np.testing.assert_array_equal(scaled[:, j], X[:, j])
+        else:
+            assert scaled[:, j].mean() == pytest.approx(0, abs=1e-4)
+    np.testing.assert_allclose(scaler.inverse_transform(scaled), X, rtol=1e-5, atol=1e-5)
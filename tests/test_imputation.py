@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from detail_views.imputation import GroupImputer
+
+
+def listings(tiers, makes, stock_days, search_views):
+    return pd.DataFrame({'product_tier': tiers, 'make_name': makes, 'stock_days': stock_days,
+                         'search_views': np.asarray(search_views, dtype=np.float64),
+                         'detail_views': np.asarray(search_views, dtype=np.float64) / 10})
+
+
+def training_frame():
+    # Basic/Audi listings in the first stock bucket view 100 times, in the second 300 times,
+    # Basic/BMW ones 1000 times, and the only Premium ones 5000 times
+    return listings(['Basic'] * 20 + ['Premium'] * 5,
+                    ['Audi'] * 15 + ['BMW'] * 5 + ['Audi'] * 5,
+                    [1] * 10 + [10] * 5 + [1] * 5 + [1] * 5,
+                    [100] * 10 + [300] * 5 + [1000] * 5 + [5000] * 5)
+
+
+def test_fills_from_the_finest_group_with_enough_data():
+    imputer = GroupImputer(min_count=5).fit(training_frame())
+    new = listings(['Basic', 'Basic', 'Basic'], ['Audi', 'Audi', 'BMW'], [2, 12, 2], [np.nan, np.nan, np.nan])
+    filled = imputer.transform(new)
+    assert filled['search_views'].tolist() == [100, 300, 1000]
+    assert filled['detail_views'].tolist() == [10, 30, 100]
+
+
+def test_falls_back_to_coarser_groups():
+    imputer = GroupImputer(min_count=5).fit(training_frame())
+    new = listings(['Basic', 'Premium', 'Plus'], ['Opel', 'Audi', 'Audi'], [2, 100, 2], [np.nan] * 3)
+    filled = imputer.transform(new)
+    basic = np.median([100] * 10 + [300] * 5 + [1000] * 5)
+    overall = np.median(training_frame()['search_views'])
+    # unknown make: tier median; sparse (tier, make, bucket): (tier, make) median; unknown tier: global
+    assert filled['search_views'].tolist() == [basic, 5000, overall]
+
+
+def test_small_groups_are_treated_as_empty():
+    imputer = GroupImputer(min_count=6).fit(training_frame())
+    new = listings(['Basic'], ['BMW'], [2], [np.nan])
+    basic = np.median([100] * 10 + [300] * 5 + [1000] * 5)
+    assert imputer.transform(new)['search_views'].item() == basic
+
+
+def test_observed_values_and_the_input_are_left_alone():
+    imputer = GroupImputer().fit(training_frame())
+    new = listings(['Basic', 'Basic'], ['Audi', 'Audi'], [2, 2], [7, np.nan])
+    filled = imputer.transform(new)
+    assert filled['search_views'].tolist() == [7, 100]
+    assert np.isnan(new['search_views'].iloc[1])
+
+
+def test_frames_without_the_target_column():
+    imputer = GroupImputer().fit(training_frame())
+    new = listings(['Basic'], ['Audi'], [2], [np.nan]).drop(columns='detail_views')
+    assert imputer.transform(new)['search_views'].item() == 100
+
+
+def test_missing_categories_do_not_fill_the_last_group():
+    # the listings without a make must not land in the cell of the last make (Zeta)
+    train = listings(['Basic'] * 38, ['Audi'] * 20 + ['Zeta'] * 3 + [np.nan] * 15, [1] * 38,
+                     [10] * 20 + [20] * 3 + [1000] * 15)
+    imputer = GroupImputer(min_count=5).fit(train)
+    new = listings(['Basic', 'Basic', 'Basic'], ['Zeta', np.nan, 'Audi'], [1, 1, 1], [np.nan] * 3)
+    # Zeta has too few rows and a missing make has no group: both get the tier median
+    assert imputer.transform(new)['search_views'].tolist() == [10, 10, 10]
+    assert np.isnan(imputer.tables_['search_views'][1]).tolist() == [[False, True]]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from detail_views.artifact import ModelArtifact, load_model
+from detail_views.features import INPUT_COLUMNS, TARGET, ListingFeatures, log_target
+from detail_views.incremental import scaler_drift, update_model
+
+
+@pytest.fixture
+def batches(clean_df):
+    """The listings in created_date order, split into the old data, a new batch and a holdout."""
+    df = clean_df.sort_values('created_date', kind='stable').reset_index(drop=True)
+    n = len(df)
+    return df.iloc[:n * 3 // 5], df.iloc[n * 3 // 5:n * 4 // 5], df.iloc[n * 4 // 5:]
+
+
+@pytest.fixture
+def artifact(batches):
+    old = batches[0]
+    pipeline = make_pipeline(ListingFeatures(), StandardScaler(),
+                             xgb.XGBRegressor(n_estimators=30, max_depth=3, n_jobs=1))
+    pipeline.fit(old[INPUT_COLUMNS], log_target(old[TARGET]))
+    return ModelArtifact(pipeline, version=1, metadata={'model': 'xgb'})
+
+
+def n_trees(pipeline):
+    return pipeline[-1].get_booster().num_boosted_rounds()
+
+
+def test_scaler_drift():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1000, 3))
+    scaler = StandardScaler().fit(X)
+    assert scaler_drift(scaler, X) == pytest.approx(0, abs=1e-12)
+    shifted = X + [0, 6, 0]
+    # the mean of the second feature moves by half the shift, about 3 std
+    assert scaler_drift(scaler, shifted) == pytest.approx(3, rel=0.05)
+    assert scaler.n_samples_seen_ == 1000
+
+
+def test_update_continues_the_booster(artifact, batches, tmp_path):
+    _, new, holdout = batches
+    directory = str(tmp_path / 'models')
+    updated, report = update_model(artifact, new, holdout, n_trees=10, max_degradation=1, max_drift=np.inf,
+                                   directory=directory)
+    assert report['action'] == 'updated'
+    assert n_trees(updated.pipeline) == 40
+    assert n_trees(artifact.pipeline) == 30
+    # the new trees split on the scaling of the old ones
+    assert updated.pipeline[1] is artifact.pipeline[1]
+
+    saved = load_model(directory)
+    assert saved.version == updated.version == 1
+    assert saved.metadata['parent_version'] == 1 and saved.metadata['update']['action'] == 'updated'
+    np.testing.assert_allclose(saved.predict_log(holdout), updated.predict_log(holdout), rtol=1e-6)
+
+
+def test_rejected_update_leaves_the_model_unchanged(artifact, batches, tmp_path):
+    _, new, holdout = batches
+    before = artifact.predict_log(holdout)
+    directory = tmp_path / 'models'
+    result, report = update_model(artifact, new, holdout, n_trees=10, max_drift=-1, directory=str(directory))
+    assert report['action'] == 'rejected'
+    assert result is artifact
+    assert n_trees(artifact.pipeline) == 30
+    np.testing.assert_array_equal(artifact.predict_log(holdout), before)
+    assert not directory.exists()
+
+
+def test_degraded_update_falls_back_to_retraining(artifact, batches):
+    old, new, holdout = batches
+    full = pd.concat([old, new], ignore_index=True)
+    retrained, report = update_model(artifact, new, holdout, n_trees=10, max_degradation=-1, full_df=full)
+    assert report['action'] == 'retrained'
+    assert n_trees(retrained.pipeline) == 30
+    assert retrained.pipeline[1].n_samples_seen_ == len(full)
+    assert retrained.metadata['parent_version'] == 1
+    rmse = np.sqrt(np.mean((retrained.predict_log(holdout) - log_target(holdout[TARGET])) ** 2))
+    assert report['rmse_after'] == pytest.approx(rmse, rel=1e-5)
+    assert artifact.pipeline[1].n_samples_seen_ == len(old)
+
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from detail_views.learning_curves import default_train_sizes, learning_curve_scores
+from detail_views.scoring import SCORING, regression_scores
+from detail_views.tuning import fold_splits
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(500, 3)).astype(np.float32)
+    y = (X[:, 0] + np.sin(2 * X[:, 1]) + rng.normal(0, 0.1, 500)).astype(np.float32)
+    return X, y
+
+
+def test_default_train_sizes():
+    sizes = default_train_sizes(1000, cv=5, n_sizes=4, min_size=100)
+    assert sizes.tolist() == [100, 333, 566, 800]
+
+
+def test_cells_match_fitting_each_subset(data, tmp_path):
+    X, y = data
+    result = learning_curve_scores(Ridge(), X, y, train_sizes=[50, 400], cv=4, n_workers=1,
+                                   cache_dir=str(tmp_path))
+    assert result['test_r2'].shape == (2, 4)
+    assert set(result) == {'train_sizes'} | {f'{part}_{name}' for part in ('train', 'test') for name in SCORING}
+    train, test = fold_splits(len(y), 4)[2]
+    expected = regression_scores(y[test], Ridge().fit(X[train[:50]], y[train[:50]]).predict(X[test]))
+    assert result['test_r2'][0, 2] == pytest.approx(expected['r2'])
+
+    # the second call is read from the cache
+    assert len(os.listdir(tmp_path)) == 1
+    cached = learning_curve_scores(Ridge(), X, y, train_sizes=[50, 400], cv=4, cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(cached['test_r2'], result['test_r2'])
+
+
+def test_xgboost_cells_and_incremental_mode(data):
+    X, y = data
+    model = make_pipeline(StandardScaler(), xgb.XGBRegressor(n_estimators=40, max_depth=3, n_jobs=8))
+    full = learning_curve_scores(model, X, y, train_sizes=[100, 375], cv=4, n_workers=1, cache_dir=None)
+    incremental = learning_curve_scores(model, X, y, train_sizes=[100, 375], cv=4, n_workers=1,
+                                        incremental=True, cache_dir=None)
+    assert full['test_r2'].shape == incremental['test_r2'].shape == (2, 4)
+    # more data helps in both modes
+    assert (full['test_r2'][1] > full['test_r2'][0]).all()
+    assert incremental['test_r2'][1].mean() > incremental['test_r2'][0].mean()
+
+
+def test_incremental_mode_needs_xgboost(data):
+    X, y = data
+    with pytest.raises(ValueError, match='XGBRegressor, got Ridge'):
+        learning_curve_scores(make_pipeline(StandardScaler(), Ridge()), X, y, incremental=True, cache_dir=None)
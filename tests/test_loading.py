@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+import pytest
+
+from detail_views import loading
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Count the CSV parses done by load_items."""
+    calls = []
+    read_items_csv = loading.read_items_csv
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return read_items_csv(*args, **kwargs)
+
+    monkeypatch.setattr(loading, 'read_items_csv', counting)
+    return calls
+
+
+def test_cache_is_reused_while_the_source_is_unchanged(items_csv, tmp_path, parses):
+    cache_dir = str(tmp_path / 'cache')
+    first = loading.load_items(items_csv, cache_dir)
+    second = loading.load_items(items_csv, cache_dir)
+    assert len(parses) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_touched_but_unchanged_source_is_not_reparsed(items_csv, tmp_path, parses):
+    cache_dir = str(tmp_path / 'cache')
+    loading.load_items(items_csv, cache_dir)
+    stat = os.stat(items_csv)
+    os.utime(items_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    loading.load_items(items_csv, cache_dir)
+    assert len(parses) == 1
+
+
+def test_changed_source_invalidates_the_cache(items_csv, tmp_path, parses):
+    cache_dir = str(tmp_path / 'cache')
+    before = loading.load_items(items_csv, cache_dir)
+    with open(items_csv) as f:
+        lines = f.read().splitlines()
+    with open(items_csv, 'w') as f:
+        f.write('\n'.join(lines[:-1]) + '\n')
+    after = loading.load_items(items_csv, cache_dir)
+    assert len(parses) == 2
+    assert len(after) == len(before) - 1
+
+
+@pytest.mark.filterwarnings('ignore:Could not infer format')
+def test_date_format_is_part_of_the_cache_key(items_csv, tmp_path, parses):
+    cache_dir = str(tmp_path / 'cache')
+    loading.load_items(items_csv, cache_dir)
+    loading.load_items(items_csv, cache_dir, date_format='%d.%m.%y')
+    assert len(parses) == 1
+    loading.load_items(items_csv, cache_dir, date_format='%d.%m.%Y')
+    assert len(parses) == 2
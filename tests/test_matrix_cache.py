@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.model_selection import train_test_split
+
+from detail_views import matrix_cache
+from detail_views.features import INPUT_COLUMNS, TARGET, ListingFeatures, log_target
+from detail_views.matrix_cache import array_source, cached_split, frame_fingerprint, open_array
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Count the splits built on a cache miss."""
+    calls = []
+    build_split = matrix_cache._build_split
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return build_split(*args, **kwargs)
+
+    monkeypatch.setattr(matrix_cache, '_build_split', counting)
+    return calls
+
+
+def test_split_matches_the_notebook(clean_df, tmp_path):
+    split = cached_split(clean_df, cache_dir=str(tmp_path / 'matrices'), train_size=0.7, random_state=100)
+    X = ListingFeatures().fit(clean_df).transform(clean_df[INPUT_COLUMNS])
+    y = log_target(clean_df[TARGET]).astype(np.float32)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.7, random_state=100)
+    np.testing.assert_array_equal(split.X_train, X_train)
+    np.testing.assert_array_equal(split.X_test, X_test)
+    np.testing.assert_array_equal(split.y_train, y_train)
+    np.testing.assert_array_equal(split.y_test, y_test)
+    assert isinstance(split.X_train, np.memmap) and split.X_train.dtype == np.float32
+    np.testing.assert_array_equal(split.transformer.transform(clean_df[INPUT_COLUMNS]), X)
+
+
+def test_split_is_reused_and_keyed(clean_df, tmp_path, builds):
+    cache_dir = str(tmp_path / 'matrices')
+    first = cached_split(clean_df, cache_dir=cache_dir)
+    assert cached_split(clean_df.copy(), cache_dir=cache_dir).path == first.path
+    assert len(builds) == 1
+
+    assert cached_split(clean_df, cache_dir=cache_dir, random_state=1).path != first.path
+    assert cached_split(clean_df, cache_dir=cache_dir, train_size=0.5).path != first.path
+    assert cached_split(clean_df.iloc[1:], cache_dir=cache_dir).path != first.path
+    assert len(builds) == 4
+    assert sorted(os.listdir(cache_dir)) == sorted({os.path.basename(call[2]) for call in builds})
+
+
+def test_frame_fingerprint():
+    df = pd.DataFrame({'a': [1, 2, 3], 'b': ['x', 'y', 'z']})
+    assert frame_fingerprint(df) == frame_fingerprint(df.set_axis([5, 6, 7]))
+    assert frame_fingerprint(df) != frame_fingerprint(df.astype({'a': np.float64}))
+    assert frame_fingerprint(df) != frame_fingerprint(df.rename(columns={'a': 'c'}))
+    assert frame_fingerprint(df) != frame_fingerprint(df.iloc[::-1])
+
+
+def test_workers_reopen_memory_mapped_arrays(clean_df, tmp_path):
+    split = cached_split(clean_df, cache_dir=str(tmp_path / 'matrices'))
+    source = array_source(split.X_train)
+    assert source == os.path.join(split.path, 'X_train.npy')
+    reopened = open_array(source)
+    assert isinstance(reopened, np.memmap)
+    np.testing.assert_array_equal(reopened, split.X_train)
+
+    # arrays in memory are passed as they are
+    a = np.arange(3.0)
+    assert array_source(a) is a and open_array(a) is a
@@ -0,0 +1,110 @@
+import http.client
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from detail_views.artifact import ModelArtifact
+from detail_views.features import INPUT_COLUMNS
+from detail_views.serving import MicroBatcher, make_server
+
+
+class PriceModel:
+    """Predicts log10(price + 1), so the predicted views are the price; fails on negative prices."""
+
+    def predict(self, frame):
+        price = frame['price'].to_numpy(dtype=np.float64)
+        if (price < 0).any():
+            raise RuntimeError('negative price')
+        return np.log10(price + 1)
+
+
+def listing(price=1000, **changes):
+    record = {col: 1 for col in INPUT_COLUMNS}
+    record.update(product_tier='Basic', make_name='Audi', price=price, created_date='2018-10-01',
+                  deleted_date='2018-11-01')
+    record.update(changes)
+    return record
+
+
+def predict_all(batcher, requests):
+    # submit concurrently, so the requests are coalesced into one batch
+    results = [None] * len(requests)
+
+    def run(i):
+        try:
+            results[i] = batcher.predict(requests[i])
+        except Exception as error:
+            results[i] = error
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_requests_are_batched():
+    sizes = []
+
+    def predict_frame(frame):
+        sizes.append(len(frame))
+        return frame['price'].to_numpy(dtype=np.float64)
+
+    batcher = MicroBatcher(predict_frame, window_ms=200)
+    results = predict_all(batcher, [[listing(1)], [listing(2), listing(3)], [listing(4)]])
+    assert sorted(results) == [[1.0], [2.0, 3.0], [4.0]]
+    assert sizes == [4]
+
+
+def test_a_malformed_request_only_fails_itself():
+    batcher = MicroBatcher(ModelArtifact(PriceModel()).predict_views, window_ms=200)
+    missing = listing()
+    del missing['make_name']
+    results = predict_all(batcher, [[listing(100)], [missing], [listing(200), listing(300)]])
+    assert np.allclose(results[0], [100])
+    assert isinstance(results[1], KeyError)
+    assert np.allclose(results[2], [200, 300])
+
+
+@pytest.fixture
+def server():
+    server = make_server(ModelArtifact(PriceModel(), version=7), port=0, window_ms=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    connection.request(method, path, body=None if body is None else json.dumps(body))
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    connection.close()
+    return response.status, payload
+
+
+def test_http_predict_and_health(server):
+    assert request(server, 'GET', '/health') == (200, {'status': 'ok', 'model_version': 7})
+    status, payload = request(server, 'POST', '/predict', [listing(100), listing(250)])
+    assert status == 200
+    assert np.allclose(payload['detail_views'], [100, 250])
+    status, payload = request(server, 'POST', '/predict', listing(42))
+    assert status == 200 and np.allclose(payload['detail_views'], [42])
+
+
+def test_http_errors(server):
+    assert request(server, 'GET', '/nope')[0] == 404
+    assert request(server, 'POST', '/predict', [1, 2])[0] == 400
+    missing = listing()
+    del missing['price']
+    assert request(server, 'POST', '/predict', missing)[0] == 400
+    status, payload = request(server, 'POST', '/predict', listing(-5))
+    assert status == 500
+    assert payload == {'error': 'RuntimeError: negative price'}
+    # the server keeps answering after an internal error
+    assert request(server, 'POST', '/predict', listing(5))[0] == 200
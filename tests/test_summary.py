@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from detail_views.loading import read_items_csv
+from detail_views.summary import QuantileSketch, StreamingSummary, TopKCounter, summarize_chunks, summarize_file
+from detail_views.validation import parse_ctr, repair_numeric_columns
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 1500
+    price = rng.lognormal(9, 1, n)
+    df = pd.DataFrame({'price': price,
+                       'search_views': np.round(price / 10 + rng.normal(0, 500, n)),
+                       'stock_days': rng.integers(0, 120, n).astype(float),
+                       'make_name': rng.choice(['Audi', 'BMW', 'Opel', 'Fiat'], n, p=[0.4, 0.3, 0.2, 0.1])})
+    df.loc[rng.random(n) < 0.05, 'search_views'] = np.nan
+    return df
+
+
+def chunks(df, size):
+    return [df.iloc[start:start + size] for start in range(0, len(df), size)]
+
+
+def test_matches_describe_and_corr(frame):
+    summary = summarize_chunks(chunks(frame, 200), n_workers=2, k=4000)
+    numeric = frame.select_dtypes('number')
+    pd.testing.assert_frame_equal(summary.describe(), numeric.describe(), rtol=1e-9)
+    pd.testing.assert_frame_equal(summary.corr(), numeric.corr(), rtol=1e-9)
+    assert summary.rows == len(frame)
+
+
+def test_categorical_describe(frame):
+    summary = summarize_chunks(chunks(frame, 200), n_workers=2)
+    expected = frame[['make_name']].describe()
+    assert summary.describe('category').to_dict() == expected.to_dict()
+
+
+def test_merge_order_does_not_matter(frame):
+    parts = [StreamingSummary().update(chunk) for chunk in chunks(frame, 300)]
+    forward, backward = StreamingSummary(), StreamingSummary()
+    for part in parts:
+        forward.merge(part)
+    for part in reversed(parts):
+        backward.merge(part)
+    # the moments are exact; the quantiles depend on the compactions of the sketches
+    exact = ['count', 'mean', 'std', 'min', 'max']
+    np.testing.assert_allclose(forward.describe().loc[exact], backward.describe().loc[exact], rtol=1e-9)
+    np.testing.assert_allclose(forward.corr().to_numpy(), backward.corr().to_numpy(), rtol=1e-9)
+
+
+def test_sketch_rank_error_is_bounded():
+    values = np.random.default_rng(1).normal(size=100_000)
+    sketch = QuantileSketch(k=500, random_state=0)
+    for part in np.array_split(values, 50):
+        sketch.update(part)
+    quantiles = sketch.quantile([0.1, 0.5, 0.9])
+    ranks = np.searchsorted(np.sort(values), quantiles) / len(values)
+    np.testing.assert_allclose(ranks, [0.1, 0.5, 0.9], atol=0.02)
+
+
+def test_top_k_counts_are_underestimated_by_at_most_the_error():
+    values = pd.Series(np.random.default_rng(2).zipf(1.5, 20_000) % 500)
+    counter = TopKCounter(capacity=50)
+    for part in chunks(values, 2000):
+        counter.update(part)
+    exact = values.value_counts()
+    top = counter.top(5)
+    assert list(top.index) == list(exact.index[:5])
+    assert ((exact[top.index] - top).between(0, counter.error)).all()
+
+
+def test_summarize_file_matches_the_repaired_frame(mangled_csv):
+    path, _ = mangled_csv
+    summary = summarize_file(path, chunk_rows=300, n_workers=2, k=4000)
+    df, _ = repair_numeric_columns(read_items_csv(path))
+    df['ctr'], _ = parse_ctr(df['ctr'])
+
+    assert summary.categorical == ['product_tier', 'make_name']
+    assert 'ctr' in summary.numeric and 'created_date' not in summary.numeric
+    numeric = df[summary.numeric]
+    pd.testing.assert_frame_equal(summary.describe(), numeric.describe().astype(np.float64), rtol=1e-6)
+    pd.testing.assert_frame_equal(summary.corr(), numeric.corr(), rtol=1e-6, atol=1e-12)
+    assert summary.describe('category')['make_name'].to_dict() == df['make_name'].describe().to_dict()
+
+
+def test_all_chunks_use_the_columns_of_the_first(frame):
+    parts = chunks(frame, 500)
+    # a count read as text in a later chunk is still summarized as a number
+    parts[1] = parts[1].assign(stock_days=parts[1]['stock_days'].astype(str))
+    summary = summarize_chunks(parts, n_workers=2, k=4000)
+    assert summary.numeric == ['price', 'search_views', 'stock_days']
+    assert summary.categorical == ['make_name']
+    numeric = frame.select_dtypes('number')
+    pd.testing.assert_frame_equal(summary.describe(), numeric.describe(), rtol=1e-9)
+
+
+def test_merging_summaries_of_different_columns_raises(frame):
+    first = StreamingSummary().update(frame.iloc[:100])
+    other = StreamingSummary().update(frame.iloc[100:200].drop(columns='stock_days'))
+    with pytest.raises(ValueError, match='different columns'):
+        first.merge(other)
@@ -0,0 +1,85 @@
+import operator
+import os
+import time
+
+import pytest
+
+from detail_views.taskfarm import TaskFailed, TaskFarm, TaskQueue, parse_address
+
+
+def test_identical_tasks_share_a_future():
+    queue = TaskQueue()
+    assert queue.submit(operator.mul, (2, 3)) is queue.submit(operator.mul, (2, 3))
+    assert queue.submit(operator.mul, (2, 4)) is not queue.submit(operator.mul, (2, 3))
+    assert queue.counts() == {'pending': 2, 'leased': 0, 'done': 0}
+
+
+def test_expired_leases_are_retried_then_failed():
+    queue = TaskQueue(lease_seconds=0.01, max_attempts=2)
+    future = queue.submit(operator.mul, (2, 3))
+    for _ in range(2):
+        assert queue.lease('lost-worker') is not None
+        time.sleep(0.02)
+        queue.expire()
+    assert queue.lease('worker') is None
+    with pytest.raises(TaskFailed, match='lost its worker 2 times'):
+        future.result(timeout=0)
+
+
+def test_a_late_result_still_completes_a_requeued_task():
+    queue = TaskQueue(lease_seconds=0.01)
+    future = queue.submit(operator.mul, (2, 3))
+    key, lease, fn, args = queue.lease('slow-worker')
+    time.sleep(0.02)
+    queue.expire()
+    assert queue.complete(key, lease, fn(*args))
+    assert future.result(timeout=0) == 6
+    assert queue.lease('worker') is None
+    assert not queue.complete(key, lease, 6)
+
+
+def test_application_errors_fail_at_once_worker_errors_are_retried():
+    queue = TaskQueue(max_attempts=3)
+    app = queue.submit(operator.truediv, (1, 0))
+    key, lease, _, _ = queue.lease('worker')
+    queue.fail(key, lease, 'ZeroDivisionError')
+    with pytest.raises(TaskFailed, match='attempt 1'):
+        app.result(timeout=0)
+
+    flaky = queue.submit(os.listdir, ('/missing',))
+    for _ in range(3):
+        key, lease, _, _ = queue.lease('worker')
+        queue.fail(key, lease, 'FileNotFoundError', retry=True)
+    with pytest.raises(TaskFailed, match='attempt 3'):
+        flaky.result(timeout=0)
+
+
+def test_stale_leases_are_ignored():
+    queue = TaskQueue(lease_seconds=0.01)
+    future = queue.submit(operator.mul, (2, 3))
+    key, old_lease, _, _ = queue.lease('worker-1')
+    time.sleep(0.02)
+    queue.expire()
+    key, lease, _, _ = queue.lease('worker-2')
+    assert not queue.renew(key, old_lease)
+    queue.fail(key, old_lease, 'late error of worker-1')
+    assert not future.done()
+    assert queue.complete(key, lease, 6)
+
+
+def test_parse_address():
+    assert parse_address('example.org:5577') == ('example.org', 5577)
+    assert parse_address(':5577') == ('127.0.0.1', 5577)
+
+
+def test_farm_with_local_workers():
+    with TaskFarm(local_workers=2, max_attempts=2) as farm:
+        products = [farm.submit(operator.mul, i, i) for i in range(8)]
+        failing = farm.submit(operator.truediv, 1, 0)
+        missing = farm.submit(os.listdir, '/missing/directory')
+        assert [future.result(timeout=60) for future in products] == [i * i for i in range(8)]
+        with pytest.raises(TaskFailed, match='(?s)attempt 1.*ZeroDivisionError'):
+            failing.result(timeout=60)
+        with pytest.raises(TaskFailed, match='(?s)attempt 2.*FileNotFoundError'):
+            missing.result(timeout=60)
+    assert farm.queue.closed()
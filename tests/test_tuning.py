@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from detail_views.tuning import group_by_trees, rung_folds, search_xgb
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 4)).astype(np.float32)
+    y = (np.sin(X[:, 0]) + X[:, 1] * X[:, 2] + rng.normal(0, 0.1, 600)).astype(np.float32)
+    return X, y
+
+
+def search(data, param_grid, **kwargs):
+    X, y = data
+    return search_xgb(X, y, param_grid, n_workers=1, threads_per_worker=1, feature_types=None, verbose=False,
+                      **kwargs)
+
+
+def test_rung_folds():
+    assert rung_folds(5, 3) == [1, 3, 5]
+    assert rung_folds(9, 3) == [1, 3, 9]
+    assert rung_folds(5, 3, min_folds=2) == [2, 5]
+    assert rung_folds(5, None) == [5]
+
+
+def test_group_by_trees():
+    configs = [{'max_depth': 2, 'n_estimators': 10}, {'max_depth': 3, 'n_estimators': 10},
+               {'max_depth': 2, 'n_estimators': 50}]
+    assert group_by_trees(configs) == [({'max_depth': 2}, [10, 50], [0, 2]), ({'max_depth': 3}, [10], [1])]
+
+
+def test_successive_halving_prunes_to_the_best_configs(data):
+    grid = {'max_depth': [1, 2, 4], 'learning_rate': [0.01, 0.3], 'n_estimators': [30]}
+    table = search(data, grid, cv=3, halving_factor=3)
+    # 6 configs on the first fold, the best third on all 3
+    assert sorted(table['n_folds']) == [1, 1, 1, 1, 3, 3]
+    assert (table['n_folds'].iloc[:2] == 3).all()
+
+    full = search(data, grid, cv=3, halving_factor=None)
+    assert (full['n_folds'] == 3).all()
+    # pruning is not free of error, but the survivors include the best config on this data
+    assert full['params'].iloc[0] in table['params'].iloc[:2].tolist()
+
+
+def test_smaller_tree_counts_are_scored_from_the_largest_forest(data):
+    shared = search(data, {'max_depth': [3], 'n_estimators': [10, 40]}, cv=3, halving_factor=None)
+    alone = search(data, {'max_depth': [3], 'n_estimators': [10]}, cv=3, halving_factor=None)
+    ten = shared[shared['n_estimators'] == 10].iloc[0]
+    assert ten['n_trees'] == 10
+    assert ten['neg_root_mean_squared_error'] == pytest.approx(alone['neg_root_mean_squared_error'].iloc[0])
+
+
+def test_early_stopping_caps_the_tree_count(data):
+    table = search(data, {'max_depth': [6], 'learning_rate': [0.5], 'n_estimators': [500]}, cv=3,
+                   halving_factor=None, early_stopping_rounds=3)
+    assert table['n_trees'].iloc[0] < 500
@@ -0,0 +1,24 @@
+from detail_views import loading
+from detail_views.validation import validate_items
+
+
+def test_mangled_numbers_are_loaded_and_repaired_by_validation(mangled_csv, tmp_path):
+    path, article_id = mangled_csv
+    df = loading.load_items(path, str(tmp_path / 'cache'))
+    assert df['price'].dtype == 'string'
+    assert df['created_date'].dtype.kind == 'M'
+
+    clean, report = validate_items(df)
+    assert clean['price'].dtype == 'int32'
+    assert clean.loc[clean['article_id'] == article_id, 'price'].item() == 12950
+    assert report.loc['repaired_price', 'count'] == 1
+
+
+def test_mangled_ctr_is_flagged_not_rescaled(items_csv):
+    df = loading.read_items_csv(items_csv)
+    mangled = df['ctr'].str.count(r'\.') > 1
+    assert mangled.any()
+
+    clean, report = validate_items(df)
+    assert report.loc['ctr_mangled', 'count'] == mangled.sum()
+    assert clean['ctr'].dropna().between(0, 1).all()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import KFold, cross_validate
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import FunctionTransformer, StandardScaler
+
+from detail_views.xgb_data import TrainingData, cross_validate_xgb, tree_model
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(800, 4)).astype(np.float32)
+    y = (X[:, 0] * X[:, 1] + np.cos(X[:, 2]) + rng.normal(0, 0.1, 800)).astype(np.float32)
+    return X, y
+
+
+def test_tree_model():
+    model = xgb.XGBRegressor()
+    assert tree_model(model) is model
+    assert tree_model(make_pipeline(StandardScaler(), model)) is model
+    assert tree_model(make_pipeline(FunctionTransformer(np.log1p), model)) is None
+    assert tree_model(Ridge()) is None
+
+
+def test_matrices_are_memoized_and_share_cuts_with_their_reference(data):
+    X, y = data
+    training = TrainingData(X, y)
+    rows = np.arange(600)
+    full = training.matrix(rows, key='fold')
+    assert training.matrix(rows, key='fold') is full
+    subset = training.matrix(rows[:100], reference=full)
+    for a, b in zip(full.get_quantile_cut(), subset.get_quantile_cut()):
+        np.testing.assert_array_equal(a, b)
+    assert subset.num_row() == 100
+
+
+def test_cross_validate_xgb_matches_cross_validate(data):
+    X, y = data
+    model = xgb.XGBRegressor(n_estimators=30, max_depth=3, tree_method='hist', n_jobs=1)
+    cv = KFold(4, shuffle=True, random_state=0)
+    expected = cross_validate(make_pipeline(StandardScaler(), model), X, y, cv=cv, scoring=['r2'])
+    result = cross_validate_xgb(model, X, y, cv=cv, scoring=['r2'])
+    np.testing.assert_allclose(result['test_r2'], expected['test_r2'], rtol=1e-4)
+    assert set(result) == {'fit_time', 'score_time', 'test_r2'}